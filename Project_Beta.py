@@ -1,77 +1,57 @@
+import asyncio
 import curses
-import random
 import time
 import json
 import os
-
-#Saves the game progress to savegame.json
-SAVE_FILE = "savegame.json"
-
-#Defines a class called Monster that defines the stats of monsters
-class Monster:
-    def __init__(self, name, base_hp, base_attack, base_speed, base_def, level=1, elite=False):
-        self.name = name
-        self.level = level
-        self.hp = base_hp + level * 5
-        self.attack = base_attack + level * 2
-        self.speed = base_speed + level // 2
-        self.defense = base_def + level * 2
-        self.elite = elite
-
-class Item:
-    def __init__(self,name,damage,dex,crit,mana):
-        self.name = name
-        self.damage = damage
-        self.dex = dex
-        self.crit = crit
-        self.mana = mana
-
-class Skill:
-    def __init__(self, name, description, skill_type, mana_cost=0, stamina_cost = 0, cooldown=0,
-                 required_class=None, rank="C", passive=False, level_required=1, custom_name=None, effect = None, duration = 0, power = 1.0):
-        self.name = name
-        self.custom_name = custom_name or name  # Default to original name if no custom name given
-        self.description = description
-        self.skill_type = skill_type
-        self.mana_cost = mana_cost
-        self.stamina_cost = stamina_cost
-        self.cooldown = cooldown
-        self.required_class = required_class
-        self.rank = rank
-        self.passive = passive
-        self.level_required = level_required
-        self.effect = effect
-        self.duration = duration
-        self.power = power
-
-    def __repr__(self):
-        return f"<Skill: {self.custom_name} ({self.rank})>"
-
-# Returns the stats of the chosen monster
-def create_monster(name, level_range):
-    level = random.randint(level_range[0], level_range[1])
-    
-    if name == "Slime":
-        monster = Monster("Slime", base_hp=10, base_attack=3, base_speed=1, base_def=1, level=level)
-    elif name == "Goblin":
-        monster = Monster("Goblin", base_hp=30, base_attack=6, base_speed=10, base_def=3, level=level)
-    elif name == "Kobold":
-        monster = Monster("Kobold", base_hp=35, base_attack=7, base_speed=5, base_def=4, level=level)
-    elif name == "Orc":
-        monster = Monster("Orc", base_hp=100, base_attack=30, base_speed=2, base_def=6, level=level)
-    else:
-        monster = Monster(name, base_hp=15, base_attack=5, base_speed=2, base_def=2, level=level)
-
-    if random.random() < 0.0001:
-        monster.name = "Elite " + monster.name
-        monster.hp *= 2
-        monster.attack *= 2
-        monster.defense *= 2
-        monster.elite = True
-
-    return monster
-
-def rename_skill_menu(stdscr, skills):
+import sys
+
+from core import Item, UPGRADES, new_game, spend_skill_point
+from inventory import Inventory, InventoryView
+from progression import PROGRESSION
+from content import CONTENT
+from bestiary import BESTIARY, create_monster
+from skills import learn_class_skills, custom_skill_names
+from battle_engine import BattleState, resolve_turn, finish_battle
+from tile_index import TileIndex
+from world_gen import ProceduralWorld
+from encounters import EncounterTable
+from roamers import RoamerPool, ACTIVE_RADIUS
+from pathfinding import PathCache
+from renderer import FrameRenderer, compose
+from explored import ExploredMap
+from quests import build_quest_bus, visit_npc
+from scheduler import TickScheduler
+from game_loop import AsyncGameLoop, AsyncScreen
+from persistence import AutosaveService
+from save_format import SaveFile, encode_save, write_save, migrate_json
+from journal import Journal, journal_generations, journal_path, read_journal, remove_journals
+from profiler import PROFILER
+from rng import STREAMS
+from recording import InputRecorder
+
+#Saves the game progress to savegame.sav
+SAVE_FILE = "savegame.sav"
+#Older saves, read once and turned into savegame.sav
+LEGACY_SAVE_FILE = "savegame.json"
+EXPLORED_FILE = "explored.bin"
+#Small changes since the last full save, one file per save generation
+JOURNAL_FILE = "savegame.journal"
+#What 's' saved, 'l' goes back to it. savegame.sav keeps moving with autosaves.
+MANUAL_SAVE_FILE = "savegame.manual.sav"
+#Write changes to the journal after every action instead of saving everything
+JOURNALING = True
+#Journal records before they get folded into a full save
+COMPACT_EVERY = 500
+
+#Set RPG_PROFILE to a .json or .csv path to keep the timings when the game exits
+PROFILE_FILE = os.environ.get("RPG_PROFILE")
+
+#RPG_SEED fixes the dice for a session, RPG_RECORD=path records it for replay.py
+SEED = int(os.environ["RPG_SEED"]) if os.environ.get("RPG_SEED") else None
+RECORD_FILE = os.environ.get("RPG_RECORD")
+
+#The menus and battles below are coroutines, stdscr is an AsyncScreen (see game_loop.py)
+async def rename_skill_menu(stdscr, skills):
     while True:
         stdscr.clear()
         stdscr.addstr(0, 0, "== Rename Skills ==")
@@ -80,7 +60,7 @@ def rename_skill_menu(stdscr, skills):
 
         stdscr.addstr(len(skills) + 2, 0, "Enter number to rename, or 'b' to go back:")
         stdscr.refresh()
-        key = stdscr.getch()
+        key = await stdscr.getch()
 
         if key == ord('b'):
             break
@@ -89,271 +69,215 @@ def rename_skill_menu(stdscr, skills):
             stdscr.clear()
             stdscr.addstr(0, 0, f"Renaming skill: {skills[index].custom_name}")
             stdscr.addstr(1, 0, "Enter new name (max 20 chars): ")
-            curses.echo()
-            new_name = stdscr.getstr(2, 0, 20).decode("utf-8")
-            curses.noecho()
+            new_name = await stdscr.getstr(2, 0, 20)
 
             if new_name:
                 skills[index].custom_name = new_name
 
-#Determines how much xp is given once a monster is defeated
-#Also determines whether someone levels up and how rewards are distributed.
-def gain_xp(stats, amount):
-    stats["xp"] += amount
-    leveled_up = False
-    while stats["xp"] >= stats["level"] * 10:
-        stats["xp"] -= stats["level"] * 10
-        stats["level"] += 1
-        stats["skill_points"] += 5
-        stats["current_mana"] = stats["mana"]  # Full restore
-        leveled_up = True
-    return leveled_up
-
-def new_game():
-    stats = {
-        "hp": 20, 
-        "attack": 5, 
-        "defense": 1, 
-        "speed": 2,
-        "mana": 10,  # Max mana
-        "current_mana": 10,  # Current mana (changes in battle)
-        "skill_points": 0, 
-        "xp": 0, 
-        "level": 1, 
-        "gold": 1,
-        "wielded_index": None,
-        "class_path": None,
+#Stats the way saves and the journal keep them, with the wielded item as its
+#position in the inventory
+def saved_stats(stats, inventory):
+    return dict(stats, wielded_index=inventory.wielded_index if inventory is not None else None)
+
+#Tells one game's saves and journals apart from another's
+def new_lineage():
+    return int.from_bytes(os.urandom(8), "little") or 1
+
+#Copies what a save needs. Cheap, so it can run between keypresses.
+def snapshot_game(stats, player_x, player_y, explored=None, inventory=None, skills=None, generation=None, lineage=0):
+    return {
+        "player": {"stats": saved_stats(stats, inventory), "x": player_x, "y": player_y},
+        "inventory": [[item.name, item.damage, item.dex, item.crit, item.mana] for item in inventory] if inventory is not None else None,
+        "quests": [
+            [pos[0], pos[1],
+             npc["quest"].get("progress", 0),
+             npc["quest"].get("completed", False),
+             npc["quest"].get("reward_given", False)]
+            for pos, npc in npcs.items() if "quest" in npc
+        ],
+        "skills": custom_skill_names(skills) if skills is not None else None,
+        "explored": explored.to_bytes() if explored is not None else None,
+        "world": world.to_state(),
+        "journal": {"generation": generation, "lineage": lineage} if generation is not None else None,
     }
-    inventory = []
-    starter_sword = Item("Rusty Sword", damage=3, dex=0, crit=1, mana=0)
-    inventory.append(starter_sword)
-
-    # Starting coordinates
-    player_x, player_y = 0, 0
-
-    return stats, inventory, player_x, player_y
-
-
 
+#Writes a snapshot to the save file, fine to call from the autosave thread
+@PROFILER.timed("save")
+def write_snapshot(snapshot):
+    write_save(SAVE_FILE, snapshot)
+    # older journals are part of this save now
+    if snapshot.get("journal") is not None:
+        remove_journals(JOURNAL_FILE, snapshot["journal"]["generation"])
+
+#Writes the copy of a snapshot that 'l' goes back to
+def write_manual_snapshot(snapshot):
+    write_save(MANUAL_SAVE_FILE, snapshot)
+
+#Saves the game to savegame.sav
+def save_game(stats, player_x, player_y, explored=None, inventory=None, skills=None, generation=None):
+    write_snapshot(snapshot_game(stats, player_x, player_y, explored, inventory, skills, generation))
+
+#Turns an old savegame.json (and explored.bin) into a savegame.sav, the old files are left alone
+def migrate_legacy_save():
+    try:
+        with open(LEGACY_SAVE_FILE, "r") as f:
+            data = json.load(f)
+        sections = migrate_json(data)
+    except (ValueError, KeyError, SyntaxError):
+        # empty or cut off save, e.g. from a crash in the middle of writing it
+        return False
+    if os.path.exists(EXPLORED_FILE):
+        with open(EXPLORED_FILE, "rb") as f:
+            sections["explored"] = f.read()
+    write_save(SAVE_FILE, sections)
+    return True
+
+#Replays one journal record on top of a loaded save
+def apply_journal_record(record, loaded):
+    kind = record[0]
+    if kind == "stat":
+        loaded["stats"][record[1]] = record[2]
+    elif kind == "pos":
+        loaded["x"], loaded["y"] = record[1], record[2]
+    elif kind == "tile":
+        loaded["explored"].mark(record[1], record[2])
+    elif kind == "item":
+        loaded["inventory"].append(Item(*record[1:]))
+    elif kind == "quest":
+        pos = (record[1], record[2])
+        if pos in npcs and "quest" in npcs[pos]:
+            npcs[pos]["quest"]["progress"] = record[3]
+            npcs[pos]["quest"]["completed"] = record[4]
+            npcs[pos]["reward_given"] = record[5]
+        else:
+            world.set_quest_state(pos, record[3], record[4], record[5])
+    elif kind == "skill":
+        loaded["skills"][record[1]] = record[2]
+
+#Once saved, this function allows the user to restart their progress(if they saved it).
+#journals=False loads the save as it was written, without the changes since.
+@PROFILER.timed("load")
+def load_game(path=SAVE_FILE, journals=True):
+    if path == SAVE_FILE and not os.path.exists(SAVE_FILE) and os.path.exists(LEGACY_SAVE_FILE):
+        migrate_legacy_save()
+    if not os.path.exists(path):
+        return None
+    try:
+        save = SaveFile.open(path)
+        with save:
+            player = save.require("player")
+            stats, player_x, player_y = player["stats"], player["x"], player["y"]
+
+            # Fallback for older saves: ensure 'class_path' exists
+            if "class_path" not in stats:
+                stats["class_path"] = None
+
+            for x, y, progress, completed, reward_given in save.get("quests", []):
+                pos = (x, y)
+                if pos in npcs and "quest" in npcs[pos]:
+                    npcs[pos]["quest"]["progress"] = progress
+                    npcs[pos]["quest"]["completed"] = completed
+                    npcs[pos]["reward_given"] = reward_given
+
+            inventory = Inventory(Item(*row) for row in save.get("inventory", []))
+            explored = ExploredMap.from_bytes(save.get("explored")) if "explored" in save else ExploredMap()
+            skill_names = save.get("skills", {})
+            journal = save.get("journal")
+            # saves from before the world was generated get seed 0
+            world.load_state(save.get("world") or {"seed": 0})
+    except (OSError, ValueError):
+        # SaveFormatError is a ValueError too: damaged or unreadable save
+        return None
 
-#Saves the game to savegame.json
-def save_game(stats, player_x, player_y):
-    data = {
-        "stats": stats,
-        "player_x": player_x,
-        "player_y": player_y,
-        "quests": {
-            str(pos): {
-                "progress": npc.get("quest", {}).get("progress", 0),
-                "completed": npc.get("quest", {}).get("completed", False),
-                "reward_given": npc.get("quest", {}).get("reward_given", False)
-            } for pos, npc in npcs.items() if "quest" in npc
-        }
-    }
-    with open(SAVE_FILE, "w") as f:
-        json.dump(data, f)
+    # Changes made after the save was written
+    generation = 0
+    lineage = 0
+    if journal is not None:
+        generation = journal["generation"]
+        lineage = journal["lineage"]
+    if journal is not None and journals:
+        loaded = {"stats": stats, "x": player_x, "y": player_y, "inventory": inventory,
+                  "explored": explored, "skills": skill_names}
+        for journal_generation in journal_generations(JOURNAL_FILE):
+            if journal_generation < journal["generation"]:
+                continue
+            _, journal_lineage, records = read_journal(journal_path(JOURNAL_FILE, journal_generation))
+            if journal_lineage != lineage:
+                continue  # left behind by another game
+            for record in records:
+                apply_journal_record(record, loaded)
+            generation = journal_generation
+        player_x, player_y = loaded["x"], loaded["y"]
+    # saves from before inventories were kept point past the end, they wield nothing
+    inventory.wield_index(stats.pop("wielded_index", None))
+    return stats, player_x, player_y, inventory, explored, skill_names, generation, lineage
+
+#This is how the user fights moonsters. A win is told to quests, the game's
+#quest_bus unless another one is given.
+async def battle(stdscr, monster_name, stats, inventory, skills, level_range=(1, 1), scheduler=None, streams=None,
+                 quests=None):
+    scheduler = scheduler or TickScheduler()
+    streams = streams or STREAMS
+    quests = quest_bus if quests is None else quests
+    monster = create_monster(monster_name, level_range, streams.level, streams.elite)
+    state = BattleState(monster, stats, inventory, skills)
+    auto = scheduler.auto
+    player_msg, monster_msg = None, None
+
+    while not state.over():
+        if auto:
+            # Nothing to draw or wait for, just play it out
+            with PROFILER.timer("battle_turn"):
+                resolve_turn(state)
+            continue
 
-#Once saved, this function allows the user to restart their progress(if they saved it)
-def load_game():
-    if os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, "r") as f:
-            data = json.load(f)
-        stats, player_x, player_y = data["stats"], data["player_x"], data["player_y"]
-
-        # Fallback for older saves: ensure 'class_path' exists
-        if "class_path" not in stats:
-            stats["class_path"] = None
-
-        for pos_str, quest_data in data.get("quests", {}).items():
-            pos = eval(pos_str)
-            if pos in npcs and "quest" in npcs[pos]:
-                npcs[pos]["quest"]["progress"] = quest_data.get("progress", 0)
-                npcs[pos]["quest"]["completed"] = quest_data.get("completed", False)
-                npcs[pos]["reward_given"] = quest_data.get("reward_given", False)
-        return stats, player_x, player_y
-    return None
-
-#This is how the user fights moonsters
-def battle(stdscr, monster_name, stats, inventory, skills, level_range=(1, 1)):
-    # --- One-turn empower state ---
-    empowered_mult = 1.0
-    empowered_turns = 0  # when >0, apply on next 'attack' and then reset
-
-    monster = create_monster(monster_name, level_range)
-    player_hp = stats["hp"]
-    monster_hp = monster.hp
-    weapon_damage = inventory[stats["wielded_index"]].damage if stats.get("wielded_index") is not None else 0
-
-    # cooldowns tracked by skill.name
-    skill_cooldowns = {skill.name: 0 for skill in skills}
-    last_action = "attack"  # default action
-
-    while player_hp > 0 and monster_hp > 0:
         stdscr.clear()
-        stdscr.addstr(0, 0, f"{monster.name} (Lv {monster.level}) HP: {monster_hp}")
-        stdscr.addstr(1, 0, f"Your HP: {player_hp}, MP: {stats['current_mana']}/{stats['mana']}")
+        stdscr.addstr(0, 0, f"{monster.name} (Lv {monster.level}) HP: {state.monster_hp}")
+        stdscr.addstr(1, 0, f"Your HP: {state.player_hp}, MP: {stats['current_mana']}/{stats['mana']}")
         stdscr.addstr(3, 0, "1-9 to choose a skill, 'a' to attack, Enter to repeat last action.")
+        stdscr.addstr(4, 0, f"'f' = fast-forward ({scheduler.speed_label()}) | 'x' = auto-battle")
+        if player_msg:
+            stdscr.addstr(5, 0, player_msg)
+        if monster_msg:
+            stdscr.addstr(7, 0, monster_msg)
         stdscr.refresh()
 
-        stdscr.timeout(1000)  # 1 second to change action, else continue with last_action
-        key = stdscr.getch()
-        stdscr.timeout(-1)
+        # One tick to change action, else continue with last_action
+        key = await scheduler.wait(stdscr)
 
         # --- Skill selection ---
         if ord('1') <= key <= ord(str(min(9, len(skills)))):
             idx = key - ord('1')
-            last_action = skills[idx].name
+            state.last_action = skills[idx].name
         elif key == ord('a'):
-            last_action = "attack"
+            state.last_action = "attack"
+        elif key == ord('f'):
+            scheduler.toggle_fast()
+            continue
+        elif key == ord('x'):
+            auto = True
+            continue
         # else: keep last_action
 
-        # --- Resolve Player action ---
-        if last_action == "attack":
-            # include monster.defense so debuffs matter
-            base = stats["attack"] + weapon_damage - monster.defense
-            dmg = max(int(base * (empowered_mult if empowered_turns > 0 else 1.0)), 1)
-            monster_hp -= dmg
-            if empowered_turns > 0:
-                stdscr.addstr(5, 0, f"Empowered strike! You attack for {dmg} damage!")
-                empowered_turns = 0
-                empowered_mult = 1.0
-            else:
-                stdscr.addstr(5, 0, f"You attack for {dmg} damage!")
-
-        else:
-            # Using a skill by name
-            skill_obj = next((sk for sk in skills if sk.name == last_action), None)
-
-            if not skill_obj:
-                # safety fallback
-                base = stats["attack"] + weapon_damage - monster.defense
-                dmg = max(int(base), 1)
-                monster_hp -= dmg
-                stdscr.addstr(5, 0, f"(Unknown skill) You attack for {dmg} damage.")
-                last_action = "attack"
-            else:
-                # Check requirements BEFORE applying effects
-                can_use = (
-                    stats["level"] >= skill_obj.level_required
-                    and stats["current_mana"] >= skill_obj.mana_cost
-                    and skill_cooldowns.get(skill_obj.name, 0) == 0
-                )
-
-                if not can_use:
-                    # fallback basic attack if skill not available
-                    base = stats["attack"] + weapon_damage - monster.defense
-                    dmg = max(int(base), 1)
-                    monster_hp -= dmg
-                    stdscr.addstr(5, 0, f"{skill_obj.custom_name} unavailable, you attack for {dmg} damage!")
-                    last_action = "attack"
-                else:
-                    # pay costs & set cooldowns
-                    stats["current_mana"] -= skill_obj.mana_cost
-                    skill_cooldowns[skill_obj.name] = skill_obj.cooldown
-
-                    # --- Handle effects ---
-                    if skill_obj.effect == "damage_buff":
-                        # buff the NEXT attack only
-                        empowered_mult = float(skill_obj.power or 1.8)
-                        empowered_turns = 1
-                        stdscr.addstr(5, 0, "Your entire body glows with power! Your next attack will be stronger.")
-                        last_action = "attack"  # default next action to attack so it flows
-
-                    elif skill_obj.effect == "mons_defense_debuff":
-                        # If power < 1.0, treat as multiplicative; else treat as flat reduction
-                        p = skill_obj.power
-                        if p is None:
-                            p = 0.9
-                        if p < 1.0:
-                            monster.defense = max(0, int(monster.defense * p))
-                            stdscr.addstr(5, 0, "You weaken the foe's guard! Their defense drops.")
-                        else:
-                            monster.defense = max(0, monster.defense - int(p))
-                            stdscr.addstr(5, 0, "You pierce their armor! Their defense drops.")
-                        last_action = "attack"
-
-                    elif skill_obj.effect == "hp_buff":
-                        # simple heal based on level or power
-                        heal = int(stats["level"] * 2) if skill_obj.power in (None, 0) else int(skill_obj.power)
-                        player_hp += heal
-                        stdscr.addstr(5, 0, f"You bless yourself and heal {heal} HP.")
-                        last_action = "attack"
-
-                    else:
-                        # Example direct-damage skills by name (Fireball, Arcane Bolt), if present
-                        if skill_obj.name == "Fireball":
-                            base = stats["attack"] + 5 - monster.defense
-                            dmg = max(int(base), 1)
-                            monster_hp -= dmg
-                            stdscr.addstr(5, 0, f"You cast Fireball for {dmg} damage!")
-                        elif skill_obj.name == "Arcane Bolt":
-                            base = stats["attack"] + 3 - monster.defense
-                            dmg = max(int(base), 1)
-                            monster_hp -= dmg
-                            stdscr.addstr(5, 0, f"You fire an Arcane Bolt for {dmg} damage!")
-                        else:
-                            # generic active: small hit
-                            base = stats["attack"] + 2 - monster.defense
-                            dmg = max(int(base), 1)
-                            monster_hp -= dmg
-                            stdscr.addstr(5, 0, f"You use {skill_obj.custom_name} for {dmg} damage!")
-                        # keep last_action as the skill you just used; Enter will repeat unless player presses 'a'
-                        # If you prefer to revert to attack next turn, uncomment:
-                        last_action = "attack"
-
-        # --- Monster action ---
-        if monster_hp > 0:
-            incoming = max(monster.attack - stats["defense"], 1)
-            player_hp -= incoming
-            stdscr.addstr(7, 0, f"{monster.name} hits you for {incoming} damage!")
-
-        # --- Cooldowns tick ---
-        for name in skill_cooldowns:
-            if skill_cooldowns[name] > 0:
-                skill_cooldowns[name] -= 1
-
-        # --- Mana regen (1 per second) ---
-        if stats["current_mana"] < stats["mana"]:
-            stats["current_mana"] = min(stats["mana"], stats["current_mana"] + 1)
-
-        stdscr.refresh()
-        time.sleep(1)
+        with PROFILER.timer("battle_turn"):
+            player_msg, monster_msg = resolve_turn(state)
 
     # --- Battle result ---
+    result = finish_battle(state, quests)
     stdscr.clear()
-    if player_hp > 0:
-        base_xp = {"Slime": 5, "Goblin": 10, "Kobold": 15, "Orc": 40}.get(monster.name.replace("Elite ", ""), 5)
-        xp_gain = base_xp + (monster.level * 2)
-        if monster.elite:
-            xp_gain *= 2
-
-        leveled_up = gain_xp(stats, xp_gain)
-        stdscr.addstr(0, 0, f"You defeated the {monster.name}! You gained {xp_gain} XP.")
-
-        # Quest progress
-        for npc in npcs.values():
-            quest = npc.get("quest")
-            if quest and not quest.get("completed", False):
-                if quest.get("type") == "kill" and quest.get("target") == monster.name:
-                    quest["progress"] = quest.get("progress", 0) + 1
-                    if quest["progress"] >= quest["count"]:
-                        quest["completed"] = True
-
-        if leveled_up:
+    if result.won:
+        stdscr.addstr(0, 0, f"You defeated the {monster.name}! You gained {result.xp_gain} XP.")
+        if result.leveled_up:
             stdscr.addstr(1, 0, f"You leveled up to level {stats['level']}! +5 skill points!")
-        stdscr.refresh()
-        stdscr.getch()
-        return True
     else:
-        lost_xp = stats["xp"] // 2
-        stats["xp"] -= lost_xp
         stdscr.addstr(0, 0, f"You were defeated by the {monster.name}...")
-        stdscr.addstr(1, 0, f"You lost {lost_xp} XP and will respawn at the starting point.")
-        stdscr.refresh()
-        stdscr.getch()
-        return False
+        stdscr.addstr(1, 0, f"You lost {result.lost_xp} XP and will respawn at the starting point.")
+    stdscr.addstr(3, 0, f"The fight lasted {result.turns} turns. You have {max(result.player_hp, 0)} HP left.")
+    stdscr.refresh()
+    await stdscr.getch()
+    return result.won
 
-def skill_menu(stdscr, skills):
+async def skill_menu(stdscr, skills):
     """Display all skills with detailed information."""
     pos = 0
     while True:
@@ -380,7 +304,7 @@ def skill_menu(stdscr, skills):
             stdscr.addstr(15, 0, f"[{pos+1}/{len(skills)}]")
 
         stdscr.refresh()
-        key = stdscr.getch()
+        key = await stdscr.getch()
 
         if key == ord('b'):
             break
@@ -390,7 +314,7 @@ def skill_menu(stdscr, skills):
             pos = (pos + 1) % len(skills)
 
 #This is the upgrade menu, when you have skill points
-def upgrade_menu(stdscr, stats):
+async def upgrade_menu(stdscr, stats):
     while True:
         stdscr.clear()
         stdscr.addstr(0, 0, "== Upgrade Stats ==")
@@ -400,26 +324,15 @@ def upgrade_menu(stdscr, stats):
         stdscr.addstr(4, 0, f"3. Defense= {stats['defense']}")
         stdscr.addstr(5, 0, f"4. Speed  = {stats['speed']}")
         stdscr.addstr(6, 0, f"5. Mana   = {stats['mana']}")
-        stdscr.addstr(7, 0, f"6. Level  = {stats['level']} | XP: {stats['xp']}/{stats['level']*10}")
+        stdscr.addstr(7, 0, f"6. Level  = {stats['level']} | XP: {stats['xp']}/{PROGRESSION.xp_to_next(stats)}")
         stdscr.addstr(9, 0, "Press 1-5 to upgrade a stat, or 'b' to go back.")
         stdscr.refresh()
-        key = stdscr.getch()
+        key = await stdscr.getch()
 
         if key == ord('b'):
             break
-        elif key in [ord('1'), ord('2'), ord('3'), ord('4'), ord('5')]:
-            if stats["skill_points"] > 0:
-                if key == ord('1'):
-                    stats["hp"] += 2
-                elif key == ord('2'):
-                    stats["attack"] += 1
-                elif key == ord('3'):
-                    stats["defense"] += 1
-                elif key == ord('4'):
-                    stats["speed"] += 1
-                elif key == ord('5'):
-                    stats["mana"] += 2  # Mana boost amount
-                stats["skill_points"] -= 1
+        elif ord('1') <= key <= ord('5'):
+            spend_skill_point(stats, UPGRADES[key - ord('1')][0])
 
 #This is the start menu
 def start_menu(stdscr):
@@ -445,333 +358,676 @@ def start_menu(stdscr):
         elif key in [10, 13]:
             return options[selected]
 
-def inventory_menu(stdscr, inventory, stats):
+#Starting over replaces the save that is there, so the player has to say so
+def confirm_new_game(stdscr):
+    if not os.path.exists(SAVE_FILE) and not os.path.exists(LEGACY_SAVE_FILE):
+        return True
+    stdscr.clear()
+    stdscr.addstr(0, 0, "A new game replaces your saved game.")
+    stdscr.addstr(1, 0, "Press 'y' to start over, any other key to go back.")
+    stdscr.refresh()
+    return stdscr.getch() == ord('y')
+
+#The inventory a page at a time, only the visible rows are drawn. view keeps
+#the order, filter and search between visits.
+async def inventory_menu(stdscr, inventory, stats, view=None):
+    view = view or InventoryView(inventory)
+    view.page_size = max(stdscr.getmaxyx()[0] - 6, 1)
+    searching = False
     while True:
         stdscr.clear()
         stdscr.addstr(0, 0, "== Inventory ==")
         stdscr.addstr(0, 50, "== Currency ==")
         stdscr.addstr(1, 50, f"Gold: {stats['gold']}")
 
+        first, page = view.page()
         if not inventory:
             stdscr.addstr(1, 0, "Your inventory is empty.")
+        elif not page:
+            stdscr.addstr(1, 0, "Nothing matches.")
+        for i, item in enumerate(page):
+            marker = ">" if first + i == view.cursor else " "
+            suffix = " (W)" if item is inventory.wielded else ""
+            stdscr.addstr(i + 1, 0, f"{marker} {item.name}{suffix}  dmg {item.damage} dex {item.dex} crit {item.crit} mana {item.mana}")
+
+        row = view.page_size + 2
+        total = len(view)
+        pages = max(-(-total // view.page_size), 1)
+        order = view.sort_key or "picked up"
+        if view.sort_key is not None:
+            order += f" ({'high' if view.descending else 'low'} first)"
+            if view.at_least is not None:
+                order += f", at least {view.at_least}"
+        stdscr.addstr(row, 0, f"Sort: {order} | Search: {view.query or '-'} | {total}/{len(inventory)} items | page {first // view.page_size + 1}/{pages}")
+        if searching:
+            stdscr.addstr(row + 1, 0, "Type to search, Enter when done.")
         else:
-            for i, item in enumerate(inventory):
-                suffix = " (W)" if stats.get("wielded_index") == i else ""
-                stdscr.addstr(i + 1, 0, f"{i + 1}. {item.name}{suffix}")
-
-        stdscr.addstr(len(inventory) + 2, 0, "Press number to wield/unwield an item.")
-        stdscr.addstr(len(inventory) + 3, 0, "Press 'b' to go back.")
+            stdscr.addstr(row + 1, 0, "UP/DOWN, LEFT/RIGHT = page | Enter or 1-9 = wield/unwield | 'o' = sort | 'r' = reverse | '+'/'-' = minimum | '/' = search")
+            stdscr.addstr(row + 2, 0, "Press 'b' to go back.")
         stdscr.refresh()
 
-        key = stdscr.getch()
+        key = await stdscr.getch()
+
+        if searching:
+            if key in [10, 13, 27]:
+                searching = False
+            elif key in [curses.KEY_BACKSPACE, 127, 8]:
+                view.search(view.query[:-1])
+            elif 32 <= key < 127:
+                view.search(view.query + chr(key))
+            continue
 
         if key == ord('b'):
             break
-
-        if ord('1') <= key <= ord(str(min(len(inventory), 9))):
-            index = key - ord('1')
-
-            if stats.get("wielded_index") == index:
-                stats["wielded_index"] = None
-            else:
-                stats["wielded_index"] = index
-
-def help_menu(stdscr):
+        elif key == curses.KEY_UP:
+            view.move(-1)
+        elif key == curses.KEY_DOWN:
+            view.move(1)
+        elif key in [curses.KEY_LEFT, curses.KEY_PPAGE]:
+            view.move(-view.page_size)
+        elif key in [curses.KEY_RIGHT, curses.KEY_NPAGE]:
+            view.move(view.page_size)
+        elif key == ord('o'):
+            view.next_sort()
+        elif key == ord('r'):
+            view.reverse()
+        elif key == ord('+') and view.sort_key not in (None, "name"):
+            view.set_minimum((view.at_least or 0) + 1)
+        elif key == ord('-') and view.at_least is not None:
+            view.set_minimum(view.at_least - 1 if view.at_least > 1 else None)
+        elif key == ord('/'):
+            searching = True
+        elif key in [10, 13] and view.selected() is not None:
+            inventory.toggle(view.selected())
+        elif ord('1') <= key <= ord(str(min(len(page), 9))):
+            inventory.toggle(page[key - ord('1')])
+
+#Picks where to auto-travel to. destinations is a list of (label, pos), returns
+#(pos, avoid bushes) or None.
+async def travel_menu(stdscr, destinations, avoid):
+    selected = 0
+    rows = 15
+    while True:
+        stdscr.clear()
+        stdscr.addstr(0, 0, "== Travel ==")
+        stdscr.addstr(1, 0, f"UP/DOWN and ENTER to go | 'a' = avoid bushes ({'on' if avoid else 'off'}) | 'b' = back")
+        if not destinations:
+            stdscr.addstr(3, 0, "Nowhere to go yet.")
+        # only the rows around the selection are drawn
+        first = max(0, min(selected - rows // 2, len(destinations) - rows))
+        for i, (label, pos) in enumerate(destinations[first:first + rows], first):
+            stdscr.addstr(3 + i - first, 0, f"{'>' if i == selected else ' '} {label} {pos}")
+        stdscr.refresh()
+        key = await stdscr.getch()
+        if key == ord('b'):
+            return None
+        elif key == ord('a'):
+            avoid = not avoid
+        elif key == curses.KEY_UP and destinations:
+            selected = (selected - 1) % len(destinations)
+        elif key == curses.KEY_DOWN and destinations:
+            selected = (selected + 1) % len(destinations)
+        elif key in [10, 13] and destinations:
+            return destinations[selected][1], avoid
+
+#What an npc is called in the travel menu
+def npc_label(npc):
+    quest = npc.get("quest") or {}
+    if quest.get("type") == "kill":
+        return f"{quest['target']} quest"
+    if quest.get("type") == "class":
+        return f"{quest['class_name']} trainer"
+    if quest.get("type") == "gold":
+        return "Merchant"
+    return "Stranger"
+
+async def help_menu(stdscr):
     while True:
         stdscr.clear()
         stdscr.addstr(0, 0, "== Help Menu ==")
         stdscr.addstr(1,0, "The purpose of this game is to level up characters 'till infinity and beyond.")
         stdscr.addstr(2,0, "'P' on the map stands for the player, 'B' stands for bushes, and 'N' stands for bushes. There will be monsters in bushes.")
-        stdscr.addstr(3,0, "You cannot control the battles, but you can choose when to use select skills.")
-        stdscr.addstr(5,0,"Press 'b' to go back.")
+        stdscr.addstr(3,0, "'g' travels to an npc, a zone or a marker on its own, 'm' drops a marker. Any key stops the walk.")
+        stdscr.addstr(4,0, "'M' is a monster walking around. Get close and it comes after you, touch it and you fight.")
+        stdscr.addstr(5,0, "You cannot control the battles, but you can choose when to use select skills.")
+        stdscr.addstr(7,0,"Press 'b' to go back.")
         stdscr.refresh()
-        key = stdscr.getch()
+        key = await stdscr.getch()
 
         if key == ord('b'):
             break
 
-# === Global NPC dictionary with quests ===
-npcs = {
-    (0, 1): {
-        "dialogue": "A youngster tells you, 'Slimes are tricky to catch, so I guess I'll play with their corpses.'",
-        "quest": {
-            "type": "kill", "target": "Slime", "count": 3,
-            "progress": 0, "reward": {"xp": 20, "skill_points": 0},
-            "completed": False
-        }
-    },
-    (10, 9): {
-        "dialogue": "A frail old man tells you, 'If you give me 2 goblin heads, I will give you a reward.'",
-        "quest": {
-            "type": "kill", "target": "Goblin", "count": 2,
-            "progress": 0, "reward": {"xp": 40, "skill_points": 0},
-            "completed": False
-        }
-    },
-    (-5, -4): {
-        "dialogue": "An agitated farmer paces back in forth, muttering, 'Those disgusting orcs...' ",
-        "quest": {
-            "type": "kill", "target": "Orc", "count": 1,
-            "progress": 0, "reward": {"xp": 100, "skill_points": 1},
-            "completed": False
-        }
-    },
-    (-1, 0): {
-        "dialogue": "A wizened figure stands, staff in hand: 'You want to follow the path of magic?' ",
-        "quest": {
-            "type": "class", "class_name": "Mage",
-            "accepted": False, "completed": False
-        }
-    },
-    (1, 0): {
-        "dialogue": "A rugged veteran sits, hair in the wind, 'Fight like a warrior.' ",
-        "quest": {
-            "type": "class", "class_name": "Swordsman",
-            "accepted": False, "completed": False
-        }
-    },
-    (0,-1): {
-        "dialogue": "A kind old man gazes at you warmly, 'May He be with you.' ",
-        "quest": {
-            "type": "class", "class_name": "Cleric",
-            "accepted": False, "completed": False
-        }
-    },
-    
-    (0, 4): {
-        "dialogue": "A merchant shows off their sales",
-        "quest": {
-            "type": "gold"
-        }
-    }
-
-
+# === Global NPC dictionary with quests, from content/npcs.json ===
+npcs = CONTENT.npc_dicts()
+
+#Kills and class choices only reach the quests that listen for them
+quest_bus = build_quest_bus(npcs)
+
+#Monsters hide in these bushes, see content/zones.json
+bush_zones = CONTENT.zone_dicts()
+
+#All bushes, the start and the roads
+landmarks = CONTENT.landmarks
+
+#This gets the landmarks, zones and npcs to put on the grid.
+tiles = TileIndex(landmarks, bush_zones, npcs)
+
+#Everything past the hand-made map is generated as the player gets near it
+world = ProceduralWorld(tiles, bush_zones, quest_bus=quest_bus)
+
+#Work out monster stats for every level the zones can spawn, and compile
+#each zone's encounter table
+for zone in bush_zones.values():
+    BESTIARY.prepare(zone["monsters"], zone["level_range"])
+    zone["encounters"] = EncounterTable.from_zone(zone)
+
+#How often things happen between keypresses, in seconds
+REGEN_INTERVAL = 5
+AUTOSAVE_INTERVAL = 60
+ENCOUNTER_INTERVAL = 3
+ROAM_INTERVAL = 0.5
+TRAVEL_INTERVAL = 0.1
+#Auto-travel walks this many tiles between redraws
+TRAVEL_STEPS = 1
+#What stepping on a bush costs auto-travel when it avoids them
+BUSH_COST = 10
+
+MOVES = {
+    curses.KEY_UP: (0, -1),
+    curses.KEY_DOWN: (0, 1),
+    curses.KEY_LEFT: (-1, 0),
+    curses.KEY_RIGHT: (1, 0),
 }
 
-#This sets the cursor state
-def main(stdscr):
-    curses.curs_set(0)
-    stdscr.nodelay(0)
-    stdscr.keypad(True)
-    curses.start_color()
-    curses.init_pair(1, curses.COLOR_GREEN, curses.COLOR_BLACK)
-
-    #Determines the minimal screen size, or it crashes.
-    viewport_width, viewport_height = 20, 10
-    world = {}
-
-    bush_zones = {
-        "slime": {
-            "tiles": [(1, 1), (1, 2), (2, 0), (2, 1), (2, 2), (3, 0), (3, 1),
-                    (3, 2), (1,3), (1,4), (2,3), (2,4), (3,3), (3,4), (4,2),
-                    (4,3), (5,3), (6,3), (7,3), (5,2), (6,2)],
-            "level_range": (1, 3)
-        },
-        "goblin": {
-            "tiles": [(-5, -5), (-5, -6), (-6, -5), (-6, -6)],
-            "level_range": (4, 6)
-        },
-        "orc": {
-            "tiles": [(10, 10), (10, 11), (11, 10), (11, 11)],
-            "level_range": (8, 12)
-        },
-        "mixed": {
-            "tiles": [(8, -3), (8, -4), (9, -3), (9, -4)],
-            "level_range": (5, 10)
-        }
-    }
-
-    landmarks = {
-        'B': sum((zone["tiles"] for zone in bush_zones.values()), []),  # all bushes
-        '*': [(0, 0)],
-        'W': [(x, 0) for x in range(-20, 21)] + [(0, y) for y in range(-20, 21)]
-    }
-
-    choice = start_menu(stdscr)
-    if choice == "Load Game":
-        loaded = load_game()
-        if loaded:
-            stats, player_x, player_y = loaded
-            inventory = []  # if you want inventory persistence, load it too later
-        else:
-            stdscr.addstr(0, 0, "No save found. Starting new game.")
-            stdscr.refresh()
-            time.sleep(1)
-            stats, inventory, player_x, player_y = new_game()
-    elif choice == "New Game":
-        stats, inventory, player_x, player_y = new_game()
-    elif choice == "Quit":
-        return
-
-    #This gets the landmarks to put on the grid.
-    
-    def get_landmark_at(x, y):
-        for icon, pos in landmarks.items():
-            if (x, y) in pos:
-                return icon
-        return None
-
-    #This picks the monsters to battle the user
-    def pick_monster(monsters):
-        total = sum(chance for _, chance in monsters)
-        r = random.random() * total
-        upto = 0
-        for monster, chance in monsters:
-            if upto + chance >= r:
-                return monster
-            upto += chance
-        return monsters[-1][0]
-    
-    #This sets up the map
-    while True:
-        stdscr.clear()
-        top_left_x = player_x - viewport_width // 2
+#Everything about the game being played on the map
+class Game:
+    def __init__(self, stdscr, stats, inventory, player_x, player_y, explored, skill_names=None, generation=0, streams=None,
+                 lineage=None):
+        self.stdscr = stdscr if isinstance(stdscr, AsyncScreen) else AsyncScreen(stdscr)
+        self.stats = stats
+        self.inventory = inventory
+        self.player_x = player_x
+        self.player_y = player_y
+        self.explored = explored
+
+        #Determines the minimal screen size, or it crashes.
+        self.viewport_width, self.viewport_height = 20, 10
+
+        self.skills_class = stats["class_path"]
+        self.player_skills = learn_class_skills(self.skills_class, skill_names)
+
+        #Battle speed, 'f' and 'x' in a fight change it
+        self.scheduler = TickScheduler()
+        #Every dice roll comes from these, so a seed replays the same game
+        self.streams = streams or STREAMS
+
+        self.renderer = FrameRenderer(self.stdscr.screen)
+        try:
+            self.green = curses.color_pair(1)
+        except curses.error:
+            self.green = 0  # no terminal, e.g. a FakeScreen
+
+        #Saves are written on a worker thread so they never hold up a keypress
+        self.saver = AutosaveService(write_snapshot)
+        self.manual_saver = AutosaveService(write_manual_snapshot)
+        self.generation = generation
+        self.lineage = lineage or new_lineage()
+        self.journal = None
+        self.journaled = None
+        if JOURNALING:
+            self.compact()
+
+        self.npc_lines = []  # what the npc on this tile is saying
+        self.prompt = None  # class quest waiting for a 'y'
+        self.markers = []  # dropped with 'm', for auto-travel
+        self.paths = PathCache()
+        self.route = []  # tiles auto-travel still has to walk, last one first
+        self.avoid_bushes = True
+        self.inventory_view = InventoryView(self.inventory)
+        self.reset_roamers()
+        self.visit_tile()
+
+    #Monsters walking the map. They aren't saved, a loaded game gets a fresh lot.
+    #Those of a generated zone go when the world drops its chunk.
+    def reset_roamers(self):
+        self.roamers = RoamerPool(world.seed)
+        world.on_drop = self.roamers.forget_zone
+        for name, zone in bush_zones.items():
+            self.roamers.populate_zone(name, zone)
+
+    #This draws the map
+    def draw(self):
+        renderer = self.renderer
+        stats = self.stats
+        player_x, player_y = self.player_x, self.player_y
+        viewport_height = self.viewport_height
+        green = self.green
+
+        renderer.begin_frame()
+        top_left_x = player_x - self.viewport_width // 2
         top_left_y = player_y - viewport_height // 2
 
+        monsters = self.roamers.in_rect(top_left_x, top_left_y, top_left_x + self.viewport_width - 1,
+                                        top_left_y + viewport_height - 1)
+
         for y in range(viewport_height):
-            for x in range(viewport_width):
+            world_y = top_left_y + y
+            cells = []
+            for x in range(self.viewport_width):
                 world_x = top_left_x + x
-                world_y = top_left_y + y
-                screen_x = x * 2
-                if (world_x, world_y) == (player_x, player_y):
-                    stdscr.addstr(y, screen_x, "P ")
-                elif (world_x, world_y) in npcs:
-                    stdscr.addstr(y, screen_x, "N ")
+                tile = world.get(world_x, world_y)
+                if world_x == player_x and world_y == player_y:
+                    cells.append(("P ", 0))
+                elif monsters and (world_x, world_y) in monsters:
+                    cells.append(("M ", 0))
+                elif tile.npc is not None:
+                    cells.append(("N ", 0))
                 else:
-                    icon = get_landmark_at(world_x, world_y)
+                    icon = tile.icon
                     if icon == 'W':
-                        stdscr.addstr(y, screen_x, ". ", curses.color_pair(1))
+                        cells.append((". ", green))
                     elif icon:
-                        stdscr.addstr(y, screen_x, icon + " ")
+                        cells.append((icon + " ", 0))
                     else:
-                        stdscr.addstr(y, screen_x, world.get((world_x, world_y), ".") + " ")
-
-        stdscr.addstr(viewport_height + 1, 0, f"Level: {stats['level']} XP: {stats['xp']}/{stats['level'] * 10} Skill Pts: {stats['skill_points']}")
-        stdscr.addstr(viewport_height + 2, 0, "Arrows = move | q = quit | u = upgrade | i = inventory | k = skill rename | p = skill window | s = save | l = load | h = help")
-
-        #This is the npc part
-        if (player_x, player_y) in npcs:
-                    npc = npcs[(player_x, player_y)]
-                    stdscr.addstr(viewport_height + 3, 0, npc["dialogue"])
-                    quest = npc.get("quest")
-                    if quest:
-                        if quest["type"] == "class":
-                            if stats["class_path"] is None:
-                                if not quest["accepted"]:
-                                    stdscr.addstr(viewport_height + 4, 0, f"Do you want to become a {quest['class_name']}? Press 'y' to accept.")
-                                    stdscr.refresh()
-                                    key = stdscr.getch()
-                                    if key == ord('y'):
-                                        quest["accepted"] = True
-                                        stats["class_path"] = quest["class_name"]
-                                        stdscr.addstr(viewport_height + 5, 0, f"You are now on the path of the {quest['class_name']}!")
-                                        stdscr.getch()
-                                else:
-                                    stdscr.addstr(viewport_height + 4, 0, f"Class quest: Prove yourself to become a {quest['class_name']}.")
-                            else:
-                                if stats["class_path"] != quest["class_name"]:
-                                    stdscr.addstr(viewport_height + 4, 0, "You have chosen a different path. You cannot become this class.")
-                                else:
-                                    stdscr.addstr(viewport_height + 4, 0, f"Continue your path as a {stats['class_path']}.")
-
-                        elif quest["completed"] and not quest.get("reward_given", False):
-                            reward = quest["reward"]
-                            stats["xp"] += reward["xp"]
-                            stats["skill_points"] += reward["skill_points"]
-                            npc["reward_given"] = True
-                            stdscr.addstr(viewport_height + 4, 0, f"Quest complete! +{reward['xp']} XP, +{reward['skill_points']} SP!")
-                            leveled_up = gain_xp(stats, 0)
-                            if leveled_up:
-                                stdscr.addstr(viewport_height + 5, 0, f"You leveled up to level {stats['level']}! +5 SP!")
-                            quest["completed"] = False
-                            quest["progress"] = 0
-                        elif not quest["completed"]:
-                            stdscr.addstr(viewport_height + 4, 0, f"Quest: Defeat {quest['count']} {quest['target']}s [{quest['progress']}/{quest['count']}]")
-
-
-
-        stdscr.refresh()
-        world[(player_x, player_y)] = '.'
-        key = stdscr.getch()
-
+                        cells.append((". ", 0))
+            renderer.row(y, compose(cells))
+
+        renderer.row(viewport_height + 1, f"Level: {stats['level']} XP: {stats['xp']}/{PROGRESSION.xp_to_next(stats)} Skill Pts: {stats['skill_points']} MP: {stats['current_mana']}/{stats['mana']}")
+        renderer.row(viewport_height + 2, "Arrows = move | q = quit | u = upgrade | i = inventory | k = skill rename | p = skill window | s = save | l = load | h = help | t = timings | g = travel | m = marker")
+        for i, line in enumerate(self.npc_lines + self.save_problems()):
+            renderer.row(viewport_height + 3 + i, line)
+        if PROFILER.overlay:
+            for i, line in enumerate(PROFILER.overlay_lines()):
+                renderer.row(viewport_height + 7 + i, line)
+        renderer.present()
+
+    #This is the npc part, it runs whenever the player acts
+    def visit_tile(self):
+        if self.explored.mark(self.player_x, self.player_y) and self.journal is not None:
+            self.journal.append(["tile", self.player_x, self.player_y])
+        self.npc_lines = []
+        self.prompt = None
+
+        npc = world.npc_at(self.player_x, self.player_y)
+        if npc is None:
+            return
+        self.prompt, rewarded = visit_npc(self.stats, npc, self.npc_lines, "Press 'y' to accept.")
+        if rewarded:
+            self.changed()
+
+    # Skills only change when the class does, renamed skills keep their names
+    def sync_skills(self):
+        if self.stats["class_path"] != self.skills_class:
+            self.skills_class = self.stats["class_path"]
+            self.player_skills = learn_class_skills(self.skills_class, custom_skill_names(self.player_skills))
+
+    def snapshot(self):
+        return snapshot_game(self.stats, self.player_x, self.player_y, self.explored, self.inventory, self.player_skills,
+                             self.generation if JOURNALING else None, self.lineage)
+
+    #The parts of the game the journal keeps track of
+    def journal_view(self):
+        return {
+            "stats": saved_stats(self.stats, self.inventory),
+            "pos": (self.player_x, self.player_y),
+            "items": len(self.inventory),
+            "quests": {pos: (npc["quest"].get("progress", 0), npc["quest"].get("completed", False), npc.get("reward_given", False))
+                       for pos, npc in list(npcs.items()) + list(world.quest_items()) if "quest" in npc},
+            "skills": custom_skill_names(self.player_skills),
+        }
 
-        player_skills = []
+    #Appends whatever changed since the last call to the journal
+    def record_changes(self):
+        if self.journal is None:
+            return
+        old = self.journaled
+        new = self.journal_view()
+        journal = self.journal
+        for key, value in new["stats"].items():
+            if old["stats"].get(key) != value:
+                journal.append(["stat", key, value])
+        if new["pos"] != old["pos"]:
+            journal.append(["pos", *new["pos"]])
+        for item in self.inventory[old["items"]:]:
+            journal.append(["item", item.name, item.damage, item.dex, item.crit, item.mana])
+        for pos, quest in new["quests"].items():
+            if old["quests"].get(pos) != quest:
+                journal.append(["quest", *pos, *quest])
+        for name, custom_name in new["skills"].items():
+            if old["skills"].get(name) != custom_name:
+                journal.append(["skill", name, custom_name])
+        self.journaled = new
+        if len(journal) >= COMPACT_EVERY:
+            self.compact()
+
+    #Folds the journal into a new full save and starts the next journal
+    def compact(self, immediate=False):
+        self.generation += 1
+        self.saver.request(self.snapshot(), immediate)
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = Journal(JOURNAL_FILE, self.generation, self.lineage)
+        self.journaled = self.journal_view()
+
+    #Something worth keeping happened (xp, level ups, quest progress)
+    def changed(self):
+        if self.journal is not None:
+            self.record_changes()
+        else:
+            self.saver.request(self.snapshot())
+
+    #What the HUD says about saves that didn't make it to disk
+    def save_problems(self):
+        return [f"Saving failed: {saver.last_error}" for saver in (self.saver, self.manual_saver)
+                if saver.last_error is not None]
+
+    #'s': a full save, and a copy of it for 'l' to come back to
+    def save(self):
+        if self.journal is not None:
+            self.record_changes()
+            self.compact(immediate=True)
+        else:
+            self.saver.request(self.snapshot(), immediate=True)
+        self.manual_saver.request(self.snapshot(), immediate=True)
+
+    #'l': back to what 's' saved, whatever happened since. False if there is no such save.
+    def load(self):
+        self.saver.flush()
+        self.manual_saver.flush()
+        loaded = load_game(MANUAL_SAVE_FILE, journals=False)
+        if not loaded:
+            return False
+        # generations carry on from this session, so newer journals on disk
+        # can't get mixed into the next save
+        self.stats, self.player_x, self.player_y, self.inventory, self.explored, skill_names, _, self.lineage = loaded
+        self.inventory_view = InventoryView(self.inventory)
+        self.skills_class = self.stats["class_path"]
+        self.player_skills = learn_class_skills(self.skills_class, skill_names)
+        self.reset_roamers()
+        if self.journal is not None:
+            self.compact()
+        return True
 
-        # Later in the code, after choosing a class
-        if stats["class_path"] == "Swordsman":
-            player_skills.extend([
-                Skill("Power Strike", "Empowers your next attack to do 2.5x the damage.", "active", mana_cost=0, stamina_cost = 3, cooldown=5, required_class="Swordsman", rank="C", level_required=1, effect = "damage_buff", duration = 1, power = 2.5),
-                Skill("Quick Jab", "A fast, weak jab drops the opposing parties defense by 0.1.", "active", mana_cost=0, stamina_cost = 2, cooldown=3, required_class="Swordsman", rank="D", level_required=1, effect = "mons_defense_debuff", duration = 2, power = 0.8),
-            ])
-        elif stats["class_path"] == "Mage":
-            player_skills.extend([
-                Skill("Fireball", "A ball of fire.", "active", mana_cost=8, stamina_cost = 1, cooldown=7, required_class="Mage", rank="C", level_required=1, effect = "damage_buff", duration = 2, power = 1.5),
-                Skill("Arcane Bolt", "A bolt of arcane energy.", "active", mana_cost=4, stamina_cost = 1, cooldown=6, required_class="Mage", rank="D", level_required=1, effect = "damage_buff", duration = 1, power = 1.6),
-            ])
-        
-        elif stats["class_path"] == "Cleric":
-            player_skills.extend([
-                Skill("Heal", "A pulse of holy light heals allies.", "active", mana_cost=10, stamina_cost = 1, cooldown=2, required_class="Cleric", rank="C", level_required=1, effect = "hp_buff", duration = 1, power = None),
-                Skill("Purify", "A pulse of holy light weakens enemies.", "active", mana_cost=8, stamina_cost = 1, cooldown=5, required_class="Cleric", rank="D", level_required=1, effect = "damage_buff", duration = 1, power = 1.2),
-            ])
+    #Handles one keypress, returns False when the player quits
+    async def handle_key(self, key):
+        stdscr = self.stdscr
+        stats = self.stats
+        message = None
 
+        # any key stops auto-travel
+        self.route = []
 
+        if self.prompt is not None and key == ord('y'):
+            quest = self.prompt
+            quest_bus.choose_class(quest["class_name"])
+            stats["class_path"] = quest["class_name"]
+            message = f"You are now on the path of the {quest['class_name']}!"
         #These are the commands to quit, upgrade, save, and load
-        if key == ord('q'):
-            break
+        elif key == ord('q'):
+            return False
         elif key == ord('u'):
-            upgrade_menu(stdscr, stats)
+            await upgrade_menu(stdscr, stats)
         elif key == ord('i'):
-            inventory_menu(stdscr, inventory, stats)
+            await inventory_menu(stdscr, self.inventory, stats, self.inventory_view)
         elif key == ord('s'):
-            save_game(stats, player_x, player_y)
+            self.save()
         elif key == ord('p'):
-            skill_menu(stdscr, player_skills)
+            await skill_menu(stdscr, self.player_skills)
         elif key == ord('h'):
-            help_menu(stdscr)
+            await help_menu(stdscr)
         elif key == ord('k'):  # or any unused key
-            rename_skill_menu(stdscr, player_skills)
+            await rename_skill_menu(stdscr, self.player_skills)
         elif key == ord('l'):
-            loaded = load_game()
-            if loaded:
-                stats, player_x, player_y = loaded
+            if not self.load():
+                message = "Nothing saved with 's' yet."
+        elif key == ord('t'):
+            PROFILER.overlay = not PROFILER.overlay
+        elif key == ord('g'):
+            await self.plan_travel()
+        elif key == ord('m'):
+            self.markers.append((self.player_x, self.player_y))
+            message = f"Marker {len(self.markers)} dropped."
         #These determine the moves of the user
-        elif key == curses.KEY_UP:
-            player_y -= 1
-        elif key == curses.KEY_DOWN:
-            player_y += 1
-        elif key == curses.KEY_LEFT:
-            player_x -= 1
-        elif key == curses.KEY_RIGHT:
-            player_x += 1
-
-        current_tile = (player_x, player_y)
-
-        # Only trigger battle if in a bush zone
-        for zone_name, zone in bush_zones.items():
-            if current_tile in zone["tiles"]:
-                level_range = zone["level_range"]
-
-                # Determine monster list and spawn chance
-                if zone_name == "slime":
-                    if random.random() < 0.20:
-                        if not battle(stdscr, "Slime", stats, inventory, player_skills, level_range):
-                            player_x, player_y = 0, 0
-                elif zone_name == "goblin":
-                    if random.random() < 0.10:
-                        if not battle(stdscr, "Goblin", stats, inventory, player_skills, level_range):
-                            player_x, player_y = 0, 0
-                elif zone_name == "orc":
-                    if random.random() < 0.08:
-                        if not battle(stdscr, "Orc", stats, inventory, player_skills, level_range):
-                            player_x, player_y = 0, 0
-                elif zone_name == "mixed":
-                    if random.random() < 0.15:
-                        monsters = [("Slime", 0.4), ("Goblin", 0.3), ("Kobold", 0.2), ("Orc", 0.1)]
-                        chosen = pick_monster(monsters)
-                        if not battle(stdscr, chosen, stats, inventory, player_skills, level_range):
-                            player_x, player_y = 0, 0
-                break  # Only one zone can apply
-            
-#Starts the game
-curses.wrapper(main)
\ No newline at end of file
+        elif key in MOVES:
+            dx, dy = MOVES[key]
+            self.player_x += dx
+            self.player_y += dy
+
+        self.sync_skills()
+
+        # Menus draw over the map, so the next frame has to be drawn in full
+        if key not in MOVES:
+            self.renderer.invalidate()
+
+        if not await self.meet_roamer(self.roamers.at(self.player_x, self.player_y)):
+            await self.check_encounter()
+        self.visit_tile()
+        if message:
+            self.npc_lines.append(message)
+        self.record_changes()
+        return True
+
+    #Fights a monster, losing sends the player back to the start
+    async def fight(self, monster_name, level_range):
+        self.renderer.invalidate()
+        won = await battle(self.stdscr, monster_name, self.stats, self.inventory, self.player_skills, level_range,
+                     self.scheduler, self.streams)
+        if not won:
+            self.player_x, self.player_y = 0, 0
+            self.route = []
+        # xp, level ups and quest progress are worth keeping
+        self.changed()
+        return won
+
+    #Fights the roaming monster in slot, if there is one. Beaten ones are gone
+    #for good, one that wins goes back home.
+    async def meet_roamer(self, slot):
+        if slot is None:
+            return False
+        roamers = self.roamers
+        level = roamers.level[slot]
+        if await self.fight(roamers.species[slot], (level, level)):
+            roamers.remove(slot)
+        else:
+            roamers.send_home(slot)
+        return True
+
+    #Moves the monsters near the player, any that reach the player attack
+    async def roam(self):
+        for name, zone in world.zones_near(self.player_x, self.player_y, ACTIVE_RADIUS):
+            self.roamers.populate_zone(name, zone)
+        moved, contact = self.roamers.tick(self.player_x, self.player_y)
+        if await self.meet_roamer(contact):
+            self.visit_tile()
+            return True
+        return moved > 0
+
+    # Only trigger battle if in a bush zone
+    async def check_encounter(self):
+        with PROFILER.timer("encounter"):
+            encounter = self.roll_encounter()
+        if encounter is None:
+            return False
+        await self.fight(*encounter)
+        return True
+
+    #Returns (monster name, level range) when something attacks, else None
+    def roll_encounter(self):
+        zone_name = world.zone_at(self.player_x, self.player_y)
+        if zone_name is None:
+            return None
+        zone = world.zone(zone_name)
+        monster = zone["encounters"].roll(self.streams.encounter, self.streams.pick)
+        if monster is None:
+            return None
+        return monster, zone["level_range"]
+
+    #Everywhere auto-travel can go, nearest first: markers, npcs and the
+    #closest tile of each zone
+    def destinations(self):
+        here = (self.player_x, self.player_y)
+        def distance(pos):
+            return abs(pos[0] - here[0]) + abs(pos[1] - here[1])
+        found = [("Start", pos) for pos in landmarks['*']]
+        found += [(f"Marker {i}", pos) for i, pos in enumerate(self.markers, 1)]
+        found += [(npc_label(npc), pos) for pos, npc in list(npcs.items()) + list(world.quest_items())]
+        for name, zone in list(bush_zones.items()) + list(world.zones.items()):
+            found.append((f"{name.capitalize()} bushes", min(zone["tiles"], key=distance)))
+        found.sort(key=lambda item: distance(item[1]))
+        return found
+
+    #What a tile costs auto-travel
+    def travel_cost(self, x, y):
+        if self.avoid_bushes and world.zone_at(x, y) is not None:
+            return BUSH_COST
+        return 1
+
+    #Asks where to go and works out the way there
+    async def plan_travel(self):
+        choice = await travel_menu(self.stdscr, self.destinations(), self.avoid_bushes)
+        if choice is None:
+            return
+        goal, self.avoid_bushes = choice
+        path = self.paths.get((self.player_x, self.player_y), goal, self.travel_cost, world.version,
+                              self.avoid_bushes)
+        if path is None:
+            self.npc_lines.append("Can't find a way there.")
+        else:
+            self.route = path[::-1]
+
+    #Walks the next part of the route, redrawing once per call
+    async def travel(self):
+        if not self.route:
+            return False
+        for _ in range(TRAVEL_STEPS):
+            x, y = self.route.pop()
+            if abs(x - self.player_x) + abs(y - self.player_y) != 1:
+                self.route = []  # knocked off the path
+                break
+            self.player_x, self.player_y = x, y
+            # losing a fight ends the trip, fight() clears the route
+            if not await self.meet_roamer(self.roamers.at(x, y)):
+                await self.check_encounter()
+            if not self.route:
+                break
+        self.visit_tile()
+        self.record_changes()
+        return True
+
+    #Standing still in a bush can still get you attacked
+    async def idle_encounter(self):
+        if await self.check_encounter():
+            self.visit_tile()
+            return True
+        return False
+
+    #Mana comes back slowly while walking around
+    def regen(self):
+        stats = self.stats
+        if stats["current_mana"] < stats["mana"]:
+            stats["current_mana"] += 1
+            self.record_changes()
+            return True
+        return False
+
+    def autosave(self):
+        if self.journal is None:
+            self.saver.request(self.snapshot())
+        elif len(self.journal):
+            self.compact()
+        return False
+
+    #What a replay has to end up with, in plain json types
+    def state_digest(self):
+        return json.loads(json.dumps({
+            "stats": saved_stats(self.stats, self.inventory),
+            "x": self.player_x,
+            "y": self.player_y,
+            "inventory": [[item.name, item.damage, item.dex, item.crit, item.mana] for item in self.inventory],
+            "quests": {f"{x},{y}": [npc["quest"].get("progress", 0), npc["quest"].get("completed", False),
+                                    npc["quest"].get("accepted", False), npc.get("reward_given", False)]
+                       for (x, y), npc in npcs.items() if "quest" in npc},
+            "skills": custom_skill_names(self.player_skills),
+            "explored": len(self.explored),
+            "world": world.to_state(),
+            "roamers": len(self.roamers),
+        }))
+
+    #Writes everything out before the game exits, False if some of it didn't make it
+    def close(self):
+        if self.journal is not None:
+            self.record_changes()
+            self.compact(immediate=True)
+            self.journal.close()
+        saved = self.saver.close()
+        manual_saved = self.manual_saver.close()
+        return saved and manual_saved
+
+#Everything load_game returns, for a game that starts from scratch. Journals
+#of an earlier game are deleted, they are no use to this one.
+def start_new_game():
+    stats, inventory, player_x, player_y = new_game()
+    world.reset(STREAMS.get("world").getrandbits(32))
+    remove_journals(JOURNAL_FILE)
+    #This remembers where the player has been
+    return stats, player_x, player_y, inventory, ExploredMap(), None, 0, new_lineage()
+
+#This sets the cursor state
+def main(stdscr):
+    curses.curs_set(0)
+    stdscr.nodelay(0)
+    stdscr.keypad(True)
+    curses.start_color()
+    curses.init_pair(1, curses.COLOR_GREEN, curses.COLOR_BLACK)
+
+    STREAMS.reseed(SEED)
+    choice = start_menu(stdscr)
+    while choice == "New Game" and not confirm_new_game(stdscr):
+        choice = start_menu(stdscr)
+    if choice == "Load Game":
+        loaded = load_game()
+        if loaded:
+            stats, player_x, player_y, inventory, explored, skill_names, generation, lineage = loaded
+        else:
+            stdscr.addstr(0, 0, "No save found. Starting new game.")
+            stdscr.refresh()
+            time.sleep(1)
+            choice = "New Game"
+    elif choice == "Quit":
+        return
+    if choice == "New Game":
+        stats, player_x, player_y, inventory, explored, skill_names, generation, lineage = start_new_game()
+
+    recorder = None
+    if RECORD_FILE:
+        # the replay starts from a save of exactly this state
+        start = snapshot_game(stats, player_x, player_y, explored, inventory)
+        start["skills"] = skill_names
+        recorder = InputRecorder(RECORD_FILE, STREAMS.seed, encode_save(start))
+
+    stdscr = AsyncScreen(stdscr, sys.stdin.fileno(), recorder)
+    game = Game(stdscr, stats, inventory, player_x, player_y, explored, skill_names, generation, lineage=lineage)
+    loop = AsyncGameLoop(game, stdscr, profiler=PROFILER, recorder=recorder)
+    loop.every(REGEN_INTERVAL, game.regen)
+    loop.every(AUTOSAVE_INTERVAL, game.autosave)
+    loop.every(ENCOUNTER_INTERVAL, game.idle_encounter)
+    loop.every(ROAM_INTERVAL, game.roam)
+    loop.every(TRAVEL_INTERVAL, game.travel, when=lambda: game.route)
+    saved = False
+    try:
+        asyncio.run(loop.run())
+    finally:
+        if recorder is not None:
+            recorder.finish(game.state_digest())
+        saved = game.close()
+        if PROFILE_FILE:
+            PROFILER.export(PROFILE_FILE)
+    if not saved:
+        return game.save_problems() or ["Saving failed."]
+
+#Starts the game, and says so if the last save didn't make it to disk
+if __name__ == "__main__":
+    problems = curses.wrapper(main)
+    if problems:
+        print("\n".join(problems), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,201 @@
+#Balancing sweeps. Simulates whole playthroughs (walk the bushes, fight,
+#level up, spend skill points) for every combination of spawn rate, zone level
+#shift and stat build on the command line, spread over a process pool, and
+#prints how fast each one levels and how often it dies.
+#
+#  python balance_sweep.py --spawn-scale 0.5 1 2 --level-shift -2 0 2 --builds balanced attack tank
+#
+#A playthrough works in steps, one step is one encounter roll in the hardest
+#zone the player is levelled for. Dying costs the xp the real game takes and
+#RESPAWN_STEPS steps to walk back. Each step outside a fight gives back one mana.
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+from core import new_game, spend_skill_point
+from bestiary import create_monster
+from battle_engine import run_battle, greedy_policy
+from skills import learn_class_skills
+from encounters import EncounterTable
+from content import CONTENT
+
+RESPAWN_STEPS = 20
+
+#The map's bush zones from the content packs, easiest first
+ZONES = sorted(((name, zone["level_range"], zone["monsters"], zone["spawn_chance"])
+                for name, zone in CONTENT.zones.items()), key=lambda zone: zone[1])
+
+#Where skill points go, as weights per stat
+BUILDS = {
+    "balanced": {"hp": 1, "attack": 1, "defense": 1, "speed": 1, "mana": 1},
+    "attack": {"attack": 3, "hp": 1},
+    "tank": {"hp": 2, "defense": 2, "attack": 1},
+    "speed": {"speed": 2, "attack": 1},
+}
+
+#One point to the stat that is furthest behind its share of the build
+def spend_points(stats, build, spent):
+    while stats["skill_points"] > 0:
+        stat = min(build, key=lambda name: spent.get(name, 0) / build[name])
+        spend_skill_point(stats, stat)
+        spent[stat] = spent.get(stat, 0) + 1
+
+#(name, level range, encounter table) per zone, with the sweep's settings applied
+def _zones(level_shift, spawn_scale):
+    zones = []
+    for name, (low, high), monsters, chance in ZONES:
+        level_range = (max(low + level_shift, 1), max(high + level_shift, 1))
+        table = EncounterTable.from_zone({"spawn_chance": min(chance * spawn_scale, 1.0),
+                                          "monsters": monsters, "level_range": level_range})
+        zones.append((name, level_range, table))
+    return zones
+
+#The hardest zone the player's level reaches, or the easiest one
+def _pick_zone(zones, level):
+    chosen = zones[0]
+    for zone in zones:
+        if zone[1][0] <= level:
+            chosen = zone
+    return chosen
+
+#Plays one run and returns its numbers
+def playthrough(config, seed):
+    rng = random.Random(seed)
+    zones = _zones(config["level_shift"], config["spawn_scale"])
+    build = BUILDS[config["build"]]
+    stats, inventory, _, _ = new_game()
+    inventory.wield(inventory[0])
+    stats["class_path"] = config["class_path"]
+    skills = learn_class_skills(config["class_path"])
+    policy = greedy_policy if skills else None
+    spent = {}
+    reached = {}
+    targets = sorted(config["target_levels"])
+    steps = fights = deaths = xp = 0
+
+    while steps < config["max_steps"] and len(reached) < len(targets):
+        steps += 1
+        if stats["current_mana"] < stats["mana"]:
+            stats["current_mana"] += 1
+        _, level_range, table = _pick_zone(zones, stats["level"])
+        name = table.roll(rng)
+        if name is None:
+            continue
+        monster = create_monster(name, level_range, rng)
+        result = run_battle(monster, stats, inventory, skills, policy)
+        fights += 1
+        steps += 1  # the fight itself takes a step
+        if result.won:
+            xp += result.xp_gain
+            if result.leveled_up:
+                spend_points(stats, build, spent)
+                for target in targets:
+                    if target not in reached and stats["level"] >= target:
+                        reached[target] = steps
+        else:
+            deaths += 1
+            steps += RESPAWN_STEPS
+
+    return {"steps": steps, "fights": fights, "deaths": deaths, "xp": xp,
+            "level": stats["level"], "reached": reached}
+
+#Pool worker: a batch of seeds for one config
+def _run_batch(job):
+    index, config, seeds = job
+    return index, [playthrough(config, seed) for seed in seeds]
+
+def summarize(config, runs):
+    steps = sum(run["steps"] for run in runs)
+    fights = sum(run["fights"] for run in runs)
+    row = {
+        "spawn_scale": config["spawn_scale"],
+        "level_shift": config["level_shift"],
+        "build": config["build"],
+        "runs": len(runs),
+        "death_rate": sum(run["deaths"] for run in runs) / fights if fights else 0.0,
+        "xp_per_step": sum(run["xp"] for run in runs) / steps if steps else 0.0,
+        "fights_per_step": fights / steps if steps else 0.0,
+        "final_level": statistics.mean(run["level"] for run in runs),
+    }
+    for target in config["target_levels"]:
+        times = [run["reached"][target] for run in runs if target in run["reached"]]
+        row[f"L{target}_reached"] = len(times) / len(runs)
+        row[f"L{target}_steps"] = statistics.median(times) if times else None
+    return row
+
+def print_table(rows):
+    if not rows:
+        return
+    columns = list(rows[0])
+    cells = [[_format(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+def _format(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep spawn rates, zone levels and stat builds over simulated playthroughs.")
+    parser.add_argument("--spawn-scale", dest="spawn_scale", nargs="+", type=float, default=[1.0],
+                        help="multipliers for every zone's spawn chance")
+    parser.add_argument("--level-shift", dest="level_shift", nargs="+", type=int, default=[0],
+                        help="added to every zone's level range")
+    parser.add_argument("--builds", nargs="+", choices=sorted(BUILDS), default=sorted(BUILDS))
+    parser.add_argument("--class-path", dest="class_path", choices=CONTENT.class_names())
+    parser.add_argument("--runs", type=int, default=100, help="playthroughs per combination")
+    parser.add_argument("--max-steps", dest="max_steps", type=int, default=5000)
+    parser.add_argument("--target-levels", dest="target_levels", nargs="+", type=int, default=[3, 5, 8, 10])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes (default: every core)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="also write the table to this file")
+    args = parser.parse_args(argv)
+
+    configs = [
+        {"spawn_scale": scale, "level_shift": shift, "build": build, "class_path": args.class_path,
+         "max_steps": args.max_steps, "target_levels": args.target_levels}
+        for scale, shift, build in itertools.product(args.spawn_scale, args.level_shift, args.builds)
+    ]
+    # every combination plays the same seeds, so differences come from the settings
+    seeds = [args.seed * 1000003 + i for i in range(args.runs)]
+    # about four jobs per worker, so a slow combination doesn't leave cores idle
+    batches = max(1, -(-args.workers * 4 // len(configs)))
+    batch = max(1, -(-args.runs // batches))
+    jobs = [(index, config, seeds[start:start + batch])
+            for index, config in enumerate(configs) for start in range(0, args.runs, batch)]
+
+    start = time.perf_counter()
+    results = [[] for _ in configs]
+    if args.workers > 1:
+        with multiprocessing.Pool(args.workers) as pool:
+            for index, runs in pool.imap_unordered(_run_batch, jobs):
+                results[index].extend(runs)
+    else:
+        for job in jobs:
+            index, runs = _run_batch(job)
+            results[index].extend(runs)
+    elapsed = time.perf_counter() - start
+
+    rows = [summarize(config, runs) for config, runs in zip(configs, results)]
+    print_table(rows)
+    print(f"{len(configs) * args.runs} playthroughs in {elapsed:.1f}s on {args.workers} worker(s)")
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import argparse
+import random
+import time
+
+from core import gain_xp, new_game
+from bestiary import create_monster, xp_reward
+from content import CONTENT
+from skills import learn_class_skills
+
+#Holds everything that changes during one fight, no curses in here
+class BattleState:
+    def __init__(self, monster, stats, inventory, skills):
+        self.monster = monster
+        self.stats = stats
+        self.skills = skills
+        self.player_hp = stats["hp"]
+        self.monster_hp = monster.hp
+        self.weapon_damage = inventory.weapon_damage()
+
+        # cooldowns tracked by skill.name
+        self.skill_cooldowns = {skill.name: 0 for skill in skills}
+        self.last_action = "attack"  # default action
+
+        # --- One-turn empower state ---
+        self.empowered_mult = 1.0
+        self.empowered_turns = 0  # when >0, apply on next 'attack' and then reset
+        self.turns = 0
+
+    def over(self):
+        return self.player_hp <= 0 or self.monster_hp <= 0
+
+    def won(self):
+        return self.player_hp > 0
+
+    def skill_ready(self, skill):
+        return (
+            self.stats["level"] >= skill.level_required
+            and self.stats["current_mana"] >= skill.mana_cost
+            and self.skill_cooldowns.get(skill.name, 0) == 0
+        )
+
+#What happened at the end of a fight
+class BattleResult:
+    def __init__(self, won, turns, player_hp, xp_gain=0, leveled_up=False, lost_xp=0):
+        self.won = won
+        self.turns = turns
+        self.player_hp = player_hp
+        self.xp_gain = xp_gain
+        self.leveled_up = leveled_up
+        self.lost_xp = lost_xp
+
+def _basic_damage(state, bonus=0):
+    base = state.stats["attack"] + bonus - state.monster.defense
+    return max(int(base), 1)
+
+#Resolves the player's action for one turn and returns the message to show
+def _player_turn(state):
+    stats = state.stats
+    monster = state.monster
+
+    if state.last_action == "attack":
+        # include monster.defense so debuffs matter
+        base = stats["attack"] + state.weapon_damage - monster.defense
+        dmg = max(int(base * (state.empowered_mult if state.empowered_turns > 0 else 1.0)), 1)
+        state.monster_hp -= dmg
+        if state.empowered_turns > 0:
+            state.empowered_turns = 0
+            state.empowered_mult = 1.0
+            return f"Empowered strike! You attack for {dmg} damage!"
+        return f"You attack for {dmg} damage!"
+
+    # Using a skill by name
+    skill_obj = next((sk for sk in state.skills if sk.name == state.last_action), None)
+
+    if not skill_obj:
+        # safety fallback
+        dmg = _basic_damage(state, state.weapon_damage)
+        state.monster_hp -= dmg
+        state.last_action = "attack"
+        return f"(Unknown skill) You attack for {dmg} damage."
+
+    # Check requirements BEFORE applying effects
+    if not state.skill_ready(skill_obj):
+        # fallback basic attack if skill not available
+        dmg = _basic_damage(state, state.weapon_damage)
+        state.monster_hp -= dmg
+        state.last_action = "attack"
+        return f"{skill_obj.custom_name} unavailable, you attack for {dmg} damage!"
+
+    # pay costs & set cooldowns
+    stats["current_mana"] -= skill_obj.mana_cost
+    state.skill_cooldowns[skill_obj.name] = skill_obj.cooldown
+    # every skill hands the next turn back to a normal attack
+    state.last_action = "attack"
+
+    # --- Handle effects ---
+    if skill_obj.effect == "damage_buff":
+        # buff the NEXT attack only
+        state.empowered_mult = float(skill_obj.power or 1.8)
+        state.empowered_turns = 1
+        return "Your entire body glows with power! Your next attack will be stronger."
+
+    if skill_obj.effect == "mons_defense_debuff":
+        # If power < 1.0, treat as multiplicative; else treat as flat reduction
+        p = skill_obj.power
+        if p is None:
+            p = 0.9
+        if p < 1.0:
+            monster.defense = max(0, int(monster.defense * p))
+            return "You weaken the foe's guard! Their defense drops."
+        monster.defense = max(0, monster.defense - int(p))
+        return "You pierce their armor! Their defense drops."
+
+    if skill_obj.effect == "hp_buff":
+        # simple heal based on level or power
+        heal = int(stats["level"] * 2) if skill_obj.power in (None, 0) else int(skill_obj.power)
+        state.player_hp += heal
+        return f"You bless yourself and heal {heal} HP."
+
+    # Example direct-damage skills by name (Fireball, Arcane Bolt), if present
+    if skill_obj.name == "Fireball":
+        dmg = _basic_damage(state, 5)
+        state.monster_hp -= dmg
+        return f"You cast Fireball for {dmg} damage!"
+    if skill_obj.name == "Arcane Bolt":
+        dmg = _basic_damage(state, 3)
+        state.monster_hp -= dmg
+        return f"You fire an Arcane Bolt for {dmg} damage!"
+    # generic active: small hit
+    dmg = _basic_damage(state, 2)
+    state.monster_hp -= dmg
+    return f"You use {skill_obj.custom_name} for {dmg} damage!"
+
+#Plays out one turn: player action, monster action, cooldowns and mana regen.
+#Returns (player message, monster message or None) for the frontend to draw.
+def resolve_turn(state):
+    stats = state.stats
+    monster = state.monster
+    state.turns += 1
+
+    player_msg = _player_turn(state)
+
+    # --- Monster action ---
+    monster_msg = None
+    if state.monster_hp > 0:
+        incoming = max(monster.attack - stats["defense"], 1)
+        state.player_hp -= incoming
+        monster_msg = f"{monster.name} hits you for {incoming} damage!"
+
+    # --- Cooldowns tick ---
+    cooldowns = state.skill_cooldowns
+    for name in cooldowns:
+        if cooldowns[name] > 0:
+            cooldowns[name] -= 1
+
+    # --- Mana regen (1 per turn) ---
+    if stats["current_mana"] < stats["mana"]:
+        stats["current_mana"] = min(stats["mana"], stats["current_mana"] + 1)
+
+    return player_msg, monster_msg
+
+#Hands out xp (or takes it away) and moves kill quests along
+def finish_battle(state, quests=None):
+    stats = state.stats
+    monster = state.monster
+    if state.won():
+        xp_gain = xp_reward(monster)
+
+        leveled_up = gain_xp(stats, xp_gain)
+
+        # Quest progress, elites count for their species
+        if quests is not None:
+            quests.kill(monster.species.name)
+
+        return BattleResult(True, state.turns, state.player_hp, xp_gain=xp_gain, leveled_up=leveled_up)
+
+    lost_xp = stats["xp"] // 2
+    stats["xp"] -= lost_xp
+    return BattleResult(False, state.turns, state.player_hp, lost_xp=lost_xp)
+
+#Picks the first skill that is ready, otherwise a normal attack
+def greedy_policy(state):
+    for skill in state.skills:
+        if state.skill_ready(skill):
+            return skill.name
+    return "attack"
+
+#Runs a whole fight with no screen. policy(state) picks the action each turn,
+#leave it out to just repeat the last action like the real battle does.
+def run_battle(monster, stats, inventory, skills, policy=None, quests=None, max_turns=10000):
+    state = BattleState(monster, stats, inventory, skills)
+    while not state.over() and state.turns < max_turns:
+        if policy is not None:
+            state.last_action = policy(state)
+        resolve_turn(state)
+    return finish_battle(state, quests)
+
+#Fights the same monster type over and over from one stat block and sums it up.
+#Every fight starts from a fresh copy of stats so they don't leak into each other.
+#The monsters are rolled from their own random.Random(seed), the module's
+#generator is left alone.
+def simulate(monster_name, stats, inventory, skills, level_range=(1, 1), fights=1000, policy=None, seed=None):
+    rng = random.Random(seed)
+    wins = 0
+    total_turns = 0
+    total_xp = 0
+    hp_left = 0
+    elites = 0
+    for _ in range(fights):
+        monster = create_monster(monster_name, level_range, rng)
+        elites += monster.elite
+        result = run_battle(monster, dict(stats), inventory, skills, policy)
+        total_turns += result.turns
+        if result.won:
+            wins += 1
+            total_xp += result.xp_gain
+            hp_left += result.player_hp
+    return {
+        "monster": monster_name,
+        "level_range": list(level_range),
+        "fights": fights,
+        "wins": wins,
+        "win_rate": wins / fights if fights else 0.0,
+        "avg_turns": total_turns / fights if fights else 0.0,
+        "avg_xp": total_xp / wins if wins else 0.0,
+        "avg_hp_left": hp_left / wins if wins else 0.0,
+        "elites": elites,
+    }
+
+#Headless entry point, e.g. python battle_engine.py Goblin --levels 4 6 --fights 10000
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve fights without a terminal.")
+    parser.add_argument("monster")
+    parser.add_argument("--levels", nargs=2, type=int, default=(1, 1), metavar=("MIN", "MAX"))
+    parser.add_argument("--fights", type=int, default=1000)
+    parser.add_argument("--class-path", dest="class_path", choices=CONTENT.class_names())
+    parser.add_argument("--player-level", type=int, default=1)
+    parser.add_argument("--skills", action="store_true", help="use skills whenever they are ready")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    stats, inventory, _, _ = new_game()
+    stats["level"] = args.player_level
+    stats["class_path"] = args.class_path
+    inventory.wield(inventory[0])
+    skills = learn_class_skills(args.class_path)
+
+    start = time.perf_counter()
+    summary = simulate(args.monster, stats, inventory, skills, tuple(args.levels), args.fights,
+                       greedy_policy if args.skills else None, args.seed)
+    elapsed = time.perf_counter() - start
+
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    print(f"fights/sec: {args.fights / elapsed:.0f}" if elapsed else "fights/sec: inf")
+
+if __name__ == "__main__":
+    main()
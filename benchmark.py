@@ -0,0 +1,316 @@
+#Benchmarks for the parts of the game that run all the time: drawing the map,
+#battles, levelling, spawning monsters, moving the roaming ones, saving,
+#loading content packs and the inventory menu. Everything runs against a
+#FakeScreen in a scratch directory, so no terminal is needed and no real save
+#is touched. Battles never wait: FakeScreen answers getch straight away.
+#
+#  python benchmark.py                      writes bench_output.txt (json)
+#  python benchmark.py --baseline old.txt   also compares against an earlier run
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import Project_Beta as game_module
+from core import Item, gain_xp, new_game
+from bestiary import create_monster
+from content import CONTENT, load_content
+from inventory import Inventory, InventoryView
+from explored import ExploredMap
+from fake_screen import FakeScreen
+from game_loop import AsyncScreen
+from quests import build_quest_bus
+from rng import RandomStreams
+from roamers import RoamerPool
+from scheduler import TickScheduler
+from skills import learn_class_skills
+
+VIEWPORT_SIZES = [(20, 10), (40, 20), (80, 40)]
+XP_AWARDS = [10 ** 3, 10 ** 5, 10 ** 7]
+MONSTERS = ["Slime", "Goblin", "Orc"]
+#(explored tiles, inventory items) for the save/load round trips
+SAVE_SIZES = {"small": (100, 1), "medium": (10000, 100), "large": (250000, 2000)}
+#Roaming monsters spread over a ROAM_AREA x ROAM_AREA square around the player
+ROAMER_COUNTS = [1000, 10000, 50000]
+ROAM_AREA = 1024
+INVENTORY_SIZES = [100, 1000, 10000]
+#Entries per file in the generated content packs
+PACK_SIZES = {"base": 10, "large": 2000, "huge": 20000}
+
+#Runs fn number times per repeat, per-op times come from the fastest repeat
+def measure(name, params, fn, number, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        "name": name,
+        "params": params,
+        "number": number,
+        "repeat": repeat,
+        "best_s": best,
+        "median_s": statistics.median(times),
+        "per_op_us": best / number * 1e6,
+        "ops_per_s": number / best if best else float("inf"),
+    }
+
+#Runs the body inside a throwaway directory, where Game keeps its save and journal
+@contextmanager
+def scratch_dir():
+    old = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rpg-bench-") as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(old)
+
+def _player():
+    stats, inventory, _, _ = new_game()
+    inventory.wield(inventory[0])
+    return stats, inventory
+
+def bench_render(scale):
+    results = []
+    with scratch_dir():
+        for width, height in VIEWPORT_SIZES:
+            stdscr = FakeScreen(height=height + 20, width=max(width * 2, 200))
+            stats, inventory = _player()
+            game = game_module.Game(stdscr, stats, inventory, 0, 0, ExploredMap())
+            game.viewport_width, game.viewport_height = width, height
+            params = {"width": width, "height": height}
+            number = max(int(200 * scale), 1)
+
+            def full():
+                game.renderer.invalidate()
+                game.draw()
+            before, bytes_before = stdscr.calls["addstr"], stdscr.bytes_written
+            results.append(measure("render_full", params, full, number, 5))
+            results[-1]["addstr_per_op"] = (stdscr.calls["addstr"] - before) / (number * 5)
+            results[-1]["bytes_per_op"] = (stdscr.bytes_written - bytes_before) / (number * 5)
+
+            # walking back and forth, the renderer only rewrites what moved
+            steps = [1, -1]
+            def scroll():
+                game.player_x += steps[game.player_x & 1]
+                game.draw()
+            game.draw()
+            before, bytes_before = stdscr.calls["addstr"], stdscr.bytes_written
+            results.append(measure("render_scroll", params, scroll, number, 5))
+            results[-1]["addstr_per_op"] = (stdscr.calls["addstr"] - before) / (number * 5)
+            results[-1]["bytes_per_op"] = (stdscr.bytes_written - bytes_before) / (number * 5)
+            game.close()
+    return results
+
+def bench_battle(scale):
+    results = []
+    skills = learn_class_skills(None)
+    number = max(int(200 * scale), 1)
+    # one event loop for every fight, starting one is slower than a short battle
+    loop = asyncio.new_event_loop()
+    # kills go to copies of the npcs, the game's own quests and dice are left alone
+    quests = build_quest_bus(CONTENT.npc_dicts())
+    for monster_name in MONSTERS:
+        for auto in (False, True):
+            streams = RandomStreams(0)
+            def fight():
+                stats, inventory = _player()
+                stdscr = AsyncScreen(FakeScreen(idle_key=ord(' ')))
+                loop.run_until_complete(game_module.battle(stdscr, monster_name, stats, inventory, skills, (1, 3),
+                                                           TickScheduler(auto=auto), streams, quests))
+            results.append(measure("battle", {"monster": monster_name, "auto": auto}, fight, number, 5))
+    loop.close()
+    return results
+
+def bench_gain_xp(scale):
+    results = []
+    for amount in XP_AWARDS:
+        def award():
+            stats, _ = _player()
+            gain_xp(stats, amount)
+        results.append(measure("gain_xp", {"amount": amount}, award, max(int(50 * scale), 1), 5))
+    return results
+
+def bench_create_monster(scale):
+    results = []
+    for monster_name in MONSTERS:
+        rng = random.Random(0)
+        results.append(measure("create_monster", {"monster": monster_name},
+                               lambda: create_monster(monster_name, (1, 10), rng), max(int(20000 * scale), 1), 5))
+    return results
+
+def bench_save_load(scale):
+    results = []
+    rng = random.Random(0)
+    skills = learn_class_skills(None)
+    with scratch_dir():
+        for size, (tiles, items) in SAVE_SIZES.items():
+            stats, inventory = _player()
+            for i in range(items - 1):
+                inventory.append(Item(f"Sword {i}", i % 20, i % 7, i % 5, i % 3))
+            explored = ExploredMap()
+            spread = int(tiles ** 0.5) * 2
+            marked = 0
+            while marked < tiles:
+                marked += explored.mark(rng.randrange(-spread, spread), rng.randrange(-spread, spread))
+            params = {"size": size, "tiles": tiles, "items": items}
+            number = max(int(20 * scale), 1)
+            results.append(measure("save_game", params,
+                                   lambda: game_module.save_game(stats, 0, 0, explored, inventory, skills), number, 5))
+            results[-1]["file_bytes"] = os.path.getsize(game_module.SAVE_FILE)
+            results.append(measure("load_game", params, game_module.load_game, number, 5))
+    return results
+
+def bench_roamers(scale):
+    results = []
+    rng = random.Random(0)
+    half = ROAM_AREA // 2
+    for count in ROAMER_COUNTS:
+        pool = RoamerPool(0, capacity=count)
+        for i in range(count):
+            x, y = rng.randrange(-half, half), rng.randrange(-half, half)
+            pool.spawn(x, y, "Slime", 1, i)
+        params = {"roamers": count}
+        number = max(int(200 * scale), 1)
+        # the player stays put, only the monsters around it move
+        results.append(measure("roam_tick", params, lambda: pool.tick(0, 0), number, 5))
+        results.append(measure("roam_viewport", params, lambda: pool.in_rect(-10, -5, 9, 4), number, 5))
+    return results
+
+#A made up pack with count species, skills, npcs and zones
+def _write_pack(directory, count):
+    species = [{"name": f"Beast {i}", "hp": 10 + i % 90, "attack": 3 + i % 30, "speed": 1 + i % 10,
+                "defense": 1 + i % 8, "xp": 5 + i % 40, "weight": 1 + i % 4} for i in range(count)]
+    skills = [{"name": f"Skill {i}", "description": "Made up.", "skill_type": "active", "mana_cost": i % 10,
+               "required_class": ("Swordsman", "Mage", "Cleric")[i % 3], "effect": "damage_buff",
+               "duration": 1, "power": 1.5} for i in range(count)]
+    npcs = [{"pos": [1000 + i, 1000], "dialogue": "Hello.",
+             "quest": {"type": "kill", "target": f"Beast {i}", "count": 3, "reward": {"xp": 20, "skill_points": 0}}}
+            for i in range(count)]
+    zones = {f"zone {i}": {"tiles": [[i * 4, 2000, i * 4 + 3, 2000], [i * 4, 2001]], "level_range": [1, 3],
+                           "spawn_chance": 0.1, "monsters": [f"Beast {i}", f"Beast {(i + 1) % count}"]}
+             for i in range(count)}
+    for name, data in (("bestiary.json", species), ("skills.json", skills), ("npcs.json", npcs),
+                       ("zones.json", {"zones": zones, "landmarks": {}})):
+        with open(os.path.join(directory, name), "w") as f:
+            json.dump(data, f)
+
+def bench_content(scale):
+    results = []
+    with scratch_dir() as path:
+        for size, count in PACK_SIZES.items():
+            pack = os.path.join(path, size)
+            os.mkdir(pack)
+            _write_pack(pack, count)
+            cache = os.path.join(pack, ".cache")
+            params = {"size": size, "entries": count}
+            number = max(int(5 * scale), 1)
+            results.append(measure("content_compile", params, lambda: load_content([pack], None), number, 3))
+            load_content([pack], cache)
+            results.append(measure("content_cached", params, lambda: load_content([pack], cache), number, 3))
+    return results
+
+def bench_inventory(scale):
+    results = []
+    rng = random.Random(0)
+    names = ["Rusty", "Iron", "Steel", "Mithril"]
+    for count in INVENTORY_SIZES:
+        inventory = Inventory(Item(f"{rng.choice(names)} Sword {i}", rng.randrange(50), rng.randrange(10),
+                                   rng.randrange(10), rng.randrange(20)) for i in range(count))
+        view = InventoryView(inventory, page_size=30)
+        params = {"items": count}
+        number = max(int(50 * scale), 1)
+
+        def sort():
+            view.next_sort()
+            view.page()
+        results.append(measure("inventory_sort", params, sort, number, 5))
+
+        def search():
+            view.search("")
+            for query in ("s", "st", "ste", "stee", "steel"):
+                view.search(query)
+                view.page()
+        results.append(measure("inventory_search", params, search, number, 5))
+
+        def page():
+            view.move(view.page_size)
+            view.page()
+        results.append(measure("inventory_page", params, page, number * 10, 5))
+    return results
+
+BENCHMARKS = {
+    "render": bench_render,
+    "battle": bench_battle,
+    "gain_xp": bench_gain_xp,
+    "create_monster": bench_create_monster,
+    "save_load": bench_save_load,
+    "roamers": bench_roamers,
+    "content": bench_content,
+    "inventory": bench_inventory,
+}
+
+def _key(result):
+    return result["name"] + " " + json.dumps(result["params"], sort_keys=True)
+
+#Prints how each result compares to the same one in baseline, returns the worst slowdown
+def compare(results, baseline):
+    old = {_key(result): result for result in baseline["results"]}
+    worst = 0.0
+    for result in results:
+        before = old.get(_key(result))
+        if before is None:
+            print(f"{_key(result):<60} new")
+            continue
+        ratio = result["per_op_us"] / before["per_op_us"] if before["per_op_us"] else float("inf")
+        worst = max(worst, ratio)
+        print(f"{_key(result):<60} {before['per_op_us']:12.2f} -> {result['per_op_us']:12.2f} us  x{ratio:.2f}")
+    return worst
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time rendering, battles, levelling, spawning and saving.")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the iteration counts")
+    parser.add_argument("--output", default="bench_output.txt")
+    parser.add_argument("--baseline", help="earlier output file to compare against")
+    parser.add_argument("--fail-above", type=float, dest="fail_above",
+                        help="exit with 1 if anything got slower than this ratio to the baseline")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.only or BENCHMARKS:
+        for result in BENCHMARKS[name](args.scale):
+            print(f"{_key(result):<60} {result['per_op_us']:12.2f} us/op")
+            results.append(result)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "time": time.time(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        worst = compare(results, baseline)
+        if args.fail_above is not None and worst > args.fail_above:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
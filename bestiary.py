@@ -0,0 +1,128 @@
+#Every monster species in one registry: base stats, xp, how often it shows up in
+#mixed zones and how its elite version works. Stat rows for each level are
+#worked out once per species, so spawning is a lookup plus a couple of rolls.
+import random
+
+from content import CONTENT
+
+#Defines a class called Monster that holds the stats of one spawned monster
+class Monster:
+    __slots__ = ("name", "species", "level", "hp", "attack", "speed", "defense", "elite")
+
+    def __init__(self, name, species, level, hp, attack, speed, defense, elite=False):
+        self.name = name
+        self.species = species
+        self.level = level
+        self.hp = hp
+        self.attack = attack
+        self.speed = speed
+        self.defense = defense
+        self.elite = elite
+
+    def __repr__(self):
+        return f"<Monster: {self.name} Lv {self.level}>"
+
+class Species:
+    __slots__ = ("name", "base_hp", "base_attack", "base_speed", "base_def", "xp",
+                 "encounter_weight", "elite_chance", "elite_mult", "rows")
+
+    def __init__(self, name, base_hp, base_attack, base_speed, base_def, xp=5,
+                 encounter_weight=1.0, elite_chance=0.0001, elite_mult=2):
+        self.name = name
+        self.base_hp = base_hp
+        self.base_attack = base_attack
+        self.base_speed = base_speed
+        self.base_def = base_def
+        self.xp = xp
+        self.encounter_weight = encounter_weight
+        self.elite_chance = elite_chance
+        self.elite_mult = elite_mult
+        self.rows = {}  # level -> (hp, attack, speed, defense)
+
+    #Stats at a level: hp +5, attack +2, defense +2 and speed +1 every other level
+    def row(self, level):
+        row = self.rows.get(level)
+        if row is None:
+            row = self.rows[level] = (
+                self.base_hp + level * 5,
+                self.base_attack + level * 2,
+                self.base_speed + level // 2,
+                self.base_def + level * 2,
+            )
+        return row
+
+    def precompute(self, level_range):
+        for level in range(level_range[0], level_range[1] + 1):
+            self.row(level)
+
+    def __repr__(self):
+        return f"<Species: {self.name}>"
+
+#name, hp, attack, speed, defense, xp, weight in mixed zones and optionally elite
+#chance and multiplier, from content/bestiary.json
+SPECIES_TABLE = CONTENT.species_table()
+#Used for any name that isn't in the table
+DEFAULT_SPECIES_STATS = (15, 5, 2, 2, 5, 1.0)
+
+class Bestiary:
+    def __init__(self, table=()):
+        self.species = {}
+        self.unknown = {}
+        for name, *numbers in table:
+            species = Species(name, *numbers[:4], xp=numbers[4], encounter_weight=numbers[5])
+            if len(numbers) > 6:
+                species.elite_chance, species.elite_mult = numbers[6:8]
+            self.register(species)
+
+    def register(self, species):
+        self.species[species.name] = species
+        self.unknown.pop(species.name, None)
+
+    def get(self, name):
+        species = self.species.get(name)
+        if species is None:
+            species = self.unknown.get(name)
+            if species is None:
+                base_hp, base_attack, base_speed, base_def, xp, weight = DEFAULT_SPECIES_STATS
+                species = self.unknown[name] = Species(name, base_hp, base_attack, base_speed, base_def,
+                                                       xp=xp, encounter_weight=weight)
+        return species
+
+    def __contains__(self, name):
+        return name in self.species
+
+    def __iter__(self):
+        return iter(self.species.values())
+
+    #Works out the stat rows for a zone's levels ahead of time
+    def prepare(self, names, level_range):
+        for name in names:
+            self.get(name).precompute(level_range)
+
+    #(name, weight) pairs for picking between several species
+    def encounter_weights(self, names):
+        return [(name, self.get(name).encounter_weight) for name in names]
+
+    #elite_rng rolls for elites, it defaults to rng
+    def spawn(self, name, level_range, rng=random, elite_rng=None):
+        species = self.get(name)
+        level = rng.randint(level_range[0], level_range[1])
+        hp, attack, speed, defense = species.row(level)
+
+        if (elite_rng or rng).random() < species.elite_chance:
+            mult = species.elite_mult
+            return Monster("Elite " + species.name, species, level, hp * mult, attack * mult, speed, defense * mult, elite=True)
+        return Monster(species.name, species, level, hp, attack, speed, defense)
+
+BESTIARY = Bestiary(SPECIES_TABLE)
+
+# Returns the stats of the chosen monster
+def create_monster(name, level_range, rng=random, elite_rng=None):
+    return BESTIARY.spawn(name, level_range, rng, elite_rng)
+
+#XP for beating a monster: base xp + 2 per level, doubled for elites
+def xp_reward(monster):
+    xp_gain = monster.species.xp + (monster.level * 2)
+    if monster.elite:
+        xp_gain *= 2
+    return xp_gain
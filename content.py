@@ -0,0 +1,321 @@
+#Game content from data files instead of Python literals. A content pack is a
+#directory with any of bestiary.json, skills.json, npcs.json and zones.json;
+#the base pack is content/ next to this file and RPG_PACKS can name more
+#(separated like PATH), each one adding to or replacing what came before.
+#
+#Everything is checked when it is loaded (ContentError says which file and
+#entry is wrong) and compiled into a Content registry, with skills grouped by
+#class and npcs by quest type. The registry is stored with marshal in a cache
+#keyed on a hash of every pack file, so a later start with the same files skips
+#the parsing and checking. marshal only reads back plain data, so a cache file
+#someone else wrote can't run code the way a pickle could.
+import hashlib
+import json
+import marshal
+import os
+import sys
+
+from persistence import atomic_write
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content")
+PACK_FILES = ("bestiary.json", "skills.json", "npcs.json", "zones.json")
+CACHE_FILE = os.path.join(CONTENT_DIR, ".cache")
+CACHE_MAGIC = b"RPGC"
+CACHE_VERSION = 3  # bump when Content changes shape, old caches are rebuilt
+
+EFFECTS = (None, "damage_buff", "mons_defense_debuff", "hp_buff")
+QUEST_TYPES = ("kill", "class", "gold")
+#Filled in for anything a species entry leaves out
+SPECIES_DEFAULTS = {"xp": 5, "weight": 1.0, "elite_chance": 0.0001, "elite_mult": 2}
+#Every key an entry may have, anything else is most likely a typo
+SPECIES_KEYS = ("name", "hp", "attack", "speed", "defense", "xp", "weight", "elite_chance", "elite_mult")
+SKILL_KEYS = ("name", "description", "skill_type", "mana_cost", "stamina_cost", "cooldown", "required_class",
+              "rank", "passive", "level_required", "custom_name", "effect", "duration", "power")
+NPC_KEYS = ("pos", "dialogue", "quest")
+QUEST_KEYS = {"kill": ("type", "target", "count", "reward"), "class": ("type", "class_name"), "gold": ("type",)}
+REWARD_KEYS = ("xp", "skill_points")
+ZONES_KEYS = ("zones", "landmarks")
+ZONE_KEYS = ("tiles", "level_range", "spawn_chance", "monsters")
+#Icons the map knows what to do with, 'B' bushes come from the zones
+LANDMARK_ICONS = ("*", "W")
+
+class ContentError(ValueError):
+    pass
+
+#The pack directories in load order
+def pack_dirs():
+    extra = os.environ.get("RPG_PACKS")
+    return [CONTENT_DIR] + [path for path in (extra or "").split(os.pathsep) if path]
+
+#Everything the game is made of, with indexes for the usual questions
+class Content:
+    def __init__(self):
+        self.species = {}  # name -> (name, hp, attack, speed, defense, xp, weight, elite chance, elite mult)
+        self.skills = {}  # name -> Skill keyword arguments
+        self.npcs = {}  # (x, y) -> npc dict, quests included
+        self.zones = {}  # name -> bush zone dict
+        self.landmarks = {}  # icon -> [(x, y)], bushes first
+        self.skills_by_class = {}
+        self.npcs_by_type = {}  # quest type -> [npc pos]
+
+    def build_indexes(self):
+        self.skills_by_class = {}
+        for name, skill in self.skills.items():
+            self.skills_by_class.setdefault(skill["required_class"], []).append(name)
+        self.npcs_by_type = {}
+        for pos, npc in self.npcs.items():
+            quest = npc.get("quest")
+            if quest is not None:
+                self.npcs_by_type.setdefault(quest["type"], []).append(pos)
+        self.landmarks = {'B': [pos for zone in self.zones.values() for pos in zone["tiles"]],
+                          **{icon: positions for icon, positions in self.landmarks.items() if icon != 'B'}}
+
+    def species_table(self):
+        return list(self.species.values())
+
+    def skill_table(self):
+        return list(self.skills.values())
+
+    #Fresh copies of the npcs, a game changes its quests in place
+    def npc_dicts(self):
+        return {pos: json.loads(json.dumps(npc)) for pos, npc in self.npcs.items()}
+
+    #Fresh copies of the bush zones
+    def zone_dicts(self):
+        return {name: {"tiles": list(zone["tiles"]), "level_range": zone["level_range"],
+                       "spawn_chance": zone["spawn_chance"], "monsters": zone["monsters"]}
+                for name, zone in self.zones.items()}
+
+    def class_names(self):
+        return [self.npcs[pos]["quest"]["class_name"] for pos in self.npcs_by_type.get("class", ())]
+
+#--- checking ---
+
+def _fail(path, where, problem):
+    raise ContentError(f"{path}: {where}: {problem}")
+
+def _number(path, where, value, low=None, high=None, whole=False):
+    kinds = int if whole else (int, float)
+    if isinstance(value, bool) or not isinstance(value, kinds):
+        _fail(path, where, f"expected a {'whole ' if whole else ''}number, got {value!r}")
+    if (low is not None and value < low) or (high is not None and value > high):
+        _fail(path, where, f"{value} is out of range")
+    return value
+
+def _text(path, where, value):
+    if not isinstance(value, str) or not value:
+        _fail(path, where, f"expected text, got {value!r}")
+    return value
+
+def _pos(path, where, value):
+    if not isinstance(value, list) or len(value) != 2:
+        _fail(path, where, f"expected [x, y], got {value!r}")
+    return (_number(path, where, value[0], whole=True), _number(path, where, value[1], whole=True))
+
+#[x, y] or a straight line [x1, y1, x2, y2], ends included
+def _positions(path, where, values):
+    if not isinstance(values, list):
+        _fail(path, where, "expected a list of positions")
+    found = []
+    for i, value in enumerate(values):
+        here = f"{where}[{i}]"
+        if isinstance(value, list) and len(value) == 4:
+            x1, y1, x2, y2 = (_number(path, here, n, whole=True) for n in value)
+            if x1 != x2 and y1 != y2:
+                _fail(path, here, "lines have to be straight")
+            found += [(x, y) for x in range(min(x1, x2), max(x1, x2) + 1)
+                      for y in range(min(y1, y2), max(y1, y2) + 1)]
+        else:
+            found.append(_pos(path, here, value))
+    return found
+
+def _entries(path, data):
+    if not isinstance(data, list):
+        _fail(path, "top level", "expected a list")
+    for i, entry in enumerate(data):
+        if not isinstance(entry, dict):
+            _fail(path, f"entry {i}", "expected an object")
+        yield f"entry {i} ({entry.get('name') or entry.get('pos')})", entry
+
+def _known_keys(path, where, entry, keys):
+    for key in entry:
+        if key not in keys:
+            _fail(path, where, f"unknown key {key!r}")
+
+def _load_bestiary(content, path, data):
+    for where, entry in _entries(path, data):
+        _known_keys(path, where, entry, SPECIES_KEYS)
+        row = dict(SPECIES_DEFAULTS, **entry)
+        name = _text(path, f"{where}.name", row.get("name"))
+        numbers = []
+        for key in ("hp", "attack", "speed", "defense", "xp"):
+            if key not in row:
+                _fail(path, where, f"no {key}")
+            numbers.append(_number(path, f"{where}.{key}", row[key], low=0, whole=True))
+        # a zone whose species all weigh 0 could never pick one
+        if _number(path, f"{where}.weight", row["weight"], low=0) == 0:
+            _fail(path, f"{where}.weight", "has to be more than 0")
+        numbers.append(row["weight"])
+        numbers.append(_number(path, f"{where}.elite_chance", row["elite_chance"], 0, 1))
+        numbers.append(_number(path, f"{where}.elite_mult", row["elite_mult"], low=1))
+        content.species[name] = (name, *numbers)
+
+def _load_skills(content, path, data):
+    for where, entry in _entries(path, data):
+        _known_keys(path, where, entry, SKILL_KEYS)
+        for key in ("name", "description", "skill_type"):
+            _text(path, f"{where}.{key}", entry.get(key))
+        for key in ("mana_cost", "stamina_cost", "cooldown", "level_required", "duration"):
+            if key in entry:
+                _number(path, f"{where}.{key}", entry[key], low=0, whole=True)
+        if entry.get("power") is not None:
+            _number(path, f"{where}.power", entry["power"], low=0)
+        if entry.get("effect") not in EFFECTS:
+            _fail(path, f"{where}.effect", f"unknown effect {entry.get('effect')!r}")
+        if entry.get("required_class") is not None:
+            _text(path, f"{where}.required_class", entry["required_class"])
+        content.skills[entry["name"]] = dict(entry, required_class=entry.get("required_class"))
+
+def _load_npcs(content, path, data):
+    for where, entry in _entries(path, data):
+        _known_keys(path, where, entry, NPC_KEYS)
+        pos = _pos(path, f"{where}.pos", entry.get("pos"))
+        npc = {"dialogue": _text(path, f"{where}.dialogue", entry.get("dialogue"))}
+        quest = entry.get("quest")
+        if quest is not None:
+            kind = quest.get("type") if isinstance(quest, dict) else None
+            if kind not in QUEST_TYPES:
+                _fail(path, f"{where}.quest", f"unknown quest type {kind!r}")
+            _known_keys(path, f"{where}.quest", quest, QUEST_KEYS[kind])
+            if kind == "kill":
+                _text(path, f"{where}.quest.target", quest.get("target"))
+                _number(path, f"{where}.quest.count", quest.get("count"), low=1, whole=True)
+                reward = quest.get("reward")
+                if not isinstance(reward, dict):
+                    _fail(path, f"{where}.quest.reward", "expected {xp, skill_points}")
+                _known_keys(path, f"{where}.quest.reward", reward, REWARD_KEYS)
+                for key in ("xp", "skill_points"):
+                    _number(path, f"{where}.quest.reward.{key}", reward.get(key), low=0, whole=True)
+                quest = dict(quest, progress=0, completed=False)
+            elif kind == "class":
+                _text(path, f"{where}.quest.class_name", quest.get("class_name"))
+                quest = dict(quest, accepted=False, completed=False)
+            npc["quest"] = quest
+        content.npcs[pos] = npc
+
+def _load_zones(content, path, data):
+    if not isinstance(data, dict):
+        _fail(path, "top level", "expected {zones, landmarks}")
+    _known_keys(path, "top level", data, ZONES_KEYS)
+    zones = data.get("zones", {})
+    if not isinstance(zones, dict):
+        _fail(path, "zones", "expected an object of zones")
+    for name, zone in zones.items():
+        where = f"zone {name}"
+        if not isinstance(zone, dict):
+            _fail(path, where, "expected an object")
+        _known_keys(path, where, zone, ZONE_KEYS)
+        low, high = _pos(path, f"{where}.level_range", zone.get("level_range"))
+        if not 1 <= low <= high:
+            _fail(path, f"{where}.level_range", f"{[low, high]} is not a level range")
+        monsters = zone.get("monsters")
+        if not isinstance(monsters, list) or not monsters:
+            _fail(path, f"{where}.monsters", "expected a list of species")
+        content.zones[name] = {
+            "tiles": _positions(path, f"{where}.tiles", zone.get("tiles")),
+            "level_range": (low, high),
+            "spawn_chance": _number(path, f"{where}.spawn_chance", zone.get("spawn_chance"), 0, 1),
+            "monsters": tuple(_text(path, f"{where}.monsters", monster) for monster in monsters),
+        }
+    landmarks = data.get("landmarks", {})
+    if not isinstance(landmarks, dict):
+        _fail(path, "landmarks", "expected an object of icons")
+    _known_keys(path, "landmarks", landmarks, LANDMARK_ICONS)
+    for icon, positions in landmarks.items():
+        content.landmarks.setdefault(icon, []).extend(_positions(path, f"landmark {icon}", positions))
+
+LOADERS = {
+    "bestiary.json": _load_bestiary,
+    "skills.json": _load_skills,
+    "npcs.json": _load_npcs,
+    "zones.json": _load_zones,
+}
+
+#Things that have to exist in the finished registry, whichever pack they came from
+def _check_references(content):
+    for pos, npc in content.npcs.items():
+        quest = npc.get("quest") or {}
+        if quest.get("type") == "kill" and quest["target"] not in content.species:
+            raise ContentError(f"npc {list(pos)}: quest target {quest['target']!r} is not in the bestiary")
+    for name, zone in content.zones.items():
+        for monster in zone["monsters"]:
+            if monster not in content.species:
+                raise ContentError(f"zone {name}: {monster!r} is not in the bestiary")
+
+#(path, bytes) of every pack file that exists, in load order
+def _read_files(dirs):
+    found = []
+    for directory in dirs:
+        for name in PACK_FILES:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    found.append((path, f.read()))
+    return found
+
+def _key(files):
+    # marshal's format can change between Python versions
+    digest = hashlib.sha256(f"{CACHE_VERSION} {marshal.version} {sys.version_info[:2]}".encode())
+    for path, data in files:
+        digest.update(os.path.basename(path).encode() + b"\0")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.digest()
+
+#Parses and checks the files into a Content
+def compile_content(files):
+    content = Content()
+    for path, data in files:
+        try:
+            parsed = json.loads(data)
+        except ValueError as e:
+            raise ContentError(f"{path}: {e}") from None
+        LOADERS[os.path.basename(path)](content, path, parsed)
+    _check_references(content)
+    content.build_indexes()
+    return content
+
+def _read_cache(path, key):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:4] != CACHE_MAGIC or data[4:36] != key:
+        return None
+    try:
+        fields = marshal.loads(data[36:])
+    except Exception:
+        return None  # damaged, just build it again
+    content = Content()
+    if not isinstance(fields, dict) or fields.keys() != vars(content).keys():
+        return None
+    vars(content).update(fields)
+    return content
+
+#The registry for these pack directories, from the cache when nothing changed
+def load_content(dirs=None, cache_file=CACHE_FILE):
+    files = _read_files(pack_dirs() if dirs is None else dirs)
+    key = _key(files)
+    if cache_file:
+        content = _read_cache(cache_file, key)
+        if content is not None:
+            return content
+    content = compile_content(files)
+    if cache_file:
+        try:
+            atomic_write(cache_file, CACHE_MAGIC + key + marshal.dumps(vars(content)))
+        except OSError:
+            pass  # a read-only install just compiles every time
+    return content
+
+CONTENT = load_content()
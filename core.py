@@ -0,0 +1,74 @@
+from progression import PROGRESSION
+from inventory import Inventory
+
+class Item:
+    __slots__ = ("name", "damage", "dex", "crit", "mana")
+
+    def __init__(self,name,damage,dex,crit,mana):
+        self.name = name
+        self.damage = damage
+        self.dex = dex
+        self.crit = crit
+        self.mana = mana
+
+class Skill:
+    def __init__(self, name, description, skill_type, mana_cost=0, stamina_cost = 0, cooldown=0,
+                 required_class=None, rank="C", passive=False, level_required=1, custom_name=None, effect = None, duration = 0, power = 1.0):
+        self.name = name
+        self.custom_name = custom_name or name  # Default to original name if no custom name given
+        self.description = description
+        self.skill_type = skill_type
+        self.mana_cost = mana_cost
+        self.stamina_cost = stamina_cost
+        self.cooldown = cooldown
+        self.required_class = required_class
+        self.rank = rank
+        self.passive = passive
+        self.level_required = level_required
+        self.effect = effect
+        self.duration = duration
+        self.power = power
+
+    def __repr__(self):
+        return f"<Skill: {self.custom_name} ({self.rank})>"
+
+#Determines how much xp is given once a monster is defeated
+#Also determines whether someone levels up and how rewards are distributed.
+#All the levels gained are worked out at once, see progression.py.
+def gain_xp(stats, amount, progression=None):
+    return (progression or PROGRESSION).grant(stats, amount) > 0
+
+#What one skill point buys, in the order the upgrade menu lists them
+UPGRADES = [("hp", 2), ("attack", 1), ("defense", 1), ("speed", 1), ("mana", 2)]
+
+#Spends one skill point on stat, returns False if there was none to spend
+def spend_skill_point(stats, stat):
+    if stats["skill_points"] <= 0:
+        return False
+    stats[stat] += dict(UPGRADES)[stat]
+    stats["skill_points"] -= 1
+    return True
+
+def new_game():
+    stats = {
+        "hp": 20,
+        "attack": 5,
+        "defense": 1,
+        "speed": 2,
+        "mana": 10,  # Max mana
+        "current_mana": 10,  # Current mana (changes in battle)
+        "skill_points": 0,
+        "xp": 0,
+        "level": 1,
+        "gold": 1,
+        "class_path": None,
+    }
+    inventory = Inventory()
+    starter_sword = Item("Rusty Sword", damage=3, dex=0, crit=1, mana=0)
+    inventory.append(starter_sword)
+
+    # Starting coordinates
+    player_x, player_y = 0, 0
+
+    return stats, inventory, player_x, player_y
+
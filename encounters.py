@@ -0,0 +1,73 @@
+#Encounter tables. Each zone's spawn chance and species weights are compiled
+#once into an alias table (Vose's method), after which picking a monster is a
+#single random number and two list lookups, however many species the zone has.
+
+from bestiary import BESTIARY
+
+#Weighted choice in O(1) per draw
+class AliasTable:
+    def __init__(self, items, weights):
+        n = len(items)
+        if n == 0:
+            raise ValueError("an alias table needs at least one item")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("weights must add up to more than 0")
+        self.items = list(items)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        scaled = [weight * n / total for weight in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # whatever is left over is 1.0 give or take rounding
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    #u is a uniform number in [0, 1): its whole part picks a column, the rest the coin
+    def pick(self, u):
+        x = u * len(self.items)
+        i = int(x)
+        if i >= len(self.items):
+            i = len(self.items) - 1
+        return self.items[i] if x - i < self.prob[i] else self.items[self.alias[i]]
+
+    def sample(self, rng):
+        return self.pick(rng.random())
+
+    def sample_many(self, n, rng):
+        pick = self.pick
+        draw = rng.random
+        return [pick(draw()) for _ in range(n)]
+
+#One zone: how often something attacks, what it is and at which levels
+class EncounterTable:
+    def __init__(self, spawn_chance, species_weights, level_range):
+        self.spawn_chance = spawn_chance
+        self.level_range = tuple(level_range)
+        self.species = AliasTable([name for name, _ in species_weights], [weight for _, weight in species_weights])
+
+    #From a bush zone dict (spawn_chance, monsters, level_range), weighted by the bestiary
+    @classmethod
+    def from_zone(cls, zone):
+        return cls(zone["spawn_chance"], BESTIARY.encounter_weights(zone["monsters"]), zone["level_range"])
+
+    #The species that attacks on this step, or None. rng rolls for an attack,
+    #pick_rng (default rng) picks the species.
+    def roll(self, rng, pick_rng=None):
+        if rng.random() >= self.spawn_chance:
+            return None
+        return self.species.sample(pick_rng or rng)
+
+    #n steps at once, for simulations: a list of species names and Nones
+    def roll_many(self, n, rng):
+        chance = self.spawn_chance
+        pick = self.species.pick
+        draw = rng.random
+        return [pick(draw()) if draw() < chance else None for _ in range(n)]
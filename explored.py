@@ -0,0 +1,201 @@
+#Remembers which tiles the player has walked on. Tiles are grouped into
+#CHUNK_SIZE x CHUNK_SIZE chunks and each chunk is a bytearray with one bit per
+#tile, so a fully explored chunk of 1024 tiles costs 128 bytes. The number of
+#explored tiles is kept as they are marked, so counting never reads chunks back.
+#A map read from a save keeps the saved bytes and only unpacks a chunk when
+#something looks at it.
+import os
+import struct
+from collections import OrderedDict
+
+from persistence import atomic_write
+
+CHUNK_SIZE = 32
+CHUNK_BYTES = CHUNK_SIZE * CHUNK_SIZE // 8
+MAGIC = b"EXPL"
+VERSION = 1
+_HEADER = struct.Struct("<4sBHI")  # magic, version, chunk size, chunk count
+_CHUNK_KEY = struct.Struct("<ii")
+_ENTRY_SIZE = _CHUNK_KEY.size + CHUNK_BYTES
+
+#Splits a world position into (chunk key, byte index, bit mask)
+def _locate(x, y):
+    cx, lx = divmod(x, CHUNK_SIZE)
+    cy, ly = divmod(y, CHUNK_SIZE)
+    bit = ly * CHUNK_SIZE + lx
+    return (cx, cy), bit >> 3, 1 << (bit & 7)
+
+def _bits(data):
+    return bin(int.from_bytes(data, "little")).count("1")
+
+class ExploredMap:
+    #max_chunks limits how many chunks stay in memory; the least recently used
+    #ones are written to chunk_dir and read back when they are needed again.
+    def __init__(self, max_chunks=None, chunk_dir=None):
+        if max_chunks is not None and chunk_dir is None:
+            raise ValueError("max_chunks needs a chunk_dir to spill chunks into")
+        self.chunks = OrderedDict()
+        self.max_chunks = max_chunks
+        self.chunk_dir = chunk_dir
+        self.spilled = set()
+        self.packed = {}  # key -> offset in packed_data, for chunks from_bytes hasn't unpacked yet
+        self.packed_data = b""
+        self.count = 0  # explored tiles, spilled and packed chunks included
+        if chunk_dir is not None:
+            os.makedirs(chunk_dir, exist_ok=True)
+
+    def _chunk_path(self, key):
+        return os.path.join(self.chunk_dir, f"{key[0]}_{key[1]}.chunk")
+
+    #Returns the chunk for key, loading it from disk or creating it if asked
+    def _chunk(self, key, create=False):
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            if self.max_chunks is not None:
+                self.chunks.move_to_end(key)
+            return chunk
+        if key in self.spilled:
+            chunk = bytearray(self._read_spilled(key))
+            self.spilled.discard(key)
+        elif key in self.packed:
+            chunk = bytearray(self._unpack(key))
+        elif create:
+            chunk = bytearray(CHUNK_BYTES)
+        else:
+            return None
+        self.chunks[key] = chunk
+        self._evict()
+        return chunk
+
+    def _read_spilled(self, key):
+        with open(self._chunk_path(key), "rb") as f:
+            return f.read()
+
+    def _unpack(self, key):
+        offset = self.packed.pop(key)
+        return self.packed_data[offset:offset + CHUNK_BYTES]
+
+    def _evict(self):
+        if self.max_chunks is None:
+            return
+        while len(self.chunks) > self.max_chunks:
+            key, chunk = self.chunks.popitem(last=False)
+            atomic_write(self._chunk_path(key), chunk)
+            self.spilled.add(key)
+
+    #Marks a tile, returns True if it wasn't explored before
+    def mark(self, x, y):
+        key, index, mask = _locate(x, y)
+        chunk = self._chunk(key, create=True)
+        if chunk[index] & mask:
+            return False
+        chunk[index] |= mask
+        self.count += 1
+        return True
+
+    def is_explored(self, x, y):
+        key, index, mask = _locate(x, y)
+        chunk = self._chunk(key)
+        return chunk is not None and bool(chunk[index] & mask)
+
+    def __contains__(self, pos):
+        return self.is_explored(pos[0], pos[1])
+
+    #Number of explored tiles in the rectangle, corners included
+    def count_explored(self, x0, y0, x1, y1):
+        if x0 > x1:
+            x0, x1 = x1, x0
+        if y0 > y1:
+            y0, y1 = y1, y0
+        total = 0
+        for cy in range(y0 // CHUNK_SIZE, y1 // CHUNK_SIZE + 1):
+            for cx in range(x0 // CHUNK_SIZE, x1 // CHUNK_SIZE + 1):
+                chunk = self._chunk((cx, cy))
+                if chunk is None:
+                    continue
+                base_x, base_y = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+                lx0, lx1 = max(x0 - base_x, 0), min(x1 - base_x, CHUNK_SIZE - 1)
+                for ly in range(max(y0 - base_y, 0), min(y1 - base_y, CHUNK_SIZE - 1) + 1):
+                    row = ly * CHUNK_SIZE
+                    for lx in range(lx0, lx1 + 1):
+                        bit = row + lx
+                        if chunk[bit >> 3] & (1 << (bit & 7)):
+                            total += 1
+        return total
+
+    def is_rect_explored(self, x0, y0, x1, y1):
+        area = (abs(x1 - x0) + 1) * (abs(y1 - y0) + 1)
+        return self.count_explored(x0, y0, x1, y1) == area
+
+    def chunk_keys(self):
+        return list(self.chunks.keys()) + list(self.spilled) + list(self.packed)
+
+    def __len__(self):
+        return self.count
+
+    #Raw bits of one chunk, or None if nothing in it was explored
+    def chunk_bytes(self, key):
+        chunk = self._chunk(key)
+        return bytes(chunk) if chunk is not None and any(chunk) else None
+
+    def load_chunk(self, key, data):
+        if len(data) != CHUNK_BYTES:
+            raise ValueError(f"chunk {key} has {len(data)} bytes, expected {CHUNK_BYTES}")
+        old = self.chunks.get(key)
+        if old is None and key in self.spilled:
+            old = self._read_spilled(key)
+        elif old is None and key in self.packed:
+            old = self._unpack(key)
+        if old is not None:
+            self.count -= _bits(old)
+        self.spilled.discard(key)
+        self.chunks[key] = bytearray(data)
+        self.count += _bits(data)
+        self._evict()
+
+    #Spilled and packed chunks are copied as they are, not loaded back in
+    def to_bytes(self):
+        parts = []
+        packed = self.packed_data
+        for key, chunk in list(self.chunks.items()) + [(key, None) for key in self.spilled]:
+            data = bytes(chunk) if chunk is not None else self._read_spilled(key)
+            if any(data):
+                parts.append(_CHUNK_KEY.pack(*key) + data)
+        for key, offset in self.packed.items():
+            data = packed[offset:offset + CHUNK_BYTES]
+            if any(data):
+                parts.append(_CHUNK_KEY.pack(*key) + data)
+        return _HEADER.pack(MAGIC, VERSION, CHUNK_SIZE, len(parts)) + b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, **kwargs):
+        magic, version, chunk_size, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or chunk_size != CHUNK_SIZE:
+            raise ValueError("not an explored map this version can read")
+        offsets = range(_HEADER.size, _HEADER.size + count * _ENTRY_SIZE, _ENTRY_SIZE)
+        if len(data) < offsets.stop:
+            raise ValueError("explored map is cut off")
+        explored = cls(**kwargs)
+        if explored.max_chunks is not None:
+            # spill what doesn't fit as it comes in instead of holding on to all of it
+            for offset in offsets:
+                explored.load_chunk(_CHUNK_KEY.unpack_from(data, offset),
+                                    data[offset + _CHUNK_KEY.size:offset + _ENTRY_SIZE])
+            return explored
+        data = bytes(data)
+        explored.packed = {_CHUNK_KEY.unpack_from(data, offset): offset + _CHUNK_KEY.size for offset in offsets}
+        explored.packed_data = data
+        # every bit of the chunks, less the bits of their keys
+        keys = b"".join(data[offset:offset + _CHUNK_KEY.size] for offset in offsets)
+        explored.count = _bits(data[_HEADER.size:offsets.stop]) - _bits(keys)
+        return explored
+
+    def save(self, path):
+        atomic_write(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read(), **kwargs)
@@ -0,0 +1,83 @@
+#A stand-in for a curses window that keeps everything in memory, so the game
+#can be driven without a terminal (benchmarks, replays). It keeps the text on
+#screen row by row and counts the calls made on it.
+#
+#Keys are handed out in order. A getch that would block with none left returns
+#idle_key, or raises EOFError when there isn't one, instead of hanging; getch
+#in nodelay or timeout mode just returns -1 like the real thing.
+import curses
+from collections import Counter, deque
+
+class FakeScreen:
+    def __init__(self, height=40, width=160, keys=(), idle_key=None):
+        self.height = height
+        self.width = width
+        self.keys = deque(keys)
+        self.idle_key = idle_key
+        self.rows = [""] * height
+        self.calls = Counter()
+        self.bytes_written = 0
+        self.cursor = (0, 0)
+        self.delay = -1  # ms getch waits, -1 = blocks, like timeout()
+        self.nodelay_mode = False
+
+    def push_keys(self, *keys):
+        self.keys.extend(keys)
+
+    #What is on row y right now
+    def text(self, y):
+        return self.rows[y]
+
+    def screen_text(self):
+        return "\n".join(row.rstrip() for row in self.rows)
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def addstr(self, y, x, text, attr=0):
+        self.calls["addstr"] += 1
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("addstr() returned ERR")
+        row = self.rows[y].ljust(x)
+        self.rows[y] = (row[:x] + text + row[x + len(text):])[:self.width]
+        self.bytes_written += len(text)
+        self.cursor = (y, min(x + len(text), self.width - 1))
+
+    def move(self, y, x):
+        self.calls["move"] += 1
+        self.cursor = (y, x)
+
+    def clrtoeol(self):
+        self.calls["clrtoeol"] += 1
+        y, x = self.cursor
+        self.rows[y] = self.rows[y][:x]
+
+    def clear(self):
+        self.calls["clear"] += 1
+        self.rows = [""] * self.height
+
+    def erase(self):
+        self.calls["erase"] += 1
+        self.rows = [""] * self.height
+
+    def refresh(self):
+        self.calls["refresh"] += 1
+
+    def getch(self):
+        self.calls["getch"] += 1
+        if self.keys:
+            return self.keys.popleft()
+        if self.nodelay_mode or self.delay >= 0:
+            return -1
+        if self.idle_key is not None:
+            return self.idle_key
+        raise EOFError("fake screen ran out of keys")
+
+    def nodelay(self, flag):
+        self.nodelay_mode = bool(flag)
+
+    def timeout(self, delay):
+        self.delay = delay
+
+    def keypad(self, flag):
+        pass
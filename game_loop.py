@@ -0,0 +1,208 @@
+#Runs the game on an asyncio event loop. Keys, timers (regen, autosave, idle
+#encounters, anything else registered with every()) and drawing all happen on
+#the one loop thread, so nothing needs a lock.
+#
+#Handlers are coroutines. Menus and battles read their keys with
+#`await stdscr.getch()` on an AsyncScreen, which parks on the event loop until
+#stdin has something instead of polling it. While one key or timer is being
+#handled, other timers skip their ticks and the map isn't drawn over it:
+#menus and battles change the same stats regen and autosave do (regen would
+#heal the player mid fight, an autosave could catch a menu halfway through),
+#and a recording couldn't tell where in the menu's input a tick happened.
+#
+#Once something has been handled the map is redrawn straight away, a key
+#doesn't wait for a frame timer.
+#
+#With a profiler, reading a key is timed as "input", handling it as "update",
+#drawing as "render", and "frame" is the time from a key arriving to the end
+#of the first draw after it.
+#
+#With a recorder (see recording.py), every key handled and every timer run is
+#reported to it, together with the keys menus and battles read meanwhile.
+import asyncio
+import curses
+import inspect
+import time
+
+#A curses window whose getch and getstr can be awaited. Everything else is
+#passed through to the window. Without fd (e.g. a FakeScreen) getch asks the
+#window straight away, which is what replays and tests want.
+class AsyncScreen:
+    def __init__(self, stdscr, fd=None, recorder=None):
+        self.screen = stdscr
+        self.fd = fd
+        self.recorder = recorder
+        self.waiting = []  # futures of everything waiting for stdin, they share one reader
+        if fd is not None:
+            stdscr.nodelay(True)
+
+    #A key if one is waiting, else -1. Never waits and isn't recorded.
+    def poll(self):
+        if self.fd is None:
+            self.screen.nodelay(True)
+            key = self.screen.getch()
+            self.screen.nodelay(False)
+            return key
+        return self.screen.getch()
+
+    def _wake(self):
+        asyncio.get_running_loop().remove_reader(self.fd)
+        waiting, self.waiting = self.waiting, []
+        for ready in waiting:
+            if not ready.done():
+                ready.set_result(True)
+
+    #Waits until stdin can be read, or timeout seconds. False on timeout.
+    async def readable(self, timeout=None):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        if not self.waiting:
+            loop.add_reader(self.fd, self._wake)
+        self.waiting.append(ready)
+        try:
+            return await asyncio.wait_for(ready, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if ready in self.waiting:
+                self.waiting.remove(ready)
+                if not self.waiting:
+                    loop.remove_reader(self.fd)
+
+    #The next key, or -1 once timeout milliseconds pass without one
+    async def getch(self, timeout=None):
+        if self.fd is None:
+            self.screen.timeout(-1 if timeout is None else timeout)
+            key = self.screen.getch()
+            self.screen.timeout(-1)
+        else:
+            deadline = None if timeout is None else time.perf_counter() + timeout / 1000
+            while True:
+                key = self.screen.getch()
+                if key != -1:
+                    break
+                left = None if deadline is None else deadline - time.perf_counter()
+                if (left is not None and left <= 0) or not await self.readable(left):
+                    break
+        if self.recorder is not None:
+            self.recorder.input(key)
+        return key
+
+    #Reads up to n characters typed at (y, x) until Enter, like curses getstr
+    async def getstr(self, y, x, n):
+        text = ""
+        while True:
+            self.screen.addstr(y, x, text + " ")
+            self.screen.move(y, x + len(text))
+            self.screen.refresh()
+            key = await self.getch()
+            if key in (10, 13, curses.KEY_ENTER):
+                return text
+            if key in (curses.KEY_BACKSPACE, 127, 8):
+                text = text[:-1]
+            elif 32 <= key < 127 and len(text) < n:
+                text += chr(key)
+
+    def __getattr__(self, name):
+        return getattr(self.screen, name)
+
+class AsyncGameLoop:
+    #game needs draw() and a handle_key(key) coroutine returning False to quit.
+    #stdscr is the AsyncScreen the game reads from.
+    def __init__(self, game, stdscr, profiler=None, recorder=None):
+        self.game = game
+        self.stdscr = stdscr
+        self.timers = []
+        self.busy = False
+        self.idle = None  # set while nothing is being handled
+        self.redraw = None  # set when the map needs drawing
+        self.running = False
+        self.profiler = profiler
+        self.key_time = None  # when the key the next frame answers arrived
+        self.recorder = recorder
+
+    #Calls callback (a function or a coroutine function) every interval
+    #seconds. A truthy return value asks for a redraw. Ticks that come while
+    #something else is being handled are skipped. With when, a tick is only
+    #run (and recorded) while when() is true.
+    def every(self, interval, callback, when=None):
+        self.timers.append((interval, callback, when))
+
+    #Handles one key or timer tick on its own, event is the (kind, value)
+    #pair the recorder files it under
+    async def handle(self, event, fn, *args):
+        self.busy = True
+        self.idle.clear()
+        if self.recorder is not None:
+            self.recorder.begin(*event)
+        try:
+            result = fn(*args)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            if self.recorder is not None:
+                self.recorder.end()
+            self.busy = False
+            self.idle.set()
+
+    async def _input(self):
+        stdscr = self.stdscr
+        while self.running:
+            await self.idle.wait()
+            start = time.perf_counter()
+            key = stdscr.poll()
+            if key == -1:
+                await stdscr.readable()
+                continue
+            if self.profiler is not None:
+                now = time.perf_counter()
+                self.profiler.record("input", now - start)
+                if self.key_time is None:
+                    self.key_time = now
+            self.running = await self.handle(("key", key), self.game.handle_key, key)
+            if self.profiler is not None:
+                self.profiler.record("update", time.perf_counter() - now)
+            self.redraw.set()
+
+    async def _render(self):
+        while self.running:
+            await self.redraw.wait()
+            self.redraw.clear()
+            if self.busy or not self.running:
+                continue  # whatever is being handled owns the screen, it asks again when done
+            start = time.perf_counter()
+            self.game.draw()
+            if self.profiler is not None:
+                end = time.perf_counter()
+                self.profiler.record("render", end - start)
+                if self.key_time is not None:
+                    self.profiler.record("frame", end - self.key_time)
+                    self.key_time = None
+
+    async def _timer(self, interval, callback, when):
+        while self.running:
+            await asyncio.sleep(interval)
+            if not self.running or self.busy:
+                continue
+            if when is not None and not when():
+                continue
+            if await self.handle(("timer", callback.__name__), callback):
+                self.redraw.set()
+
+    #Plays until handle_key says to stop
+    async def run(self):
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.redraw = asyncio.Event()
+        self.redraw.set()
+        self.running = True
+        background = [asyncio.create_task(self._render())]
+        background += [asyncio.create_task(self._timer(*timer)) for timer in self.timers]
+        try:
+            await self._input()
+        finally:
+            self.running = False
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
@@ -0,0 +1,171 @@
+#The player's items. Inventory keeps them in the order they were picked up and
+#knows which one is wielded by the item itself, not by its position, so
+#sorting or dropping items can't make the player wield the wrong thing. It
+#also keeps every item sorted by each stat in SORT_KEYS, so sorting, "at
+#least this much" filters and paging through thousands of items never sort
+#or scan the whole list on a keypress.
+#
+#InventoryView is what the inventory menu looks through: an order, a filter
+#and a search, with only the visible page drawn.
+from bisect import bisect_left, insort
+
+SORT_KEYS = ("damage", "dex", "crit", "mana", "name")
+
+class Inventory:
+    def __init__(self, items=()):
+        self.items = []
+        self.wielded = None
+        self.order = {}  # item -> when it was added, items compare by identity
+        self.sorted = {key: [] for key in SORT_KEYS}  # key -> [(value, order, item)]
+        self.names = {}  # item -> lower case name, for searching
+        self.added = 0
+        self.changes = 0  # goes up when items come or go, views use it to notice
+        for item in items:
+            self.append(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __contains__(self, item):
+        return item in self.order
+
+    def append(self, item):
+        if item in self.order:
+            raise ValueError(f"{item.name} is already in the inventory")
+        self.added += 1
+        self.order[item] = self.added
+        for key in SORT_KEYS:
+            insort(self.sorted[key], (getattr(item, key), self.added, item))
+        self.names[item] = item.name.lower()
+        self.items.append(item)
+        self.changes += 1
+
+    def remove(self, item):
+        order = self.order.pop(item)
+        for key in SORT_KEYS:
+            entries = self.sorted[key]
+            del entries[bisect_left(entries, (getattr(item, key), order))]
+        del self.names[item]
+        self.items.remove(item)
+        if self.wielded is item:
+            self.wielded = None
+        self.changes += 1
+
+    #Wields item, or puts it away if it already is. Returns whether it is wielded now.
+    def toggle(self, item):
+        self.wielded = None if self.wielded is item else item
+        return self.wielded is item
+
+    def wield(self, item):
+        if item is not None and item not in self.order:
+            raise ValueError(f"{item.name} is not in the inventory")
+        self.wielded = item
+
+    def weapon_damage(self):
+        return self.wielded.damage if self.wielded is not None else 0
+
+    #Where the wielded item is in pick up order, which is how saves store it
+    @property
+    def wielded_index(self):
+        return self.items.index(self.wielded) if self.wielded is not None else None
+
+    #Wields by save position, anything out of range (old saves) wields nothing
+    def wield_index(self, index):
+        self.wielded = self.items[index] if index is not None and 0 <= index < len(self.items) else None
+
+    #Items by key, smallest first, starting at the first with key >= at_least
+    def by(self, key, at_least=None):
+        entries = self.sorted[key]
+        start = 0 if at_least is None else bisect_left(entries, (at_least,))
+        return [entry[2] for entry in entries[start:]]
+
+    #Items whose name contains text, out of items (default: all of them)
+    def search(self, text, items=None):
+        text = text.lower()
+        names = self.names
+        return [item for item in (self.items if items is None else items) if text in names[item]]
+
+#One way of looking at an inventory. The list of matching items is only
+#worked out again when the order, filter or search changes; paging just
+#moves a window over it.
+class InventoryView:
+    def __init__(self, inventory, page_size=10):
+        self.inventory = inventory
+        self.page_size = page_size
+        self.sort_key = None  # None is pick up order
+        self.descending = True
+        self.at_least = None  # filter on sort_key
+        self.query = ""
+        self.matches = None
+        self.base = None  # matches before the search, to narrow from
+        self.seen = None  # inventory.changes the matches were worked out for
+        self.cursor = 0
+
+    def _refresh(self):
+        inventory = self.inventory
+        if self.sort_key is None:
+            base = list(inventory.items)
+        else:
+            base = inventory.by(self.sort_key, self.at_least)
+            if self.descending:
+                base.reverse()
+        self.base = base
+        self.matches = inventory.search(self.query, base) if self.query else base
+        self.seen = inventory.changes
+        self.cursor = min(self.cursor, max(len(self.matches) - 1, 0))
+
+    def items(self):
+        if self.matches is None or self.seen != self.inventory.changes:
+            self._refresh()
+        return self.matches
+
+    def __len__(self):
+        return len(self.items())
+
+    #Cycles through pick up order and the SORT_KEYS
+    def next_sort(self):
+        keys = (None,) + SORT_KEYS
+        self.sort_key = keys[(keys.index(self.sort_key) + 1) % len(keys)]
+        self.at_least = None
+        self.matches = None
+
+    def reverse(self):
+        self.descending = not self.descending
+        self.matches = None
+
+    def set_minimum(self, value):
+        self.at_least = value
+        self.matches = None
+
+    #Typing more only looks through what already matched, deleting starts
+    #over from the sorted and filtered items
+    def search(self, query):
+        current = self.matches is not None and self.seen == self.inventory.changes
+        if current and self.query and query.startswith(self.query):
+            self.matches = self.inventory.search(query, self.matches)
+        elif current:
+            self.matches = self.inventory.search(query, self.base) if query else self.base
+        self.query = query
+        if current:
+            self.cursor = min(self.cursor, max(len(self.matches) - 1, 0))
+
+    def move(self, steps):
+        count = len(self)
+        if count:
+            self.cursor = max(0, min(self.cursor + steps, count - 1))
+
+    def selected(self):
+        items = self.items()
+        return items[self.cursor] if items else None
+
+    #(index of the first row, items on the page the cursor is on)
+    def page(self):
+        items = self.items()  # first, it pulls the cursor back if items went
+        first = self.cursor // self.page_size * self.page_size
+        return first, items[first:first + self.page_size]
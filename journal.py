@@ -0,0 +1,99 @@
+#Append-only journal of small changes made since the last full save.
+#
+#Each full save has a generation number and every generation gets its own
+#journal file (savegame.journal.<generation>). Loading reads the save, then
+#replays its journal and any newer ones in order. A record is written and
+#flushed right after the action it describes, so a crash loses at most that one.
+#
+#Every game has a lineage number that its saves and journals carry, so a
+#journal left behind by another game (e.g. one that crashed before a new game
+#was started) is never replayed on top of the wrong save.
+#
+#  header: magic "RPGJ", version (u16), generation (u32), lineage (u64)
+#  record: payload length (u32), crc32 (u32), json payload
+import glob
+import json
+import os
+import struct
+import zlib
+
+MAGIC = b"RPGJ"
+VERSION = 1
+_HEADER = struct.Struct("<4sHIQ")
+_RECORD = struct.Struct("<II")
+
+def journal_path(base, generation):
+    return f"{base}.{generation}"
+
+#Generations that have a journal file next to base, oldest first
+def journal_generations(base):
+    generations = []
+    for path in glob.glob(glob.escape(base) + ".*"):
+        suffix = path[len(base) + 1:]
+        if suffix.isdigit():
+            generations.append(int(suffix))
+    return sorted(generations)
+
+#Deletes journals older than generation, once a save covering them is on disk.
+#Without below it deletes them all, for a new game.
+def remove_journals(base, below=None):
+    for generation in journal_generations(base):
+        if below is None or generation < below:
+            try:
+                os.remove(journal_path(base, generation))
+            except FileNotFoundError:
+                pass
+
+class Journal:
+    #Starts a fresh journal file for generation. sync=True also fsyncs every
+    #record, which survives power loss and not just a crash, but costs a disk flush per action.
+    def __init__(self, base, generation, lineage=0, sync=False):
+        self.path = journal_path(base, generation)
+        self.generation = generation
+        self.lineage = lineage
+        self.sync = sync
+        self.count = 0
+        self.file = open(self.path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, VERSION, generation, lineage))
+        self._flush()
+
+    def _flush(self):
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+
+    #record is a short list like ["pos", 3, 4]
+    def append(self, record):
+        payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        self.file.write(_RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._flush()
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+#Returns (generation, lineage, records). Reading stops at the first torn or
+#damaged record, which is what a crash in the middle of a write leaves behind.
+def read_journal(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return None, None, []
+    magic, version, generation, lineage = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version > VERSION:
+        return None, None, []
+    offset = _HEADER.size
+    records = []
+    while offset + _RECORD.size <= len(data):
+        length, crc = _RECORD.unpack_from(data, offset)
+        start = offset + _RECORD.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(json.loads(payload.decode("utf-8")))
+        offset = start + length
+    return generation, lineage, records
@@ -0,0 +1,150 @@
+#Batch simulator for player-vs-monster matchups. Needs numpy (pip install numpy).
+#
+#Every fight is resolved at once as a column in a set of arrays. Battles without
+#skills are deterministic once the monster is rolled (player hits first, both
+#sides deal max(attack - defense, 1) every turn), so the turn count has a closed
+#form and there is no per-turn loop at all.
+import argparse
+import time
+
+import numpy as np
+
+from core import new_game
+from bestiary import BESTIARY
+
+#The arrays for one batch of fights, one entry per fight
+class MatchupResult:
+    def __init__(self, monster_name, level_range, levels, elite, won, turns, player_hp_left, monster_hp_left, xp):
+        self.monster_name = monster_name
+        self.level_range = level_range
+        self.levels = levels
+        self.elite = elite
+        self.won = won
+        self.turns = turns
+        self.player_hp_left = player_hp_left
+        self.monster_hp_left = monster_hp_left
+        self.xp = xp
+
+    def __len__(self):
+        return len(self.won)
+
+    def summary(self):
+        n = len(self)
+        wins = int(self.won.sum())
+        elites = int(self.elite.sum())
+        hp_won = self.player_hp_left[self.won]
+        quantiles = np.percentile(hp_won, [5, 25, 50, 75, 95]).tolist() if wins else [0.0] * 5
+        return {
+            "monster": self.monster_name,
+            "level_range": list(self.level_range),
+            "fights": n,
+            "wins": wins,
+            "win_rate": wins / n if n else 0.0,
+            "avg_turns": float(self.turns.mean()) if n else 0.0,
+            "max_turns": int(self.turns.max()) if n else 0,
+            "avg_xp": float(self.xp[self.won].mean()) if wins else 0.0,
+            "hp_left_p5_p25_p50_p75_p95": quantiles,
+            "elites": elites,
+            "elite_win_rate": float(self.won[self.elite].mean()) if elites else 0.0,
+            "win_rate_by_level": {
+                int(level): float(self.won[self.levels == level].mean())
+                for level in np.unique(self.levels)
+            },
+        }
+
+    #Counts of remaining player HP for won fights, index = HP left
+    def hp_histogram(self):
+        return np.bincount(self.player_hp_left[self.won])
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+#Resolves n fights between one player stat block and one monster type.
+#elite_chance can be raised to study elites without millions of draws.
+def simulate_matchup(stats, monster_name, level_range, n=100000, inventory=None, elite_chance=None, rng=None):
+    if rng is None or isinstance(rng, int):
+        rng = np.random.default_rng(rng)
+
+    weapon_damage = inventory.weapon_damage() if inventory is not None else 0
+
+    species = BESTIARY.get(monster_name)
+    if elite_chance is None:
+        elite_chance = species.elite_chance
+
+    # --- Monster rolls, same formulas as Species.row and Bestiary.spawn ---
+    levels = rng.integers(level_range[0], level_range[1] + 1, size=n, dtype=np.int64)
+    elite = rng.random(n) < elite_chance
+    mult = np.where(elite, species.elite_mult, 1)
+    monster_hp = (species.base_hp + levels * 5) * mult
+    monster_attack = (species.base_attack + levels * 2) * mult
+    monster_def = (species.base_def + levels * 2) * mult
+
+    # --- Damage per turn both ways ---
+    player_dmg = np.maximum(stats["attack"] + weapon_damage - monster_def, 1)
+    monster_dmg = np.maximum(monster_attack - stats["defense"], 1)
+
+    # turns each side needs to finish the other; the player swings first,
+    # so a tie goes to the player
+    turns_to_kill = _ceil_div(monster_hp, player_dmg)
+    turns_to_die = _ceil_div(stats["hp"], monster_dmg)
+    won = turns_to_kill <= turns_to_die
+    turns = np.where(won, turns_to_kill, turns_to_die)
+
+    player_hp_left = np.where(won, stats["hp"] - (turns_to_kill - 1) * monster_dmg, 0)
+    monster_hp_left = np.where(won, 0, monster_hp - turns_to_die * player_dmg)
+
+    xp = np.where(won, (species.xp + levels * 2) * np.where(elite, 2, 1), 0)
+
+    return MatchupResult(monster_name, tuple(level_range), levels, elite, won, turns,
+                         player_hp_left, monster_hp_left, xp)
+
+#Runs every (monster, level_range) pair against the same stat block
+def sweep_bestiary(stats, matchups, n=100000, inventory=None, seed=None):
+    rng = np.random.default_rng(seed)
+    return [simulate_matchup(stats, name, level_range, n, inventory, rng=rng).summary()
+            for name, level_range in matchups]
+
+#The zones from the map, used when no monster is given on the command line
+DEFAULT_MATCHUPS = [
+    ("Slime", (1, 3)),
+    ("Goblin", (4, 6)),
+    ("Orc", (8, 12)),
+    ("Slime", (5, 10)),
+    ("Goblin", (5, 10)),
+    ("Kobold", (5, 10)),
+    ("Orc", (5, 10)),
+]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized matchup simulator.")
+    parser.add_argument("monster", nargs="?")
+    parser.add_argument("--levels", nargs=2, type=int, default=(1, 1), metavar=("MIN", "MAX"))
+    parser.add_argument("-n", "--fights", type=int, default=100000)
+    parser.add_argument("--hp", type=int)
+    parser.add_argument("--attack", type=int)
+    parser.add_argument("--defense", type=int)
+    parser.add_argument("--unarmed", action="store_true", help="don't wield the starter sword")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    stats, inventory, _, _ = new_game()
+    if not args.unarmed:
+        inventory.wield(inventory[0])
+    for key in ("hp", "attack", "defense"):
+        if getattr(args, key) is not None:
+            stats[key] = getattr(args, key)
+
+    matchups = [(args.monster, tuple(args.levels))] if args.monster else DEFAULT_MATCHUPS
+
+    start = time.perf_counter()
+    summaries = sweep_bestiary(stats, matchups, args.fights, inventory, args.seed)
+    elapsed = time.perf_counter() - start
+
+    for summary in summaries:
+        print(f"{summary['monster']} Lv {summary['level_range'][0]}-{summary['level_range'][1]}: "
+              f"win {summary['win_rate']:.2%}, turns {summary['avg_turns']:.2f}, "
+              f"hp left p50 {summary['hp_left_p5_p25_p50_p75_p95'][2]:.0f}, elites {summary['elites']}")
+    print(f"{len(matchups) * args.fights} fights in {elapsed:.3f}s")
+
+if __name__ == "__main__":
+    main()
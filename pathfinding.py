@@ -0,0 +1,81 @@
+#Finding the way for auto-travel. find_path is a plain A* over the four arrow
+#key moves, cost(x, y) says what stepping onto a tile costs (None for a tile
+#that can't be entered). PathCache keeps the last path to each destination, so
+#travelling on along a path, or back to somewhere already visited, costs a
+#dict lookup instead of another search.
+import heapq
+from collections import OrderedDict
+
+STEPS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+MAX_NODES = 20000  # give up instead of searching half the world
+
+#List of positions from start (not included) to goal, or None if there is no
+#way there within max_nodes tiles
+def find_path(start, goal, cost, max_nodes=MAX_NODES):
+    if start == goal:
+        return []
+    gx, gy = goal
+    came_from = {start: None}
+    best = {start: 0}
+    # ties go to the tile with more distance covered, which keeps the search narrow
+    frontier = [(abs(gx - start[0]) + abs(gy - start[1]), 0, start)]
+    while frontier:
+        _, spent, pos = heapq.heappop(frontier)
+        if pos == goal:
+            path = []
+            while pos != start:
+                path.append(pos)
+                pos = came_from[pos]
+            path.reverse()
+            return path
+        if spent > best[pos]:
+            continue  # already reached more cheaply
+        if len(came_from) > max_nodes:
+            return None
+        x, y = pos
+        for dx, dy in STEPS:
+            nxt = (x + dx, y + dy)
+            step = 1 if nxt == goal else cost(*nxt)
+            if step is None:
+                continue
+            total = spent + step
+            if total < best.get(nxt, total + 1):
+                best[nxt] = total
+                came_from[nxt] = pos
+                heapq.heappush(frontier, (total + abs(gx - nxt[0]) + abs(gy - nxt[1]), -total, nxt))
+    return None
+
+#The last path found to each destination. A path made for a different version
+#of the map is thrown away.
+class PathCache:
+    def __init__(self, max_paths=64):
+        self.max_paths = max_paths
+        self.paths = OrderedDict()  # (goal, options) -> (map version, path, {pos: index})
+        self.hits = 0
+        self.misses = 0
+
+    #The rest of the way from start to goal. options is anything else the path
+    #depends on (e.g. avoiding bushes), version the map's version.
+    def get(self, start, goal, cost, version, options=None):
+        key = (goal, options)
+        cached = self.paths.get(key)
+        if cached is not None and cached[0] == version:
+            _, path, index = cached
+            if start in index:
+                self.hits += 1
+                self.paths.move_to_end(key)
+                return path[index[start] + 1:]
+        self.misses += 1
+        path = find_path(start, goal, cost)
+        if path is None:
+            return None
+        index = {pos: i for i, pos in enumerate(path)}
+        index[start] = -1
+        self.paths[key] = (version, path, index)
+        self.paths.move_to_end(key)
+        while len(self.paths) > self.max_paths:
+            self.paths.popitem(last=False)
+        return path
+
+    def clear(self):
+        self.paths.clear()
@@ -0,0 +1,122 @@
+#Safe saving. Files are written to a temp file, fsynced and renamed over the old
+#one, so a crash leaves either the old save or the new one, never half of one.
+#AutosaveService does the writing on a worker thread; the game only hands it a
+#snapshot and carries on.
+import os
+import tempfile
+import threading
+import time
+
+#Replaces path with data in one step
+def atomic_write(path, data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        # mkstemp makes the file private, keep the permissions a plain open() would give
+        if hasattr(os, "fchmod"):
+            try:
+                mode = os.stat(path).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o644
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # make the rename itself durable
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+class AutosaveService:
+    #write(snapshot) runs on the worker thread. Requests that come in while one
+    #is waiting are merged, only the newest snapshot gets written, at most
+    #debounce seconds after the first request.
+    def __init__(self, write, debounce=2.0):
+        self.write = write
+        self.debounce = debounce
+        self.saves = 0
+        self.last_error = None  # why the last write failed, None once one works again
+        self._cond = threading.Condition()
+        self._pending = None
+        self._due = None
+        self._requested = 0
+        self._written = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def request(self, snapshot, immediate=False):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("autosave service is closed")
+            now = time.monotonic()
+            self._pending = snapshot
+            self._requested += 1
+            if immediate:
+                self._due = now
+            elif self._due is None:
+                self._due = now + self.debounce
+            self._cond.notify()
+
+    #Writes whatever is waiting now and blocks until it is on disk. False if
+    #it timed out or the write failed, last_error says why.
+    def flush(self, timeout=None):
+        with self._cond:
+            if self._pending is not None:
+                self._due = time.monotonic()
+                self._cond.notify()
+            target = self._requested
+            done = self._cond.wait_for(lambda: self._written >= target, timeout)
+            return done and self.last_error is None
+
+    #Flushes and stops the worker, returns what flush did
+    def close(self, timeout=None):
+        saved = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        return saved
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending is not None:
+                        delay = self._due - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    elif self._closed:
+                        return
+                    else:
+                        self._cond.wait()
+                snapshot = self._pending
+                target = self._requested
+                self._pending = None
+                self._due = None
+
+            error = None
+            try:
+                self.write(snapshot)
+                self.saves += 1
+            except Exception as e:  # keep the game running, the next save may work
+                error = e
+
+            with self._cond:
+                self.last_error = error
+                self._written = target
+                self._cond.notify_all()
@@ -0,0 +1,116 @@
+#Named timers for the hot paths (input, update, render, encounter checks,
+#battle turns, save/load). Each name keeps its last WINDOW samples for p50/p99
+#and a histogram of every sample since the start, bucketed by powers of two
+#microseconds. Press 't' in game for the overlay; set RPG_PROFILE=path.json or
+#path.csv to get everything written out when the game exits.
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 1024
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(int(fraction * len(ordered)), len(ordered) - 1)
+    return ordered[index]
+
+class TimerStats:
+    __slots__ = ("samples", "count", "total", "worst", "buckets")
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.buckets = {}  # upper bound in microseconds -> count
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.worst:
+            self.worst = seconds
+        bucket = 1 << max(int(seconds * 1e6), 1).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    #Summary in milliseconds; percentiles cover the rolling window only
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": _percentile(ordered, 0.50) * 1000,
+            "p90_ms": _percentile(ordered, 0.90) * 1000,
+            "p99_ms": _percentile(ordered, 0.99) * 1000,
+            "max_ms": self.worst * 1000,
+            "histogram_us": {str(bucket): self.buckets[bucket] for bucket in sorted(self.buckets)},
+        }
+
+class Profiler:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.timers = {}
+        self.overlay = False
+
+    def record(self, name, seconds):
+        stats = self.timers.get(name)
+        if stats is None:
+            stats = self.timers[name] = TimerStats(self.window)
+        stats.add(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    #Wraps a function so every call is timed under name
+    def timed(self, name):
+        def decorate(fn):
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            return wrapper
+        return decorate
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in sorted(self.timers.items())}
+
+    #Short lines for the in-game overlay, frame time first
+    def overlay_lines(self, names=("frame", "update", "render", "encounter", "battle_turn", "save", "load")):
+        lines = []
+        for name in names:
+            stats = self.timers.get(name)
+            if stats is None:
+                continue
+            ordered = sorted(stats.samples)
+            lines.append(f"{name:<11} p50 {_percentile(ordered, 0.5) * 1000:7.3f} ms  "
+                         f"p99 {_percentile(ordered, 0.99) * 1000:7.3f} ms  n={stats.count}")
+        return lines
+
+    #Writes the summary as .csv (one row per timer) or json (anything else)
+    def export(self, path):
+        summary = self.summary()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["timer", "count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"])
+                for name, row in summary.items():
+                    writer.writerow([name, row["count"], f"{row['mean_ms']:.4f}", f"{row['p50_ms']:.4f}",
+                                     f"{row['p90_ms']:.4f}", f"{row['p99_ms']:.4f}", f"{row['max_ms']:.4f}"])
+        else:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+
+#Shared by the whole game
+PROFILER = Profiler()
@@ -0,0 +1,99 @@
+#Levels from XP without looping over every level in between. A curve knows the
+#total XP it takes to reach each level, so any amount of XP turns into a level
+#with one lookup, and a reward of a million XP costs the same as one of ten.
+#
+#stats keep the same meaning as before: "level", and "xp" into that level.
+
+import bisect
+from math import isqrt
+
+SKILL_POINTS_PER_LEVEL = 5
+
+#level -> level + 1 costs step * level, so reaching level L takes
+#step * L * (L - 1) / 2 in total. Solved for L with an integer square root.
+class LinearCurve:
+    def __init__(self, step=10):
+        self.step = step
+
+    #XP to go from level to level + 1
+    def cost(self, level):
+        return self.step * level
+
+    #Total XP from level 1 to reach level
+    def total_for(self, level):
+        return self.step * level * (level - 1) // 2
+
+    #Highest level total XP reaches
+    def level_for(self, total):
+        if total <= 0:
+            return 1
+        n = 2 * total // self.step  # largest L(L-1) that fits
+        return (isqrt(4 * n + 1) + 1) // 2
+
+#Any curve, given cost(level). The running totals are kept in a table that grows
+#as higher levels are reached, and levels are looked up with bisect.
+class TableCurve:
+    def __init__(self, cost):
+        self._cost = cost
+        self.totals = [0]  # totals[i] = XP to reach level i + 1
+
+    def cost(self, level):
+        return self._cost(level)
+
+    def _grow(self, level=None, total=None):
+        totals = self.totals
+        while (level is not None and len(totals) < level) or (total is not None and totals[-1] <= total):
+            totals.append(totals[-1] + self._cost(len(totals)))
+
+    def total_for(self, level):
+        self._grow(level=level)
+        return self.totals[level - 1]
+
+    def level_for(self, total):
+        if total <= 0:
+            return 1
+        self._grow(total=total)
+        return bisect.bisect_right(self.totals, total)
+
+#base * level ** exponent per level, e.g. PowerCurve(10, 1.5) for a steeper grind
+class PowerCurve(TableCurve):
+    def __init__(self, base=10, exponent=2.0):
+        self.base = base
+        self.exponent = exponent
+        super().__init__(lambda level: max(int(base * level ** exponent), 1))
+
+class Progression:
+    def __init__(self, curve=None, skill_points_per_level=SKILL_POINTS_PER_LEVEL):
+        self.curve = curve or LinearCurve()
+        self.skill_points_per_level = skill_points_per_level
+
+    #XP needed for the next level, for the HUD
+    def xp_to_next(self, stats):
+        return self.curve.cost(stats["level"])
+
+    #Adds xp and skill points and does every level up they add up to at once:
+    #skill points for each level and one full mana restore. Returns levels gained.
+    def grant(self, stats, xp=0, skill_points=0):
+        curve = self.curve
+        level = stats["level"]
+        total = curve.total_for(level) + stats["xp"] + xp
+        new_level = max(curve.level_for(total), level)
+        gained = new_level - level
+        stats["level"] = new_level
+        stats["xp"] = total - curve.total_for(new_level)
+        stats["skill_points"] += skill_points + gained * self.skill_points_per_level
+        if gained:
+            stats["current_mana"] = stats["mana"]  # Full restore
+        return gained
+
+    #Applies a batch of (xp, skill_points) rewards as one grant
+    def grant_many(self, stats, rewards):
+        xp = 0
+        skill_points = 0
+        for reward_xp, reward_points in rewards:
+            xp += reward_xp
+            skill_points += reward_points
+        return self.grant(stats, xp, skill_points)
+
+#The curve the game plays with, level * 10 XP per level
+PROGRESSION = Progression(LinearCurve(10))
@@ -0,0 +1,96 @@
+#Quest events. Quests subscribe to the (event, target) pairs they care about,
+#e.g. ("kill", "Slime"), so a kill only touches the quests waiting on that
+#species instead of every NPC in the world.
+from progression import PROGRESSION
+
+KILL = "kill"
+CLASS = "class"
+
+def _on_kill(quest, amount):
+    quest["progress"] = quest.get("progress", 0) + amount
+    if quest["progress"] >= quest["count"]:
+        quest["completed"] = True
+
+def _on_class(quest, amount):
+    quest["accepted"] = True
+
+HANDLERS = {KILL: _on_kill, CLASS: _on_class}
+
+#What each quest type listens for, given the quest dict
+SUBSCRIPTIONS = {
+    KILL: lambda quest: (KILL, quest["target"]),
+    CLASS: lambda quest: (CLASS, quest["class_name"]),
+}
+
+class QuestBus:
+    def __init__(self):
+        self.subscribers = {}  # (event, target) -> list of quest dicts
+
+    def subscribe(self, event, target, quest):
+        self.subscribers.setdefault((event, target), []).append(quest)
+
+    def unsubscribe(self, event, target, quest):
+        quests = self.subscribers.get((event, target), [])
+        if quest in quests:
+            quests.remove(quest)
+
+    #Tells the quests listening for (event, target) that it happened.
+    #Returns the quests that changed.
+    def publish(self, event, target, amount=1):
+        handler = HANDLERS[event]
+        changed = []
+        for quest in self.subscribers.get((event, target), ()):
+            if quest.get("completed", False):
+                continue
+            handler(quest, amount)
+            changed.append(quest)
+        return changed
+
+    def kill(self, species_name):
+        return self.publish(KILL, species_name)
+
+    def choose_class(self, class_name):
+        return self.publish(CLASS, class_name)
+
+#What an NPC says when the player walks up to it, added to lines. A finished
+#kill quest hands out its reward and starts over. accept_hint tells the
+#player how to take up a class. Returns (class quest on offer or None,
+#whether stats changed).
+def visit_npc(stats, npc, lines, accept_hint):
+    lines.append(npc["dialogue"])
+    quest = npc.get("quest")
+    if not quest:
+        return None, False
+    if quest["type"] == CLASS:
+        if stats["class_path"] is None:
+            if not quest["accepted"]:
+                lines.append(f"Do you want to become a {quest['class_name']}? {accept_hint}")
+                return quest, False
+            lines.append(f"Class quest: Prove yourself to become a {quest['class_name']}.")
+        elif stats["class_path"] != quest["class_name"]:
+            lines.append("You have chosen a different path. You cannot become this class.")
+        else:
+            lines.append(f"Continue your path as a {stats['class_path']}.")
+    elif quest["type"] == KILL and quest["completed"] and not quest.get("reward_given", False):
+        reward = quest["reward"]
+        npc["reward_given"] = True
+        lines.append(f"Quest complete! +{reward['xp']} XP, +{reward['skill_points']} SP!")
+        if PROGRESSION.grant(stats, reward["xp"], reward["skill_points"]):
+            lines.append(f"You leveled up to level {stats['level']}! +5 SP!")
+        quest["completed"] = False
+        quest["progress"] = 0
+        return None, True
+    elif quest["type"] == KILL and not quest["completed"]:
+        lines.append(f"Quest: Defeat {quest['count']} {quest['target']}s [{quest['progress']}/{quest['count']}]")
+    return None, False
+
+#Subscribes every NPC quest in the npcs dict. Merchants ("gold") have nothing
+#to listen for, no gold is earned anywhere yet.
+def build_quest_bus(npcs):
+    bus = QuestBus()
+    for npc in npcs.values():
+        quest = npc.get("quest")
+        if quest and quest.get("type") in SUBSCRIPTIONS:
+            event, target = SUBSCRIPTIONS[quest["type"]](quest)
+            bus.subscribe(event, target, quest)
+    return bus
@@ -0,0 +1,78 @@
+#Records a play session so it can be replayed exactly (see replay.py).
+#
+#A recording is a JSON lines file. The first line holds the seed and the save
+#the session started from, then one line per thing that changed the game:
+#
+#  ["key", key, inputs]       a key handled on the map
+#  ["timer", name, inputs]    a timer that ran (regen, idle_encounter, ...)
+#
+#inputs is every key (-1 for a battle tick that ran out) menus and battles read
+#while handling it, typed text included. The last line holds the final game
+#state, which the replay checks itself against.
+import base64
+import json
+
+VERSION = 1
+
+class InputRecorder:
+    #save is the bytes of a save file holding the state the session starts from
+    def __init__(self, path, seed, save):
+        self.file = open(path, "w")
+        self.current = None
+        self.event = None
+        self.count = 0
+        self._write({"type": "header", "version": VERSION, "seed": seed,
+                     "save": base64.b64encode(save).decode("ascii")})
+
+    def _write(self, line):
+        self.file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        # a crash should still leave everything up to the last event
+        self.file.flush()
+
+    def begin(self, kind, value):
+        self.current = []
+        self.event = [kind, value, self.current]
+
+    #Anything the screen hands out while an event is being handled
+    def input(self, value):
+        if self.current is not None:
+            self.current.append(value)
+
+    def end(self):
+        if self.event is not None:
+            self._write(self.event)
+            self.count += 1
+        self.current = None
+        self.event = None
+
+    def finish(self, state):
+        if not self.file.closed:
+            self._write({"type": "final", "events": self.count, "state": state})
+            self.file.close()
+
+#Returns (header, events, final), final is None if the session never finished
+def read_recording(path):
+    header = None
+    events = []
+    final = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # cut off by a crash
+            if isinstance(entry, list):
+                events.append(entry)
+            elif entry.get("type") == "header":
+                header = entry
+            elif entry.get("type") == "final":
+                final = entry
+    if header is None:
+        raise ValueError(f"{path} is not a recording")
+    if header["version"] > VERSION:
+        raise ValueError(f"recording version {header['version']} is newer than this game ({VERSION})")
+    header["save"] = base64.b64decode(header["save"])
+    return header, events, final
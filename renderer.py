@@ -0,0 +1,140 @@
+#Keeps the last frame that was drawn and only rewrites what changed, so moving
+#around never clears the whole screen (no flicker over ssh). Rows are composed
+#into a few (text, attr) segments, and a row that changed is compared with
+#what is on screen character by character: only the spans that differ are
+#written. Scrolling the map over open ground mostly moves the odd bush or NPC,
+#so that is all that goes out.
+import re
+
+#Unchanged characters between two changed spans that are cheaper to write
+#again than to move the cursor over
+GAP = 4
+#Runs of changed characters (one byte each) with gaps of at most GAP between them
+_CHANGED = re.compile(rb"[^\0]+(?:\0{1,%d}[^\0]+)*" % GAP)
+
+#Joins (text, attr) cells into as few segments as possible
+def compose(cells):
+    segments = []
+    text = []
+    attr = None
+    for cell_text, cell_attr in cells:
+        if cell_attr != attr and text:
+            segments.append(("".join(text), attr))
+            text = []
+        attr = cell_attr
+        text.append(cell_text)
+    if text:
+        segments.append(("".join(text), attr))
+    return tuple(segments)
+
+#A row as two ints, 4 bytes per character each, for comparing with xor
+def _flatten(segments, width):
+    text = "".join(text for text, _ in segments).ljust(width)
+    attrs = b"".join((attr & 0xFFFFFFFF).to_bytes(4, "little") * len(text) for text, attr in segments)
+    return (int.from_bytes(text.encode("utf-32-le"), "little"),
+            int.from_bytes(attrs.ljust(width * 4, b"\0"), "little"))
+
+#(start, end) character spans where new differs from old
+def changed_spans(old, new):
+    width = max(sum(len(text) for text, _ in old), sum(len(text) for text, _ in new))
+    old_text, old_attrs = _flatten(old, width)
+    new_text, new_attrs = _flatten(new, width)
+    diff = (old_text ^ new_text) | (old_attrs ^ new_attrs)
+    # fold each character's 4 bytes into its lowest one, then keep only those
+    diff |= (diff >> 8) | (diff >> 16) | (diff >> 24)
+    mask = diff.to_bytes(width * 4, "little")[::4]
+    return [match.span() for match in _CHANGED.finditer(mask)]
+
+#(x, text, attr) pieces of segments between characters start and end
+def _cut(segments, start, end):
+    x = 0
+    for text, attr in segments:
+        stop = x + len(text)
+        if stop > start and x < end:
+            left = max(start, x)
+            yield left, text[left - x:min(end, stop) - x], attr
+        if stop >= end:
+            break
+        x = stop
+
+class FrameRenderer:
+    def __init__(self, stdscr):
+        self.stdscr = stdscr
+        self.previous = {}  # row -> segments currently on screen
+        self.staged = {}  # row -> segments for the frame being built
+        self.dirty = True  # screen contents unknown, e.g. after a menu
+        self.width = stdscr.getmaxyx()[1] - 1  # writing the last column fails on the bottom row
+        self.rows_written = 0
+        self.bytes_written = 0
+
+    #Starts a new frame, rows that don't get staged again are blanked
+    def begin_frame(self):
+        self.staged = {}
+        self.width = self.stdscr.getmaxyx()[1] - 1
+
+    #Stages one row, either plain text or a sequence of (text, attr) segments.
+    #Anything past the screen width is cut off: curses would wrap it onto the
+    #next row, where the diffing can't see it to clear it again.
+    def row(self, y, content, attr=0):
+        if isinstance(content, str):
+            content = ((content, attr),)
+        room = self.width
+        clipped = []
+        for text, text_attr in content:
+            if room <= 0:
+                break
+            if len(text) > room:
+                text = text[:room]
+            clipped.append((text, text_attr))
+            room -= len(text)
+        self.staged[y] = tuple(clipped)
+
+    #Call after something else drew on the screen (menus, battles)
+    def invalidate(self):
+        self.previous = {}
+        self.dirty = True
+
+    #Writes the spans that differ from what is on screen and refreshes
+    def present(self):
+        stdscr = self.stdscr
+        rows_written = 0
+        bytes_written = 0
+        if self.dirty:
+            stdscr.erase()
+            self.dirty = False
+
+        for y in self.previous.keys() - self.staged.keys():
+            stdscr.move(y, 0)
+            stdscr.clrtoeol()
+            rows_written += 1
+
+        for y, segments in self.staged.items():
+            old = self.previous.get(y)
+            if old == segments:
+                continue
+            if old is None:
+                # blank on screen, the whole row goes out
+                pieces = []
+                x = 0
+                for text, attr in segments:
+                    pieces.append((x, text, attr))
+                    x += len(text)
+            else:
+                pieces = [piece for start, end in changed_spans(old, segments) for piece in _cut(segments, start, end)]
+            for x, text, attr in pieces:
+                if attr:
+                    stdscr.addstr(y, x, text, attr)
+                else:
+                    stdscr.addstr(y, x, text)
+                bytes_written += len(text)
+            length = sum(len(text) for text, _ in segments)
+            if old is not None and length < sum(len(text) for text, _ in old):
+                # what used to be past the end of the row
+                stdscr.move(y, length)
+                stdscr.clrtoeol()
+            rows_written += 1
+
+        self.previous = dict(self.staged)
+        self.rows_written = rows_written
+        self.bytes_written = bytes_written
+        stdscr.refresh()
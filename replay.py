@@ -0,0 +1,138 @@
+#Plays a recorded session (RPG_RECORD=session.rec python Project_Beta.py) again
+#without a terminal and as fast as it will go, then checks that it ended in the
+#same state. Use it to reproduce a bug from a player's session, or with
+#--repeat to time the game logic on real input.
+#
+#  python replay.py session.rec
+#  python replay.py session.rec --repeat 20 --draw
+import argparse
+import asyncio
+import copy
+import inspect
+import os
+import sys
+import tempfile
+import time
+
+import Project_Beta as game_module
+from fake_screen import FakeScreen
+from recording import read_recording
+from rng import RandomStreams
+
+#The npcs as they were at import, quests change in place during a session
+_PRISTINE_NPCS = copy.deepcopy(game_module.npcs)
+
+#Puts every npc and quest back to how the game starts. The quest dicts are
+#updated in place, the quest bus holds on to them.
+def reset_world():
+    for pos, pristine in _PRISTINE_NPCS.items():
+        npc = game_module.npcs[pos]
+        quest = npc.get("quest")
+        npc.clear()
+        npc.update(copy.deepcopy(pristine))
+        if quest is not None:
+            quest.clear()
+            quest.update(npc["quest"])
+            npc["quest"] = quest
+
+class ReplayResult:
+    def __init__(self, events, elapsed, state, expected, error=None):
+        self.events = events
+        self.elapsed = elapsed
+        self.state = state
+        self.expected = expected
+        self.error = error
+
+    #None when the recording never finished, there is nothing to compare to
+    def matched(self):
+        if self.error is not None:
+            return False
+        if self.expected is None:
+            return None
+        return self.state == self.expected
+
+    #Keys of the final state that came out different
+    def differences(self):
+        if self.expected is None or self.state is None:
+            return []
+        return sorted(key for key in self.expected.keys() | self.state.keys()
+                      if self.expected.get(key) != self.state.get(key))
+
+#Feeds the events to the game one by one, returns (events handled, error or None)
+async def _play(game, stdscr, events, draw):
+    handled = 0
+    try:
+        for kind, value, inputs in events:
+            stdscr.keys.extend(inputs)
+            if kind == "key":
+                running = await game.handle_key(value)
+            else:
+                result = getattr(game, value)()
+                if inspect.isawaitable(result):
+                    await result
+                running = True
+            if stdscr.keys:
+                raise ValueError("input was left unread")
+            handled += 1
+            if draw:
+                game.draw()
+            if not running:
+                break
+    except (EOFError, ValueError) as e:
+        # the game asked for input the session never gave it, or left some over
+        return handled, f"diverged at event {handled + 1} ({kind} {value}): {e}"
+    return handled, None
+
+#Replays one recording in a scratch directory and returns a ReplayResult.
+#draw=True also draws the map after every event, as the real game would.
+def replay(path, draw=False):
+    header, events, final = read_recording(path)
+    expected = final["state"] if final is not None else None
+    old = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rpg-replay-") as scratch:
+        os.chdir(scratch)
+        try:
+            reset_world()
+            with open(game_module.SAVE_FILE, "wb") as f:
+                f.write(header["save"])
+            stats, x, y, inventory, explored, skill_names, generation, lineage = game_module.load_game()
+            stdscr = FakeScreen(height=60, width=200)
+            game = game_module.Game(stdscr, stats, inventory, x, y, explored, skill_names, generation,
+                                    RandomStreams(header["seed"]), lineage)
+            start = time.perf_counter()
+            handled, error = asyncio.run(_play(game, stdscr, events, draw))
+            elapsed = time.perf_counter() - start
+            state = game.state_digest()
+            game.close()
+        finally:
+            os.chdir(old)
+    return ReplayResult(handled, elapsed, state, expected, error)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session headlessly and check its final state.")
+    parser.add_argument("recording")
+    parser.add_argument("--repeat", type=int, default=1, help="play it this many times and time them")
+    parser.add_argument("--draw", action="store_true", help="draw the map after every event")
+    args = parser.parse_args(argv)
+
+    times = []
+    ok = True
+    for _ in range(args.repeat):
+        result = replay(args.recording, args.draw)
+        times.append(result.elapsed)
+        matched = result.matched()
+        if result.error:
+            print(result.error)
+        if matched is None:
+            print("recording has no final state, nothing to check")
+        elif not matched:
+            ok = False
+            print(f"final state differs: {', '.join(result.differences()) or result.error}")
+    best = min(times)
+    print(f"events: {result.events}  best: {best * 1000:.2f} ms  "
+          f"events/sec: {result.events / best if best else float('inf'):.0f}")
+    print("state matches" if ok else "MISMATCH")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
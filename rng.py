@@ -0,0 +1,41 @@
+#Seeded random streams, one per part of the game that rolls dice. Each stream
+#is its own random.Random seeded from the session seed and its name, so extra
+#rolls in one place (say a new battle effect) don't shift what the encounter
+#rolls come out as. The same seed always gives the same game.
+import os
+import random
+
+#encounter: does something attack on this step, pick: which species,
+#level: the monster's level, elite: the elite roll
+STREAM_NAMES = ("encounter", "pick", "level", "elite")
+
+class RandomStreams:
+    def __init__(self, seed=None):
+        self.reseed(seed)
+
+    #A new seed restarts every stream, None picks a fresh one
+    def reseed(self, seed=None):
+        if seed is None:
+            seed = int.from_bytes(os.urandom(4), "little")
+        self.seed = seed
+        self.streams = {}
+        for name in STREAM_NAMES:
+            self.get(name)
+
+    def get(self, name):
+        stream = self.streams.get(name)
+        if stream is None:
+            # str seeds are hashed with sha512, the same on every run and machine
+            stream = self.streams[name] = random.Random(f"{self.seed}:{name}")
+        return stream
+
+    def __getattr__(self, name):
+        if name == "streams":
+            raise AttributeError(name)
+        try:
+            return self.streams[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+#The game's streams, main() seeds them
+STREAMS = RandomStreams()
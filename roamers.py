@@ -0,0 +1,218 @@
+#Monsters that walk around the map instead of hiding in a dice roll. They are
+#kept as columns (one array per field, one slot per monster) with a spatial
+#hash of CELL x CELL cells on top, so drawing the viewport or finding what is
+#near the player only looks at a few cells, whatever the total count.
+#
+#Only monsters within ACTIVE_RADIUS of the player move; everything further
+#away stands still until the player comes back. Inside that radius a monster
+#chases the player once it is within AGGRO_RADIUS, otherwise it wanders near
+#the spot it spawned on. Neither takes it more than LEASH from home. Walking
+#into one, or one walking into you, starts a battle.
+#
+#Nothing spawns, walks or chases within SAFE_RADIUS of the respawn point, so a
+#player who just lost a fight isn't dragged straight into the next one.
+#
+#Where a monster spawns and how it moves only depend on its uid, the tick
+#number and the world seed, never on the order things were loaded in, so a
+#replay comes out the same.
+import random
+import zlib
+from array import array
+
+CELL = 16
+ACTIVE_RADIUS = 40
+AGGRO_RADIUS = 6
+LEASH = 8  # how far a monster strays from home, chasing or not
+SAFE_RADIUS = 3  # around the respawn point
+WANDER_CHANCE = 128  # out of 256, per tick
+MAX_ROAMERS = 100000
+ROAMERS_PER_ZONE = 3
+
+_MASK = (1 << 64) - 1
+
+#splitmix64, a cheap stateless hash that passes for a random number
+def _mix(n):
+    n = (n + 0x9E3779B97F4A7C15) & _MASK
+    n = ((n ^ (n >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    n = ((n ^ (n >> 27)) * 0x94D049BB133111EB) & _MASK
+    return n ^ (n >> 31)
+
+def _sign(n):
+    return (n > 0) - (n < 0)
+
+#Steps for a wander roll, none means stay put
+_WANDER = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+class RoamerPool:
+    def __init__(self, seed=0, capacity=MAX_ROAMERS, safe_spot=(0, 0), safe_radius=SAFE_RADIUS):
+        self.seed = seed
+        self.capacity = capacity
+        self.safe_spot = safe_spot
+        self.safe_radius = safe_radius
+        self.x = array('i')
+        self.y = array('i')
+        self.home_x = array('i')
+        self.home_y = array('i')
+        self.level = array('I')  # far enough out zones go past 65535
+        self.uid = array('I')
+        self.species = []  # species name per slot
+        self.zone = []  # populate_zone key per slot
+        self.alive = bytearray()
+        self.free = []  # dead slots to reuse
+        self.cells = {}  # (cell x, cell y) -> set of slots
+        self.populated = {}  # zone key -> slots it was given, so it never gets a second lot
+        self.count = 0
+        self.ticks = 0
+
+    def __len__(self):
+        return self.count
+
+    def _cell_add(self, slot, x, y):
+        key = (x // CELL, y // CELL)
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = set()
+        cell.add(slot)
+
+    def _cell_remove(self, slot, x, y):
+        key = (x // CELL, y // CELL)
+        cell = self.cells[key]
+        cell.discard(slot)
+        if not cell:
+            del self.cells[key]
+
+    #Adds one monster, returns its slot or None when the pool is full
+    def spawn(self, x, y, species, level, uid, zone=None):
+        if self.count >= self.capacity:
+            return None
+        if self.free:
+            slot = self.free.pop()
+            self.x[slot], self.y[slot] = x, y
+            self.home_x[slot], self.home_y[slot] = x, y
+            self.level[slot] = level
+            self.uid[slot] = uid
+            self.species[slot] = species
+            self.zone[slot] = zone
+            self.alive[slot] = 1
+        else:
+            slot = len(self.alive)
+            self.x.append(x)
+            self.y.append(y)
+            self.home_x.append(x)
+            self.home_y.append(y)
+            self.level.append(level)
+            self.uid.append(uid)
+            self.species.append(species)
+            self.zone.append(zone)
+            self.alive.append(1)
+        self._cell_add(slot, x, y)
+        self.count += 1
+        return slot
+
+    def _safe(self, x, y):
+        return max(abs(x - self.safe_spot[0]), abs(y - self.safe_spot[1])) <= self.safe_radius
+
+    #Puts a monster back where it spawned, e.g. after it beat the player
+    def send_home(self, slot):
+        x, y = self.home_x[slot], self.home_y[slot]
+        self._cell_remove(slot, self.x[slot], self.y[slot])
+        self._cell_add(slot, x, y)
+        self.x[slot], self.y[slot] = x, y
+
+    def remove(self, slot):
+        if not self.alive[slot]:
+            return
+        self._cell_remove(slot, self.x[slot], self.y[slot])
+        self.alive[slot] = 0
+        self.species[slot] = None
+        self.zone[slot] = None
+        self.free.append(slot)
+        self.count -= 1
+
+    #Gives a zone its monsters once, placed on its tiles. key names the zone
+    #or chunk so it never gets a second lot.
+    def populate_zone(self, key, zone, count=ROAMERS_PER_ZONE):
+        if key in self.populated:
+            return
+        slots = self.populated[key] = []
+        rng = random.Random(f"{self.seed}:roamers:{key}")
+        low, high = zone["level_range"]
+        tiles = [pos for pos in zone["tiles"] if not self._safe(*pos)]
+        if not tiles:
+            return
+        for k in range(count):
+            x, y = rng.choice(tiles)
+            species = zone["encounters"].species.sample(rng)
+            slot = self.spawn(x, y, species, rng.randint(low, high), zlib.crc32(f"{key}:{k}".encode()), key)
+            if slot is not None:
+                slots.append(slot)
+
+    #Removes what populate_zone gave key, e.g. once its chunk of the world is
+    #dropped. Coming back populates it again.
+    def forget_zone(self, key):
+        for slot in self.populated.pop(key, ()):
+            # killed ones may have given their slot to another zone since
+            if self.zone[slot] == key:
+                self.remove(slot)
+
+    #Slots in the cells that overlap the rectangle (corners included)
+    def _slots_in(self, x0, y0, x1, y1):
+        cells = self.cells
+        for cy in range(y0 // CELL, y1 // CELL + 1):
+            for cx in range(x0 // CELL, x1 // CELL + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    yield from cell
+
+    #{(x, y): slot} for the monsters inside the rectangle, lowest uid wins a shared tile
+    def in_rect(self, x0, y0, x1, y1):
+        found = {}
+        xs, ys, uid = self.x, self.y, self.uid
+        for slot in self._slots_in(x0, y0, x1, y1):
+            x, y = xs[slot], ys[slot]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                other = found.get((x, y))
+                if other is None or uid[slot] < uid[other]:
+                    found[(x, y)] = slot
+        return found
+
+    #The monster standing on (x, y), or None
+    def at(self, x, y):
+        return self.in_rect(x, y, x, y).get((x, y))
+
+    #Moves every monster near the player one step. Returns (moved, slot of a
+    #monster that reached the player or None).
+    def tick(self, player_x, player_y):
+        self.ticks += 1
+        tick = self.ticks
+        r = ACTIVE_RADIUS
+        slots = sorted(self._slots_in(player_x - r, player_y - r, player_x + r, player_y + r),
+                       key=self.uid.__getitem__)
+        xs, ys, home_x, home_y, uid = self.x, self.y, self.home_x, self.home_y, self.uid
+        moved = 0
+        contact = None
+        hunted = not self._safe(player_x, player_y)
+        for slot in slots:
+            x, y = xs[slot], ys[slot]
+            dx, dy = player_x - x, player_y - y
+            if hunted and max(abs(dx), abs(dy)) <= AGGRO_RADIUS:
+                # chase along the longer axis
+                step = (_sign(dx), 0) if abs(dx) >= abs(dy) else (0, _sign(dy))
+            else:
+                roll = _mix((uid[slot] << 32) ^ tick ^ self.seed)
+                if roll & 0xFF >= WANDER_CHANCE:
+                    continue
+                step = _WANDER[(roll >> 8) & 3]
+            nx, ny = x + step[0], y + step[1]
+            if (nx, ny) == (x, y):
+                continue
+            if max(abs(nx - home_x[slot]), abs(ny - home_y[slot])) > LEASH or self._safe(nx, ny):
+                continue
+            if nx // CELL != x // CELL or ny // CELL != y // CELL:
+                self._cell_remove(slot, x, y)
+                self._cell_add(slot, nx, ny)
+            xs[slot], ys[slot] = nx, ny
+            moved += 1
+            if nx == player_x and ny == player_y and contact is None:
+                contact = slot
+        return moved, contact
@@ -0,0 +1,165 @@
+#Binary save container. A small header and a table of named sections up front,
+#then each section's bytes. Opening a save only reads the table (through mmap);
+#a section is decoded the first time someone asks for it.
+#
+#  header:  magic "RPGS", format version (u16), section count (u16)
+#  table:   per section: name (16 bytes), codec (u8), offset (u32), length (u32), crc32 (u32)
+#  payload: the sections, one after the other
+import ast
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from persistence import atomic_write
+
+MAGIC = b"RPGS"
+VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_ENTRY = struct.Struct("<16sBIII")
+
+RAW = 0  # bytes stored as they are
+JSON = 1  # zlib compressed json
+
+#Which codec each known section uses, anything else is stored as JSON
+CODECS = {
+    "player": JSON,
+    "inventory": JSON,
+    "quests": JSON,
+    "skills": JSON,
+    "explored": RAW,
+}
+
+class SaveFormatError(ValueError):
+    pass
+
+def _encode(codec, value):
+    if codec == RAW:
+        return bytes(value)
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+def _decode(codec, data):
+    if codec == RAW:
+        return bytes(data)
+    try:
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+    except zlib.error as e:
+        raise SaveFormatError(f"section can't be decompressed: {e}") from e
+
+#Builds the bytes of a save from {section name: value}, None values are left out
+def encode_save(sections):
+    entries = []
+    payloads = []
+    items = [(name, value) for name, value in sections.items() if value is not None]
+    offset = _HEADER.size + _ENTRY.size * len(items)
+    for name, value in items:
+        key = name.encode("ascii")
+        if len(key) > 16:
+            raise SaveFormatError(f"section name {name!r} is longer than 16 characters")
+        codec = CODECS.get(name, JSON)
+        payload = _encode(codec, value)
+        entries.append(_ENTRY.pack(key, codec, offset, len(payload), zlib.crc32(payload)))
+        payloads.append(payload)
+        offset += len(payload)
+    return _HEADER.pack(MAGIC, VERSION, len(items)) + b"".join(entries) + b"".join(payloads)
+
+def write_save(path, sections):
+    atomic_write(path, encode_save(sections))
+
+#An open save file. Sections are decoded on first use and then kept.
+class SaveFile:
+    def __init__(self, data):
+        if len(data) < _HEADER.size:
+            raise SaveFormatError("save file is too short")
+        magic, version, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise SaveFormatError("not a save file")
+        if version > VERSION:
+            raise SaveFormatError(f"save format {version} is newer than this game ({VERSION})")
+        if len(data) < _HEADER.size + _ENTRY.size * count:
+            raise SaveFormatError("save file is cut off")
+        self.data = data
+        self.version = version
+        self.table = {}
+        for i in range(count):
+            key, codec, offset, length, crc = _ENTRY.unpack_from(data, _HEADER.size + _ENTRY.size * i)
+            if offset + length > len(data):
+                raise SaveFormatError("save file is cut off")
+            self.table[key.rstrip(b"\0").decode("ascii")] = (codec, offset, length, crc)
+        self.cache = {}
+        self.file = None
+
+    @classmethod
+    def open(cls, path):
+        f = open(path, "rb")
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise SaveFormatError("save file is empty")
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            f.close()
+            raise
+        try:
+            save = cls(data)
+        except BaseException:
+            data.close()
+            f.close()
+            raise
+        save.file = f
+        return save
+
+    def __contains__(self, name):
+        return name in self.table
+
+    def sections(self):
+        return list(self.table)
+
+    def get(self, name, default=None):
+        if name in self.cache:
+            return self.cache[name]
+        entry = self.table.get(name)
+        if entry is None:
+            return default
+        codec, offset, length, crc = entry
+        payload = self.data[offset:offset + length]
+        if zlib.crc32(payload) != crc:
+            raise SaveFormatError(f"section {name!r} is damaged")
+        value = self.cache[name] = _decode(codec, payload)
+        return value
+
+    #Like get, for a section the save is no use without
+    def require(self, name):
+        if name not in self.table:
+            raise SaveFormatError(f"save has no {name!r} section")
+        return self.get(name)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+#Turns an old savegame.json (already parsed) into sections. Quest keys were
+#written with str(pos), they are read back with literal_eval instead of eval.
+def migrate_json(data, explored=None):
+    stats = data["stats"]
+    quests = []
+    for pos_str, quest_data in data.get("quests", {}).items():
+        x, y = ast.literal_eval(pos_str)
+        quests.append([x, y, quest_data.get("progress", 0), quest_data.get("completed", False),
+                       quest_data.get("reward_given", False)])
+    return {
+        "player": {"stats": stats, "x": data["player_x"], "y": data["player_y"]},
+        "inventory": data.get("inventory"),
+        "quests": quests,
+        "skills": data.get("skills"),
+        "explored": explored,
+    }
@@ -0,0 +1,31 @@
+#Paces battle turns. A turn lasts one tick; the player has that long to pick an
+#action before the last one repeats. Fast-forward shortens the tick and auto
+#mode doesn't wait at all, it resolves the rest of the fight straight away.
+
+class TickScheduler:
+    def __init__(self, tick_rate=1.0, fast_forward=8.0, auto=False):
+        self.tick_rate = tick_rate  # turns per second at normal speed
+        self.fast_forward = fast_forward  # speed multiplier while fast-forwarding
+        self.fast = False
+        self.auto = auto
+
+    #Milliseconds one turn lasts right now
+    def tick_ms(self):
+        if self.auto:
+            return 0
+        rate = self.tick_rate * (self.fast_forward if self.fast else 1.0)
+        return max(int(1000 / rate), 1)
+
+    def toggle_fast(self):
+        self.fast = not self.fast
+
+    def speed_label(self):
+        if self.auto:
+            return "auto"
+        return f"x{self.fast_forward:g}" if self.fast else "x1"
+
+    #Waits up to one tick for a key on an AsyncScreen and returns it, or -1 if none came
+    async def wait(self, stdscr):
+        if self.auto:
+            return -1
+        return await stdscr.getch(self.tick_ms())
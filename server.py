@@ -0,0 +1,313 @@
+#Server mode: many players in one process over plain TCP. Every connection
+#gets its own player, quests and dice; the map, the bestiary, the encounter
+#tables and the generated world are shared between them.
+#
+#  python server.py --port 4000          then: telnet localhost 4000
+#  python server.py --bots 200 --steps 500 --port 4000   load test against a running server
+#
+#The protocol is one command per line. Every reply is some lines of text and
+#then a line with a single ".", so a script knows when it has the whole answer.
+#Type "help" for the commands. Battles play out on their own (greedy skill use),
+#there is no curses and nothing is saved.
+import argparse
+import asyncio
+import copy
+import random
+import sys
+import time
+
+import Project_Beta as game_module
+from core import UPGRADES, new_game, spend_skill_point
+from bestiary import create_monster
+from battle_engine import run_battle, greedy_policy
+from explored import ExploredMap
+from progression import PROGRESSION
+from quests import build_quest_bus, visit_npc, SUBSCRIPTIONS
+from rng import RandomStreams
+from skills import learn_class_skills
+from world_gen import ProceduralWorld
+
+DIRECTIONS = {
+    "n": (0, -1), "north": (0, -1),
+    "s": (0, 1), "south": (0, 1),
+    "e": (1, 0), "east": (1, 0),
+    "w": (-1, 0), "west": (-1, 0),
+}
+MAX_STEPS = 50  # per move command
+VIEW_WIDTH, VIEW_HEIGHT = 20, 10
+MAX_LINE = 1024
+
+HELP = [
+    "n/s/e/w [count]   walk, e.g. 'e 5'",
+    "look              draw the map around you",
+    "stats             your stats",
+    "quests            quests you have heard of",
+    "accept            take the class offered here",
+    "upgrade <stat>    spend a skill point: " + ", ".join(name for name, _ in UPGRADES),
+    "inv               your items",
+    "wield <n>         wield or put away item n",
+    "quit              leave",
+]
+
+#One player. Nothing in here touches the network or another player.
+class PlayerSession:
+    def __init__(self, world, seed=None):
+        self.world = world
+        self.streams = RandomStreams(seed)
+        self.stats, self.inventory, self.x, self.y = new_game()
+        self.skills = learn_class_skills(None)
+        self.explored = ExploredMap()
+        # this player's own copy of every hand-made quest
+        self.npcs = {pos: copy.deepcopy(npc) for pos, npc in game_module.npcs.items() if "quest" in npc}
+        self.quest_bus = build_quest_bus(self.npcs)
+        self.prompt = None
+        self.deaths = 0
+        self.fights = 0
+
+    #This player's version of the npc at pos, generated quests are copied on first visit
+    def npc_at(self, x, y):
+        npc = self.world.npc_at(x, y)
+        if npc is None or "quest" not in npc:
+            return npc
+        own = self.npcs.get((x, y))
+        if own is None:
+            own = self.npcs[(x, y)] = copy.deepcopy(npc)
+            quest = own["quest"]
+            if quest.get("type") in SUBSCRIPTIONS:
+                event, target = SUBSCRIPTIONS[quest["type"]](quest)
+                self.quest_bus.subscribe(event, target, quest)
+        return own
+
+    def move(self, dx, dy, count=1):
+        lines = []
+        for _ in range(max(1, min(count, MAX_STEPS))):
+            self.x += dx
+            self.y += dy
+            fought = self.check_encounter(lines)
+            self.visit_tile(lines)
+            if fought or self.prompt is not None or self.world.npc_at(self.x, self.y) is not None:
+                break  # stop walking when something happens
+        lines.append(f"You are at ({self.x}, {self.y}).")
+        return lines
+
+    def check_encounter(self, lines):
+        zone_name = self.world.zone_at(self.x, self.y)
+        if zone_name is None:
+            return False
+        zone = self.world.zone(zone_name)
+        name = zone["encounters"].roll(self.streams.encounter, self.streams.pick)
+        if name is None:
+            return False
+        monster = create_monster(name, zone["level_range"], self.streams.level, self.streams.elite)
+        result = run_battle(monster, self.stats, self.inventory, self.skills,
+                            greedy_policy if self.skills else None, self.quest_bus)
+        self.fights += 1
+        if result.won:
+            lines.append(f"A {monster.name} (Lv {monster.level}) attacks! You win in {result.turns} turns, +{result.xp_gain} XP.")
+            if result.leveled_up:
+                lines.append(f"You leveled up to level {self.stats['level']}!")
+        else:
+            self.deaths += 1
+            lines.append(f"A {monster.name} (Lv {monster.level}) attacks! You were defeated and lost {result.lost_xp} XP.")
+            self.x, self.y = 0, 0
+        return True
+
+    #Same rules as Game.visit_tile
+    def visit_tile(self, lines):
+        self.explored.mark(self.x, self.y)
+        self.prompt = None
+        npc = self.npc_at(self.x, self.y)
+        if npc is not None:
+            self.prompt, _ = visit_npc(self.stats, npc, lines, "Type 'accept'.")
+
+    def accept(self):
+        if self.prompt is None:
+            return ["Nobody here is offering you anything."]
+        quest = self.prompt
+        self.quest_bus.choose_class(quest["class_name"])
+        self.stats["class_path"] = quest["class_name"]
+        self.skills = learn_class_skills(quest["class_name"])
+        self.prompt = None
+        return [f"You are now on the path of the {quest['class_name']}!"]
+
+    def look(self):
+        left = self.x - VIEW_WIDTH // 2
+        top = self.y - VIEW_HEIGHT // 2
+        rows = []
+        for y in range(top, top + VIEW_HEIGHT):
+            row = []
+            for x in range(left, left + VIEW_WIDTH):
+                tile = self.world.get(x, y)
+                if x == self.x and y == self.y:
+                    row.append("P")
+                elif tile.npc is not None:
+                    row.append("N")
+                elif tile.icon and tile.icon != 'W':
+                    row.append(tile.icon)
+                else:
+                    row.append(".")
+            rows.append(" ".join(row))
+        return rows
+
+    def status(self):
+        stats = self.stats
+        return [
+            f"Level {stats['level']}  XP {stats['xp']}/{PROGRESSION.xp_to_next(stats)}  Skill Pts {stats['skill_points']}",
+            f"HP {stats['hp']}  Attack {stats['attack']}  Defense {stats['defense']}  Speed {stats['speed']}  "
+            f"MP {stats['current_mana']}/{stats['mana']}",
+            f"Class {stats['class_path'] or 'none'}  Gold {stats['gold']}  Fights {self.fights}  Deaths {self.deaths}",
+        ]
+
+    def quests(self):
+        lines = []
+        for (x, y), npc in sorted(self.npcs.items()):
+            quest = npc["quest"]
+            if quest.get("type") == "kill":
+                lines.append(f"({x}, {y}) defeat {quest['count']} {quest['target']}s [{quest['progress']}/{quest['count']}]")
+        return lines or ["No quests."]
+
+    def upgrade(self, stat):
+        if stat not in dict(UPGRADES):
+            return [f"Unknown stat, pick one of: {', '.join(name for name, _ in UPGRADES)}"]
+        if not spend_skill_point(self.stats, stat):
+            return ["No skill points left."]
+        return [f"{stat} is now {self.stats[stat]}."]
+
+    def inventory_lines(self):
+        lines = [f"{i + 1}. {item.name}{' (W)' if self.inventory.wielded is item else ''}"
+                 for i, item in enumerate(self.inventory)]
+        return lines or ["Your inventory is empty."]
+
+    def wield(self, index):
+        if not 0 <= index < len(self.inventory):
+            return ["No such item."]
+        item = self.inventory[index]
+        if not self.inventory.toggle(item):
+            return [f"You put away the {item.name}."]
+        return [f"You wield the {item.name}."]
+
+    #Runs one command line, returns (reply lines, keep the connection open)
+    def handle(self, line):
+        words = line.strip().lower().split()
+        if not words:
+            return [], True
+        command, args = words[0], words[1:]
+        if command in DIRECTIONS:
+            count = int(args[0]) if args and args[0].isdigit() else 1
+            return self.move(*DIRECTIONS[command], count), True
+        if command == "look":
+            return self.look(), True
+        if command == "stats":
+            return self.status(), True
+        if command == "quests":
+            return self.quests(), True
+        if command == "accept":
+            return self.accept(), True
+        if command == "upgrade" and args:
+            return self.upgrade(args[0]), True
+        if command in ("inv", "inventory"):
+            return self.inventory_lines(), True
+        if command == "wield" and args and args[0].isdigit():
+            return self.wield(int(args[0]) - 1), True
+        if command == "help":
+            return HELP, True
+        if command == "quit":
+            return ["Goodbye."], False
+        return [f"Unknown command {command!r}, type 'help'."], True
+
+class GameServer:
+    def __init__(self, host="127.0.0.1", port=4000, world_seed=0, max_chunks=4096):
+        self.host = host
+        self.port = port
+        # the map is the same for everyone, quests in it are per player
+        self.world = ProceduralWorld(game_module.tiles, game_module.bush_zones, world_seed, max_chunks)
+        self.sessions = set()
+        self.seeds = random.Random(world_seed)
+        self.server = None
+
+    async def _reply(self, writer, lines):
+        writer.write(("".join(line + "\r\n" for line in lines) + ".\r\n").encode("utf-8"))
+        await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        session = PlayerSession(self.world, self.seeds.getrandbits(32))
+        self.sessions.add(session)
+        try:
+            await self._reply(writer, ["Welcome! Type 'help' for the commands."] + session.look())
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    break  # longer than MAX_LINE
+                if not line:
+                    break
+                lines, keep_open = session.handle(line.decode("utf-8", "replace"))
+                await self._reply(writer, lines)
+                if not keep_open:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions.discard(session)
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_LINE)
+        return self.server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+#Load test: clients bots walk around at random, prints replies per second and latency
+async def run_bots(host, port, clients, steps, seed=0):
+    latencies = []
+
+    async def bot(index):
+        rng = random.Random(seed + index)
+        reader, writer = await asyncio.open_connection(host, port)
+
+        async def read_reply():
+            while (await reader.readline()).rstrip(b"\r\n") != b".":
+                pass
+        await read_reply()
+        for _ in range(steps):
+            command = rng.choice(("n", "s", "e", "w", "e 3", "look", "stats"))
+            start = time.perf_counter()
+            writer.write(command.encode() + b"\n")
+            await writer.drain()
+            await read_reply()
+            latencies.append(time.perf_counter() - start)
+        writer.write(b"quit\n")
+        await read_reply()
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bot(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{clients} clients x {steps} commands in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} replies/sec, "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many players over TCP, or load test a running server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=0, help="world seed")
+    parser.add_argument("--bots", type=int, help="connect this many bots to a running server instead")
+    parser.add_argument("--steps", type=int, default=200, help="commands per bot")
+    args = parser.parse_args(argv)
+
+    if args.bots:
+        asyncio.run(run_bots(args.host, args.port, args.bots, args.steps, args.seed))
+        return 0
+    print(f"Listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(GameServer(args.host, args.port, args.seed).serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
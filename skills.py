@@ -0,0 +1,42 @@
+#The skill catalog. Every skill is described once in content/skills.json and built into a
+#Skill exactly once; players only hold small PlayerSkill wrappers that point at
+#the shared Skill and keep their own custom name.
+from functools import lru_cache
+
+from core import Skill
+from content import CONTENT
+
+SKILL_TABLE = CONTENT.skill_table()
+
+#Every skill in the game by name, built once at import
+SKILLS = {row["name"]: Skill(**row) for row in SKILL_TABLE}
+
+#The shared Skill definitions for a class, in table order
+@lru_cache(maxsize=None)
+def class_skill_templates(class_path):
+    return tuple(SKILLS[name] for name in CONTENT.skills_by_class.get(class_path, ()))
+
+#One player's copy of a skill. Anything that isn't per-player comes from the shared Skill.
+class PlayerSkill:
+    __slots__ = ("skill", "custom_name")
+
+    def __init__(self, skill, custom_name=None):
+        self.skill = skill
+        self.custom_name = custom_name or skill.name
+
+    def __getattr__(self, attr):
+        if attr == "skill":
+            raise AttributeError(attr)
+        return getattr(self.skill, attr)
+
+    def __repr__(self):
+        return f"<Skill: {self.custom_name} ({self.skill.rank})>"
+
+#Gives a player the skills of their class, keeping any names they picked before
+def learn_class_skills(class_path, custom_names=None):
+    custom_names = custom_names or {}
+    return [PlayerSkill(skill, custom_names.get(skill.name)) for skill in class_skill_templates(class_path)]
+
+#The renamed skills of a player as {original name: custom name}
+def custom_skill_names(player_skills):
+    return {skill.name: skill.custom_name for skill in player_skills if skill.custom_name != skill.name}
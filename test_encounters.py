@@ -0,0 +1,38 @@
+#Alias tables have to pick in proportion to the weights, and refuse weights
+#they could never pick from.
+import random
+from collections import Counter
+
+import pytest
+
+from encounters import AliasTable, EncounterTable
+
+def test_seeded_draws_follow_the_weights():
+    weights = {"Slime": 6, "Goblin": 3, "Orc": 1, "Dragon": 0.5}
+    table = AliasTable(list(weights), list(weights.values()))
+    n = 200000
+    counts = Counter(table.sample_many(n, random.Random(0)))
+    total = sum(weights.values())
+    for name, weight in weights.items():
+        assert counts[name] / n == pytest.approx(weight / total, abs=0.005), name
+    # the same seed draws the same monsters
+    assert table.sample_many(50, random.Random(1)) == table.sample_many(50, random.Random(1))
+
+def test_zero_weight_is_never_picked():
+    table = AliasTable(["Slime", "Ghost"], [1, 0])
+    assert set(table.sample_many(10000, random.Random(0))) == {"Slime"}
+
+def test_weights_that_add_up_to_nothing_raise():
+    with pytest.raises(ValueError):
+        AliasTable(["Slime", "Goblin"], [0, 0])
+    with pytest.raises(ValueError):
+        AliasTable([], [])
+    with pytest.raises(ValueError):
+        EncounterTable(0.2, [("Slime", 0)], (1, 3))
+
+def test_roll_many_attacks_at_the_spawn_chance():
+    table = EncounterTable(0.25, [("Slime", 1), ("Goblin", 1)], (1, 3))
+    rolls = table.roll_many(100000, random.Random(0))
+    attacks = [roll for roll in rolls if roll is not None]
+    assert len(attacks) / len(rolls) == pytest.approx(0.25, abs=0.01)
+    assert set(attacks) == {"Slime", "Goblin"}
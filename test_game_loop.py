@@ -0,0 +1,78 @@
+#The game loop reads keys from a real file descriptor here, a pipe standing in
+#for the terminal.
+import asyncio
+import os
+
+from fake_screen import FakeScreen
+from game_loop import AsyncGameLoop, AsyncScreen
+
+#A FakeScreen whose keys come down a pipe, one byte each
+class PipeScreen(FakeScreen):
+    def __init__(self, fd):
+        super().__init__()
+        self.fd = fd
+        os.set_blocking(fd, False)
+
+    def getch(self):
+        try:
+            data = os.read(self.fd, 1)
+        except BlockingIOError:
+            return -1
+        return data[0] if data else -1
+
+class Game:
+    def __init__(self, stdscr):
+        self.stdscr = stdscr
+        self.keys = []  # what handle_key got
+        self.battle_keys = []  # what the timer's battle got
+        self.draws = 0
+
+    async def handle_key(self, key):
+        self.keys.append(key)
+        return key != ord('q')
+
+    async def battle(self):
+        self.battle_keys.append(await self.stdscr.getch())
+        return True
+
+    def draw(self):
+        self.draws += 1
+
+def _play(game, loop, script):
+    async def run():
+        task = asyncio.create_task(loop.run())
+        await script()
+        await asyncio.wait_for(task, 1)
+    asyncio.run(run())
+
+def test_a_key_is_drawn_as_soon_as_it_is_handled():
+    read, write = os.pipe()
+    stdscr = AsyncScreen(PipeScreen(read), read)
+    game = Game(stdscr)
+    loop = AsyncGameLoop(game, stdscr)
+    # the first frame only ever comes from the key, no timer draws
+    async def script():
+        await asyncio.sleep(0.01)
+        drawn = game.draws
+        os.write(write, b"x")
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert game.keys == [ord('x')]
+        assert game.draws == drawn + 1
+        os.write(write, b"q")
+    _play(game, loop, script)
+
+def test_keys_go_to_the_battle_a_timer_started():
+    read, write = os.pipe()
+    stdscr = AsyncScreen(PipeScreen(read), read)
+    game = Game(stdscr)
+    loop = AsyncGameLoop(game, stdscr)
+    loop.every(0.01, game.battle, when=lambda: not game.battle_keys)
+    async def script():
+        await asyncio.sleep(0.05)  # the battle is waiting for its key by now
+        os.write(write, b"a")
+        await asyncio.sleep(0.05)
+        os.write(write, b"q")
+    _play(game, loop, script)
+    assert game.battle_keys == [ord('a')]
+    assert game.keys == [ord('q')]
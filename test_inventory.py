@@ -0,0 +1,83 @@
+#The inventory menu's orders, filters and searches have to show the same items
+#a plain sort and scan would, including after items come and go.
+import random
+
+import pytest
+
+from core import Item
+from inventory import SORT_KEYS, Inventory, InventoryView
+
+NAMES = ["Sword", "Short Sword", "Axe", "Battle Axe", "Staff", "Dagger"]
+
+def _inventory(count=60, seed=0):
+    rng = random.Random(seed)
+    # few distinct values, so there are plenty of ties to break
+    return Inventory(Item(f"{rng.choice(NAMES)} {i}", rng.randrange(5), rng.randrange(5), rng.randrange(3),
+                          rng.randrange(4)) for i in range(count))
+
+#What the view should show, worked out the slow way
+def _expected(inventory, key, descending=True, at_least=None, query=""):
+    items = list(inventory)
+    if key is not None:
+        # ties stay in pick up order
+        items = sorted((item for item in items if at_least is None or getattr(item, key) >= at_least),
+                       key=lambda item: getattr(item, key))
+        if descending:
+            items.reverse()
+    return [item for item in items if query.lower() in item.name.lower()]
+
+@pytest.mark.parametrize("key", (None,) + SORT_KEYS)
+def test_every_order_both_ways(key):
+    inventory = _inventory()
+    view = InventoryView(inventory)
+    while view.sort_key != key:
+        view.next_sort()
+    assert view.items() == _expected(inventory, key)
+    view.reverse()
+    assert view.items() == _expected(inventory, key, descending=False)
+
+def test_minimum_filter_and_search():
+    inventory = _inventory()
+    view = InventoryView(inventory)
+    view.next_sort()  # damage
+    view.set_minimum(3)
+    assert view.items() == _expected(inventory, "damage", at_least=3)
+    assert all(item.damage >= 3 for item in view.items())
+
+    # typing narrows, deleting widens again, case doesn't matter
+    for query in ("s", "sw", "SWO", "sw", "", "axe 1"):
+        view.search(query)
+        assert view.items() == _expected(inventory, "damage", at_least=3, query=query), query
+
+def test_removing_items_while_paging():
+    inventory = _inventory(35)
+    view = InventoryView(inventory, page_size=10)
+    view.search("a")
+    view.move(len(view) - 1)
+    first, page = view.page()
+    assert view.selected() is page[-1]
+
+    # drop the selected item on the last page, then the rest of that page
+    inventory.wield(view.selected())
+    inventory.remove(view.selected())
+    assert inventory.wielded is None
+    assert view.items() == _expected(inventory, None, query="a")
+    assert view.cursor == len(view) - 1
+    for item in view.page()[1]:
+        inventory.remove(item)
+    first, page = view.page()
+    assert page and first == view.cursor // 10 * 10
+    assert view.selected() is page[-1]
+    assert view.items() == _expected(inventory, None, query="a")
+
+    # emptying it leaves nothing selected
+    for item in list(inventory):
+        inventory.remove(item)
+    assert view.page() == (0, [])
+    assert view.selected() is None
+    assert all(not entries for entries in inventory.sorted.values())
+
+def test_an_item_is_only_held_once():
+    inventory = _inventory(3)
+    with pytest.raises(ValueError):
+        inventory.append(inventory[0])
@@ -0,0 +1,58 @@
+#Auto-travel paths: a cached path must not outlive the map it was found on,
+#and a search for somewhere unreachable has to give up.
+from pathfinding import MAX_NODES, PathCache, find_path
+
+def _open(x, y):
+    return 1
+
+#A goal at (5, 0) boxed in by walls, in an otherwise endless open field
+def _walled_in(x, y):
+    return None if max(abs(x - 5), abs(y)) == 1 else 1
+
+def test_cached_path_is_reused_while_the_map_stays_the_same():
+    cache = PathCache()
+    path = cache.get((0, 0), (4, 0), _open, version=1)
+    assert path == [(1, 0), (2, 0), (3, 0), (4, 0)]
+    # walking along it, or starting over, is a lookup
+    assert cache.get((2, 0), (4, 0), _open, version=1) == [(3, 0), (4, 0)]
+    assert cache.get((0, 0), (4, 0), _open, version=1) == path
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_new_map_version_searches_again():
+    cache = PathCache()
+    cache.get((0, 0), (4, 0), _open, version=1)
+    # a rock turns up on the old path
+    def rock(x, y):
+        return None if (x, y) == (2, 0) else 1
+    path = cache.get((0, 0), (4, 0), rock, version=2)
+    assert (2, 0) not in path and path[-1] == (4, 0)
+    assert cache.misses == 2
+    # and the new path is what the new version hands out
+    assert cache.get((0, 0), (4, 0), rock, version=2) == path
+    assert cache.hits == 1
+
+def test_options_are_part_of_the_key():
+    cache = PathCache()
+    cache.get((0, 0), (4, 0), _open, version=1, options=True)
+    cache.get((0, 0), (4, 0), _open, version=1, options=False)
+    assert cache.misses == 2
+
+def test_search_gives_up_after_max_nodes():
+    looked_at = []
+    def cost(x, y):
+        looked_at.append((x, y))
+        return _walled_in(x, y)
+    assert find_path((0, 0), (5, 0), cost, max_nodes=500) is None
+    # each node looks at no more than its four neighbours
+    assert len(looked_at) <= 4 * 502
+
+    looked_at.clear()
+    assert find_path((0, 0), (5, 0), cost) is None
+    assert MAX_NODES * 2 < len(looked_at) <= 4 * (MAX_NODES + 2)
+
+def test_unreachable_goal_is_not_cached():
+    cache = PathCache()
+    assert cache.get((0, 0), (5, 0), _walled_in, version=1) is None
+    assert cache.get((0, 0), (5, 0), _walled_in, version=1) is None
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert not cache.paths
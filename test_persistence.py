@@ -0,0 +1,28 @@
+#A save that fails to write has to be noticed, not lost quietly.
+from persistence import AutosaveService
+
+def test_flush_is_false_while_the_last_write_failed():
+    written = []
+    def write(snapshot):
+        if snapshot == "bad":
+            raise OSError("disk full")
+        written.append(snapshot)
+    saver = AutosaveService(write)
+
+    saver.request("bad", immediate=True)
+    assert saver.flush() is False
+    assert isinstance(saver.last_error, OSError)
+
+    saver.request("good")
+    assert saver.flush() is True
+    assert saver.last_error is None
+    assert written == ["good"]
+    assert saver.close() is True
+
+def test_close_says_when_the_final_save_failed():
+    def write(snapshot):
+        raise PermissionError("read-only")
+    saver = AutosaveService(write)
+    saver.request("last")
+    assert saver.close() is False
+    assert isinstance(saver.last_error, PermissionError)
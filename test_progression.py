@@ -0,0 +1,48 @@
+#Curves have to level the player exactly like the old one-level-at-a-time loop did.
+import random
+
+import pytest
+
+from progression import LinearCurve, PowerCurve, Progression, TableCurve
+
+#The loop gain_xp used to run, for any cost(level)
+def _loop_grant(stats, xp, cost, skill_points_per_level=5):
+    stats["xp"] += xp
+    gained = 0
+    while stats["xp"] >= cost(stats["level"]):
+        stats["xp"] -= cost(stats["level"])
+        stats["level"] += 1
+        stats["skill_points"] += skill_points_per_level
+        stats["current_mana"] = stats["mana"]
+        gained += 1
+    return gained
+
+def _stats(level=1, xp=0):
+    return {"level": level, "xp": xp, "skill_points": 0, "mana": 10, "current_mana": 3}
+
+@pytest.mark.parametrize("curve", [LinearCurve(10), LinearCurve(7), TableCurve(lambda level: 10 * level),
+                                   TableCurve(lambda level: 3 + level % 5), PowerCurve(10, 1.5)],
+                         ids=["linear10", "linear7", "table10", "table_odd", "power"])
+def test_grant_matches_the_loop(curve):
+    rng = random.Random(0)
+    progression = Progression(curve)
+    fast, slow = _stats(), _stats()
+    for _ in range(300):
+        xp = rng.choice([0, 1, rng.randrange(50), rng.randrange(5000), rng.randrange(200000)])
+        assert progression.grant(fast, xp) == _loop_grant(slow, xp, curve.cost)
+        assert fast == slow
+
+@pytest.mark.parametrize("curve", [LinearCurve(10), TableCurve(lambda level: 10 * level)], ids=["linear", "table"])
+def test_levels_sit_exactly_on_the_totals(curve):
+    for level in range(1, 400):
+        total = curve.total_for(level)
+        assert total == sum(curve.cost(lower) for lower in range(1, level))
+        assert curve.level_for(total) == level
+        assert curve.level_for(total - 1) == max(level - 1, 1)
+
+def test_linear_and_table_agree_on_huge_rewards():
+    linear, table = Progression(LinearCurve(10)), Progression(TableCurve(lambda level: 10 * level))
+    a, b = _stats(), _stats()
+    for xp in (10 ** 3, 10 ** 6, 10 ** 9, 12345):
+        assert linear.grant(a, xp) == table.grant(b, xp)
+        assert a == b
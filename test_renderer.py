@@ -0,0 +1,74 @@
+#Whatever the renderer leaves out, the screen has to end up showing the frame
+import random
+
+from fake_screen import FakeScreen
+from renderer import FrameRenderer, changed_spans
+
+#A FakeScreen that also remembers the attribute of every character
+class AttrScreen(FakeScreen):
+    def __init__(self, height, width):
+        super().__init__(height, width)
+        self.attrs = [[0] * width for _ in range(height)]
+
+    def addstr(self, y, x, text, attr=0):
+        super().addstr(y, x, text, attr)
+        self.attrs[y][x:x + len(text)] = [attr] * len(text)
+
+    def clrtoeol(self):
+        super().clrtoeol()
+        y, x = self.cursor
+        self.attrs[y][x:] = [0] * (self.width - x)
+
+    def erase(self):
+        super().erase()
+        self.attrs = [[0] * self.width for _ in range(self.height)]
+
+    #(character, attr) per cell of row y, blanks count as spaces
+    def cells(self, y):
+        return list(zip(self.rows[y].ljust(self.width), self.attrs[y]))
+
+def _cells(segments, width):
+    cells = [(char, attr) for text, attr in segments for char in text]
+    return cells + [(" ", 0)] * (width - len(cells))
+
+def test_changed_spans_skip_what_is_already_there():
+    old = (("ab cd ef", 0),)
+    assert changed_spans(old, (("ab cX ef", 0),)) == [(4, 5)]
+    assert changed_spans(old, (("ab cd ", 0), ("ef", 7))) == [(6, 8)]
+    assert changed_spans(old, (("ab cd ef", 0),)) == []
+    # close changes go out together, far apart ones separately
+    assert changed_spans((("." * 20, 0),), (("X.X" + "." * 15 + "X.", 0),)) == [(0, 3), (18, 19)]
+
+def test_random_frames_end_up_on_screen():
+    rng = random.Random(0)
+    height, width = 12, 30
+    screen = AttrScreen(height, width)
+    renderer = FrameRenderer(screen)
+    last = {}
+    for frame in range(300):
+        if frame % 50 == 0:
+            renderer.invalidate()
+        renderer.begin_frame()
+        for y in range(height):
+            if rng.random() < 0.1:
+                continue  # left out, has to be blanked
+            segments = last.get(y) if rng.random() < 0.3 else None
+            if segments is None:
+                segments = tuple((rng.choice([". ", "B ", "  ", "N", "hello "]) * rng.randint(1, 4), rng.choice([0, 0, 256]))
+                                 for _ in range(rng.randint(0, 6)))
+            renderer.row(y, segments)
+            last[y] = segments
+        renderer.present()
+        for y in range(height):
+            expected = _cells(renderer.staged.get(y, ()), width)
+            assert screen.cells(y) == expected, (frame, y)
+
+def test_rows_are_cut_at_the_screen_width():
+    screen = FakeScreen(5, 20)
+    renderer = FrameRenderer(screen)
+    renderer.begin_frame()
+    renderer.row(0, "x" * 50)
+    renderer.row(1, [("abc" * 5, 0), ("DEFGHIJ", 1), ("zzz", 0)])
+    renderer.present()
+    assert screen.text(0) == "x" * 19
+    assert screen.text(1) == "abcabcabcabcabcDEFG"
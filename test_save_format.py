@@ -0,0 +1,87 @@
+#The save container has to notice damage instead of loading garbage, and old
+#savegame.json files have to come across into it.
+import copy
+import json
+
+import pytest
+
+import Project_Beta as game_module
+from explored import ExploredMap
+from save_format import SaveFile, SaveFormatError, encode_save, write_save
+
+@pytest.fixture(autouse=True)
+def scratch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+def _sections():
+    explored = ExploredMap()
+    explored.mark(3, 4)
+    return {
+        "player": {"stats": {"hp": 10, "gold": 5}, "x": 1, "y": 2},
+        "quests": [[0, 1, 2, False, False]],
+        "explored": explored.to_bytes(),
+    }
+
+def test_sections_come_back_as_written():
+    save = SaveFile(encode_save(_sections()))
+    assert save.sections() == ["player", "quests", "explored"]
+    assert save.get("player") == _sections()["player"]
+    assert ExploredMap.from_bytes(save.get("explored")).is_explored(3, 4)
+    assert save.get("inventory", []) == []
+
+def test_damaged_section_fails_its_crc():
+    data = bytearray(encode_save(_sections()))
+    _, offset, length, _ = SaveFile(data).table["quests"]
+    data[offset + length // 2] ^= 0xFF
+    save = SaveFile(bytes(data))
+    with pytest.raises(SaveFormatError, match="damaged"):
+        save.get("quests")
+    # the other sections are still fine
+    assert save.get("player")["x"] == 1
+
+def test_every_truncation_is_noticed():
+    data = encode_save(_sections())
+    for length in range(len(data)):
+        with pytest.raises(SaveFormatError):
+            SaveFile(data[:length])
+
+def test_load_game_turns_down_broken_saves():
+    data = encode_save(_sections())
+    with open(game_module.SAVE_FILE, "wb") as f:
+        f.write(data[:len(data) // 2])
+    assert game_module.load_game() is None
+
+    sections = _sections()
+    del sections["player"]
+    write_save(game_module.SAVE_FILE, sections)
+    with SaveFile.open(game_module.SAVE_FILE) as save, pytest.raises(SaveFormatError, match="player"):
+        save.require("player")
+    assert game_module.load_game() is None
+
+def test_legacy_json_save_is_migrated(monkeypatch):
+    # loading sets quest progress on the game's npcs, keep that to this test
+    monkeypatch.setitem(game_module.npcs, (0, 1), copy.deepcopy(game_module.npcs[(0, 1)]))
+    legacy = {
+        "stats": {"hp": 40, "attack": 6, "gold": 9, "level": 3, "xp": 7, "wielded_index": None},
+        "player_x": 4,
+        "player_y": -2,
+        "quests": {"(0, 1)": {"progress": 2, "completed": False, "reward_given": False}},
+    }
+    with open(game_module.LEGACY_SAVE_FILE, "w") as f:
+        json.dump(legacy, f)
+    explored = ExploredMap()
+    explored.mark(4, -2)
+    explored.save(game_module.EXPLORED_FILE)
+
+    stats, x, y, inventory, explored, _, _, _ = game_module.load_game()
+    assert (stats["gold"], stats["level"], x, y) == (9, 3, 4, -2)
+    assert stats["class_path"] is None  # filled in for saves from before classes
+    assert len(inventory) == 0
+    assert explored.is_explored(4, -2)
+    assert game_module.npcs[(0, 1)]["quest"]["progress"] == 2
+
+    # the old file is left alone and the new one has the quests, keyed by position
+    with open(game_module.LEGACY_SAVE_FILE) as f:
+        assert json.load(f) == legacy
+    with SaveFile.open(game_module.SAVE_FILE) as save:
+        assert save.get("quests") == [[0, 1, 2, False, False]]
@@ -0,0 +1,81 @@
+#Saves and journals across games: a journal must only ever be replayed on top
+#of the game that wrote it, and 'l' goes back to what 's' saved.
+import asyncio
+import curses
+
+import pytest
+
+import Project_Beta as game_module
+from fake_screen import FakeScreen
+from journal import Journal
+
+@pytest.fixture(autouse=True)
+def scratch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+def _game(loaded):
+    stats, x, y, inventory, explored, skill_names, generation, lineage = loaded
+    return game_module.Game(FakeScreen(), stats, inventory, x, y, explored, skill_names, generation, lineage=lineage)
+
+#Game A crashes after a few compactions, so its journal is newer than anything game B writes
+def _crashed_game():
+    game = _game(game_module.start_new_game())
+    for _ in range(3):
+        game.compact()
+    game.stats["gold"] = 12345
+    game.player_x, game.player_y = 77, 5
+    game.record_changes()
+    game.saver.close()
+    game.journal.close()
+    return game
+
+def test_new_game_ignores_journals_of_a_crashed_game():
+    _crashed_game()
+    game = _game(game_module.start_new_game())
+    game.close()
+
+    stats, x, y = game_module.load_game()[:3]
+    assert stats["gold"] == 1
+    assert (x, y) == (0, 0)
+
+def test_journal_from_another_lineage_is_skipped():
+    crashed = _crashed_game()
+    game = _game(game_module.start_new_game())
+    game.close()
+    # a stray journal from the crashed game that deleting missed
+    stray = Journal(game_module.JOURNAL_FILE, game.generation + 1, crashed.lineage)
+    stray.append(["stat", "gold", 999])
+    stray.append(["pos", 77, 5])
+    stray.close()
+
+    stats, x, y = game_module.load_game()[:3]
+    assert stats["gold"] == 1
+    assert (x, y) == (0, 0)
+
+def test_journal_of_the_same_game_is_replayed():
+    game = _game(game_module.start_new_game())
+    game.stats["gold"] = 50
+    game.player_x = 3
+    game.record_changes()
+    game.saver.flush()
+
+    stats, x, y = game_module.load_game()[:3]
+    assert stats["gold"] == 50
+    assert x == 3
+    game.close()
+
+def test_load_key_goes_back_to_the_manual_save():
+    game = _game(game_module.start_new_game())
+    # off the bushes, so no fight starts
+    game.player_x, game.player_y = 0, -3
+    asyncio.run(game.handle_key(ord('s')))
+    game.stats["gold"] = 77
+    asyncio.run(game.handle_key(curses.KEY_RIGHT))
+    asyncio.run(game.handle_key(ord('l')))
+
+    assert game.stats["gold"] == 1
+    assert (game.player_x, game.player_y) == (0, -3)
+    # and the restored state is what a later Load Game finds
+    game.close()
+    stats, x, y = game_module.load_game()[:3]
+    assert (stats["gold"], x, y) == (1, 0, -3)
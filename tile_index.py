@@ -0,0 +1,69 @@
+#Precomputed lookup of everything that sits on a map tile, so drawing the map
+#and checking for encounters is one dict lookup per tile instead of scanning
+#every landmark list.
+
+#What is on one tile: the landmark icon, the bush zone name and the NPC, any of which can be None
+class Tile:
+    __slots__ = ("icon", "zone", "npc")
+
+    def __init__(self, icon=None, zone=None, npc=None):
+        self.icon = icon
+        self.zone = zone
+        self.npc = npc
+
+    def __repr__(self):
+        return f"<Tile icon={self.icon!r} zone={self.zone!r} npc={self.npc is not None}>"
+
+#Shared by every tile with nothing on it
+EMPTY_TILE = Tile()
+
+class TileIndex:
+    def __init__(self, landmarks=None, bush_zones=None, npcs=None):
+        self.tiles = {}
+        if landmarks:
+            self.add_landmarks(landmarks)
+        if bush_zones:
+            self.add_zones(bush_zones)
+        if npcs:
+            self.add_npcs(npcs)
+
+    def _tile(self, pos):
+        tile = self.tiles.get(pos)
+        if tile is None:
+            tile = self.tiles[pos] = Tile()
+        return tile
+
+    #Earlier icons win, the same order the old get_landmark_at scanned them in
+    def add_landmarks(self, landmarks):
+        for icon, positions in landmarks.items():
+            for pos in positions:
+                tile = self._tile(pos)
+                if tile.icon is None:
+                    tile.icon = icon
+
+    #Only one zone can apply to a tile, the first one listed
+    def add_zones(self, bush_zones):
+        for zone_name, zone in bush_zones.items():
+            for pos in zone["tiles"]:
+                tile = self._tile(pos)
+                if tile.zone is None:
+                    tile.zone = zone_name
+
+    def add_npcs(self, npcs):
+        for pos, npc in npcs.items():
+            self._tile(pos).npc = npc
+
+    def get(self, x, y):
+        return self.tiles.get((x, y), EMPTY_TILE)
+
+    def icon_at(self, x, y):
+        return self.tiles.get((x, y), EMPTY_TILE).icon
+
+    def zone_at(self, x, y):
+        return self.tiles.get((x, y), EMPTY_TILE).zone
+
+    def npc_at(self, x, y):
+        return self.tiles.get((x, y), EMPTY_TILE).npc
+
+    def __len__(self):
+        return len(self.tiles)
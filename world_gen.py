@@ -0,0 +1,256 @@
+#The world past the hand-made map. Everything outside SAFE_RADIUS is generated
+#chunk by chunk from the world seed the first time the map gets near it: rocks
+#and trees, bush zones whose monsters get stronger the further out they are,
+#and the odd NPC with a kill quest. The same seed always makes the same world.
+#
+#Generated chunks live in an LRU cache of max_chunks, anything evicted is simply
+#generated again when it is needed. The only thing a player can change out
+#there is quest progress, so only that is kept for evicted chunks and saved.
+#Quests in a chunk that isn't loaded don't hear about kills, and on_drop is
+#told the name of each zone that goes, so whatever hangs off it can go too.
+import random
+from collections import OrderedDict
+
+from tile_index import Tile, EMPTY_TILE
+from bestiary import BESTIARY, SPECIES_TABLE
+from encounters import EncounterTable
+
+CHUNK_SIZE = 32
+SAFE_RADIUS = 24  # nothing is generated this close to (0, 0)
+LEVELS_EVERY = 24  # zone levels go up by one every this many tiles out
+TIER_EVERY = 64  # a new species can turn up every this many tiles out
+TERRAIN = ('^', 'T')
+NPC_CHANCE = 0.2
+
+SPECIES = [row[0] for row in SPECIES_TABLE]
+
+DIALOGUE = [
+    "A traveller leans on a walking stick, 'The bushes get meaner the further you go.'",
+    "A hunter sharpens an arrow, 'I've seen tracks out here you wouldn't believe.'",
+    "A lost merchant squints at a map, 'Is this still the same road?'",
+    "A hermit looks up from a small fire, 'Nobody comes out this far.'",
+]
+
+#Everything generated for one chunk
+class Chunk:
+    __slots__ = ("tiles", "zones", "npcs")
+
+    def __init__(self):
+        self.tiles = {}  # (x, y) -> Tile
+        self.zones = {}  # zone name -> zone dict, same shape as bush_zones
+        self.npcs = {}  # (x, y) -> npc dict, same shape as npcs
+
+def _chunk_key(x, y):
+    return x // CHUNK_SIZE, y // CHUNK_SIZE
+
+#(progress, completed, reward_given) of a generated quest
+def _quest_state(npc):
+    quest = npc["quest"]
+    return quest.get("progress", 0), quest.get("completed", False), npc.get("reward_given", False)
+
+class ProceduralWorld:
+    #base is the TileIndex of the hand-made map and base_zones its bush_zones,
+    #both win over anything generated. New quests subscribe to quest_bus.
+    #on_drop(zone name) is called for every zone of a chunk that is dropped.
+    def __init__(self, base, base_zones, seed=0, max_chunks=256, quest_bus=None, safe_radius=SAFE_RADIUS,
+                 on_drop=None):
+        self.base = base
+        self.base_zones = base_zones
+        self.max_chunks = max_chunks
+        self.quest_bus = quest_bus
+        self.on_drop = on_drop
+        self.safe_radius = safe_radius
+        self.chunks = OrderedDict()
+        self.zones = {}  # generated zone name -> zone, for loaded chunks
+        self.overrides = {}  # chunk key -> {pos: quest state} for evicted chunks
+        self.generated = 0
+        self.version = 0  # goes up whenever the map changes under cached paths
+        self.reset(seed)
+
+    #Starts over with a new seed and the quest progress from a save
+    def reset(self, seed, chunks=()):
+        for key in list(self.chunks):
+            self._drop(key)
+        self.overrides = {}
+        self.seed = seed
+        self.version += 1
+        for cx, cy, quests in chunks:
+            self.overrides[(cx, cy)] = {(x, y): (progress, completed, reward_given)
+                                        for x, y, progress, completed, reward_given in quests}
+
+    def load_state(self, state):
+        self.reset(state["seed"], state.get("chunks", ()))
+
+    #Seed and the quest progress of every chunk the player changed, for the save
+    def to_state(self):
+        chunks = {key: dict(states) for key, states in self.overrides.items()}
+        for key, chunk in self.chunks.items():
+            states = {pos: _quest_state(npc) for pos, npc in chunk.npcs.items()
+                      if "quest" in npc and any(_quest_state(npc))}
+            if states:
+                chunks[key] = states
+        return {
+            "seed": self.seed,
+            "chunks": [[cx, cy, [[x, y, *state] for (x, y), state in states.items()]]
+                       for (cx, cy), states in chunks.items()],
+        }
+
+    def _chunk(self, key):
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        chunk = self.chunks[key] = self._generate(key)
+        self.zones.update(chunk.zones)
+        while len(self.chunks) > self.max_chunks:
+            self._drop(next(iter(self.chunks)))
+        return chunk
+
+    #Forgets a chunk, keeping its quest progress if there is any
+    def _drop(self, key):
+        chunk = self.chunks.pop(key)
+        for name in chunk.zones:
+            self.zones.pop(name, None)
+            if self.on_drop is not None:
+                self.on_drop(name)
+        states = {}
+        for pos, npc in chunk.npcs.items():
+            quest = npc.get("quest")
+            if quest is None:
+                continue
+            if any(_quest_state(npc)):
+                states[pos] = _quest_state(npc)
+            if self.quest_bus is not None:
+                self.quest_bus.unsubscribe("kill", quest["target"], quest)
+        if states:
+            self.overrides[key] = states
+
+    def _free(self, pos):
+        return max(abs(pos[0]), abs(pos[1])) > self.safe_radius and pos not in self.base.tiles
+
+    def _generate(self, key):
+        self.generated += 1
+        chunk = Chunk()
+        cx, cy = key
+        x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        # chunks inside the hand-made map stay empty
+        if max(abs(x0), abs(x0 + CHUNK_SIZE - 1), abs(y0), abs(y0 + CHUNK_SIZE - 1)) <= self.safe_radius:
+            return chunk
+        rng = random.Random(f"{self.seed}:{cx}:{cy}")
+        tiles = chunk.tiles
+        distance = max(abs(x0 + CHUNK_SIZE // 2), abs(y0 + CHUNK_SIZE // 2))
+
+        for _ in range(rng.randint(0, 12)):
+            pos = (x0 + rng.randrange(CHUNK_SIZE), y0 + rng.randrange(CHUNK_SIZE))
+            if self._free(pos):
+                tiles[pos] = Tile(icon=rng.choice(TERRAIN))
+
+        # bush zones, further out means higher levels and more kinds of monster
+        level = 1 + distance // LEVELS_EVERY
+        tier = min(distance // TIER_EVERY, len(SPECIES) - 1)
+        for i in range(rng.choice((0, 1, 1, 2))):
+            radius = rng.randint(2, 4)
+            centre_x = x0 + rng.randrange(radius, CHUNK_SIZE - radius)
+            centre_y = y0 + rng.randrange(radius, CHUNK_SIZE - radius)
+            name = f"wild {cx},{cy}:{i}"
+            zone_tiles = []
+            for dy in range(-radius, radius + 1):
+                for dx in range(-radius, radius + 1):
+                    pos = (centre_x + dx, centre_y + dy)
+                    if dx * dx + dy * dy <= radius * radius and rng.random() < 0.85 and self._free(pos):
+                        tiles[pos] = Tile('B', name)
+                        zone_tiles.append(pos)
+            if not zone_tiles:
+                continue
+            # the newest species out here and the one before it
+            choices = range(max(tier - 1, 0), tier + 1)
+            kinds = sorted(rng.sample(choices, rng.randint(1, len(choices))))
+            monsters = tuple(SPECIES[k] for k in kinds)
+            level_range = (level, level + 2)
+            BESTIARY.prepare(monsters, level_range)
+            zone = chunk.zones[name] = {
+                "tiles": zone_tiles,
+                "level_range": level_range,
+                "monsters": monsters,
+                "spawn_chance": 0.10 + 0.02 * len(monsters),
+            }
+            zone["encounters"] = EncounterTable.from_zone(zone)
+
+        if rng.random() < NPC_CHANCE:
+            pos = (x0 + rng.randrange(CHUNK_SIZE), y0 + rng.randrange(CHUNK_SIZE))
+            if self._free(pos) and tiles.get(pos, EMPTY_TILE).zone is None:
+                npc = {"dialogue": rng.choice(DIALOGUE)}
+                if chunk.zones:
+                    zone = chunk.zones[next(iter(chunk.zones))]
+                    target = rng.choice(zone["monsters"])
+                    count = rng.randint(2, 5)
+                    npc["dialogue"] += f" 'Clear out {count} {target}s nearby and I'll make it worth your while.'"
+                    npc["quest"] = {
+                        "type": "kill", "target": target, "count": count,
+                        "progress": 0, "reward": {"xp": count * (5 + level * 3), "skill_points": 1 if level >= 5 else 0},
+                        "completed": False
+                    }
+                chunk.npcs[pos] = npc
+                tiles[pos] = Tile(npc=npc)
+
+        for pos, (progress, completed, reward_given) in self.overrides.pop(key, {}).items():
+            npc = chunk.npcs.get(pos)
+            if npc is not None and "quest" in npc:
+                npc["quest"]["progress"] = progress
+                npc["quest"]["completed"] = completed
+                npc["reward_given"] = reward_given
+        if self.quest_bus is not None:
+            for npc in chunk.npcs.values():
+                if "quest" in npc:
+                    self.quest_bus.subscribe("kill", npc["quest"]["target"], npc["quest"])
+        return chunk
+
+    def get(self, x, y):
+        tile = self.base.tiles.get((x, y))
+        if tile is not None:
+            return tile
+        return self._chunk(_chunk_key(x, y)).tiles.get((x, y), EMPTY_TILE)
+
+    def icon_at(self, x, y):
+        return self.get(x, y).icon
+
+    def zone_at(self, x, y):
+        return self.get(x, y).zone
+
+    def npc_at(self, x, y):
+        return self.get(x, y).npc
+
+    #A zone by name, hand-made or generated (generated ones only while loaded)
+    def zone(self, name):
+        zone = self.base_zones.get(name)
+        return zone if zone is not None else self.zones.get(name)
+
+    #(name, zone) for the generated zones within radius of (x, y), generating
+    #the chunks there if need be
+    def zones_near(self, x, y, radius):
+        for cy in range((y - radius) // CHUNK_SIZE, (y + radius) // CHUNK_SIZE + 1):
+            for cx in range((x - radius) // CHUNK_SIZE, (x + radius) // CHUNK_SIZE + 1):
+                yield from self._chunk((cx, cy)).zones.items()
+
+    #(pos, npc) for the quests in the loaded chunks
+    def quest_items(self):
+        for chunk in self.chunks.values():
+            for pos, npc in chunk.npcs.items():
+                if "quest" in npc:
+                    yield pos, npc
+
+    #Sets a generated quest's progress, whether its chunk is loaded or not
+    def set_quest_state(self, pos, progress, completed, reward_given):
+        key = _chunk_key(*pos)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            npc = chunk.npcs.get(pos)
+            if npc is not None and "quest" in npc:
+                npc["quest"]["progress"] = progress
+                npc["quest"]["completed"] = completed
+                npc["reward_given"] = reward_given
+            return
+        self.overrides.setdefault(key, {})[pos] = (progress, completed, reward_given)
+
+    def __len__(self):
+        return len(self.chunks)